@@ -1,49 +1,269 @@
 # cricket/admin.py
 
+from django import forms
 from django.contrib import admin
-from .models import Team, Player, Match, PlayerMatchPerformance, Ball
-from django.db.models import Sum # Import Sum for aggregation
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Count, Q
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from .models import Team, Player, Match, PlayerMatchPerformance, Ball, InningsScore, PlayerCareerStats
+from . import innings, search
+
+# Unfiltered changelists of tables at least this big show the planner's row estimate
+ESTIMATED_COUNT_ABOVE = 100000
+ESTIMATE_CACHE_TTL = 300 # Estimates only move with ANALYZE / autovacuum anyway
+COMMENTARY_SEARCH_PREFIX = 'commentary:'
+
+
+def _read_row_estimate(connection, table):
+    queries = {
+        'postgresql': ("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table]),
+        'mysql': ("SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s", [table]),
+        # The first number of each sqlite_stat1 row is the table's row count
+        'sqlite': ("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table]),
+    }
+    if connection.vendor not in queries:
+        return -1
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(*queries[connection.vendor])
+            row = cursor.fetchone()
+    except DatabaseError: # e.g. no sqlite_stat1 table yet
+        return -1
+    if row is None or row[0] is None:
+        return -1
+    return int(str(row[0]).split()[0])
+
+
+def estimated_row_count(model, using='default'):
+    """
+    The database's own estimate of a table's size, without scanning it.
+    None when the backend keeps none (SQLite before ANALYZE has run).
+    Cached for a few minutes, so most changelist loads cost no query for it.
+    """
+    table = model._meta.db_table
+    estimate = cache.get_or_set(
+        f"cricket:row-estimate:{using}:{table}",
+        lambda: _read_row_estimate(connections[using], table),
+        ESTIMATE_CACHE_TTL,
+    )
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that trusts the table estimate for an unfiltered changelist of
+    a huge table, where an exact COUNT(*) would scan every row.
+    """
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_ABOVE:
+                return estimate
+        return super().count
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Foreign key filter that finds its choice through the admin autocomplete
+    view instead of listing every related object, so the changelist never
+    loads the related table. The related model's admin needs search_fields.
+    """
+    template = 'admin/cricket/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f"{field_path}__{field.target_field.name}__exact"
+        super().__init__(field, request, params, model, model_admin, field_path)
+        remote_model = field.remote_field.model
+        remote_admin = model_admin.admin_site._registry.get(remote_model)
+        # The selected object is labelled with its admin's joins, e.g. a match with both teams
+        queryset = remote_admin.get_queryset(request) if remote_admin else remote_model._default_manager.all()
+        self.form_field = forms.ModelChoiceField(
+            queryset, required=False, widget=AutocompleteSelect(field, model_admin.admin_site),
+        )
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    @property
+    def value(self):
+        values = self.used_parameters.get(self.lookup_kwarg)
+        return values[-1] if values else None
+
+    def rendered_widget(self):
+        return self.form_field.widget.render(self.lookup_kwarg, self.value, attrs={'style': 'width: 100%'})
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value is None,
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg]),
+            'display': _('All'),
+        }
+
+    def get_facet_counts(self, pk_attname, filtered_qs):
+        return {} # Facets would count every related object, which is what this filter avoids
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist settings for tables that grow with every delivery: no second
+    unfiltered COUNT(*), no facet counts, and estimated counts once huge.
+    Autocomplete filters bring in their select2 scripts.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+
+    @property
+    def media(self):
+        media = super().media
+        for list_filter in self.list_filter:
+            if isinstance(list_filter, tuple) and issubclass(list_filter[1], AutocompleteFilter):
+                field = self.model._meta.get_field(list_filter[0])
+                return media + AutocompleteSelect(field, self.admin_site).media + forms.Media(js=['cricket/js/admin_filters.js'])
+        return media
+
+
+def related_name_search(queryset, search_term, player_fields=(), match_field=None):
+    """
+    Searches by player or match name without a LIKE over the big table: the
+    names are matched in the small Player and Match tables first and the
+    rows are then filtered on their indexed foreign keys.
+    """
+    term = search_term.strip()
+    if not term:
+        return queryset
+    players = Player.objects.filter(name__icontains=term).values('pk')
+    condition = Q()
+    for field in player_fields:
+        condition |= Q(**{f'{field}__in': players})
+    if match_field:
+        matches = Match.objects.filter(
+            Q(name__icontains=term) | Q(team1__name__icontains=term) | Q(team2__name__icontains=term)
+        ).values('pk')
+        condition |= Q(**{f'{match_field}__in': matches})
+    return queryset.filter(condition)
 
 @admin.register(Team)
 class TeamAdmin(admin.ModelAdmin):
-    list_display = ('name', 'country', 'created_at')
+    list_display = ('name', 'country', 'get_player_count', 'created_at')
     search_fields = ('name', 'country')
 
+    def get_queryset(self, request):
+        # Counted in the changelist query rather than once per row
+        return super().get_queryset(request).annotate(player_count=Count('players'))
+
+    def get_player_count(self, obj):
+        return obj.player_count
+    get_player_count.short_description = 'Players'
+    get_player_count.admin_order_field = 'player_count'
+
 @admin.register(Player)
-class PlayerAdmin(admin.ModelAdmin):
+class PlayerAdmin(LargeTableAdmin):
     list_display = ('name', 'team', 'role', 'get_total_runs', 'get_total_wickets') # Updated list_display
     list_filter = ('team', 'role')
     search_fields = ('name',)
+    # Team names and career totals come in with the changelist query (no per-row queries).
+    # An empty list_select_related keeps the joins chosen in get_queryset.
+    list_select_related = ()
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_career()
 
     # Custom methods to display aggregated runs and wickets in the admin
-    # These methods calculate the totals from PlayerMatchPerformance
+    # These read the precomputed PlayerCareerStats row (see cricket/career.py)
+    def _career(self, obj):
+        try:
+            return obj.career_stats
+        except PlayerCareerStats.DoesNotExist: # No performances recorded yet
+            return None
+
     def get_total_runs(self, obj):
-        # Sums all runs_scored for this player across all their performances
-        return obj.performances.aggregate(Sum('runs_scored'))['runs_scored__sum'] or 0
+        career = self._career(obj)
+        return career.runs if career else 0
     get_total_runs.short_description = 'Total Runs' # Column header in admin
+    get_total_runs.admin_order_field = 'career_stats__runs'
 
     def get_total_wickets(self, obj):
-        # Sums all wickets_taken for this player across all their performances
-        return obj.performances.aggregate(Sum('wickets_taken'))['wickets_taken__sum'] or 0
+        career = self._career(obj)
+        return career.wickets if career else 0
     get_total_wickets.short_description = 'Total Wickets' # Column header in admin
+    get_total_wickets.admin_order_field = 'career_stats__wickets'
 
 @admin.register(Match)
 class MatchAdmin(admin.ModelAdmin):
     list_display = ('name', 'team1', 'team2', 'date', 'venue', 'status', 'winner')
     list_filter = ('status', 'date', 'team1', 'team2')
-    search_fields = ('name', 'venue')
+    search_fields = ('name', 'venue', 'team1__name', 'team2__name') # Also used by the match autocomplete
     date_hierarchy = 'date' # Adds date drilldown navigation
+    list_select_related = ()
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_teams()
 
 @admin.register(PlayerMatchPerformance)
-class PlayerMatchPerformanceAdmin(admin.ModelAdmin):
-    list_display = ('player', 'match', 'runs_scored', 'wickets_taken', 'balls_faced', 'overs_bowled')
-    list_filter = ('player__team', 'match__date') # Filter by player's team and match date
+class PlayerMatchPerformanceAdmin(LargeTableAdmin):
+    list_display = ('player', 'match', 'runs_scored', 'wickets_taken', 'balls_faced', 'overs_bowled', 'runs_conceded', 'is_out')
+    list_filter = (('player', AutocompleteFilter), ('match', AutocompleteFilter), 'player__team', 'match_date')
     search_fields = ('player__name', 'match__name')
+    search_help_text = 'Player or match name.'
     raw_id_fields = ('player', 'match') # Use raw_id_fields for FKs to improve performance with many records
+    list_select_related = ()
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_player_and_match()
+
+    def get_search_results(self, request, queryset, search_term):
+        return related_name_search(queryset, search_term, ('player',), 'match'), False
 
 @admin.register(Ball)
-class BallAdmin(admin.ModelAdmin):
-    list_display = ('match', 'over', 'batsman', 'bowler', 'runs', 'is_wicket', 'is_wide', 'is_no_ball')
-    list_filter = ('match', 'is_wicket', 'is_wide', 'is_no_ball')
-    search_fields = ('match__name', 'batsman__name', 'bowler__name', 'commentary')
+class BallAdmin(LargeTableAdmin):
+    list_display = ('match', 'sequence', 'innings', 'over', 'batsman', 'bowler', 'runs', 'is_wicket', 'is_wide', 'is_no_ball')
+    list_filter = (
+        ('match', AutocompleteFilter), ('batsman', AutocompleteFilter), ('bowler', AutocompleteFilter),
+        'is_wicket', 'is_wide', 'is_no_ball',
+    )
+    search_fields = ('match__name', 'batsman__name', 'bowler__name')
+    search_help_text = f'Player or match name. "{COMMENTARY_SEARCH_PREFIX} <text>" searches commentary, players and venue through the full-text index.'
     raw_id_fields = ('match', 'batsman', 'bowler')
+    list_select_related = ()
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_related()
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term.lower().startswith(COMMENTARY_SEARCH_PREFIX):
+            return related_name_search(queryset, term, ('batsman', 'bowler'), 'match'), False
+        # The index, not a LIKE scan over every ball's commentary
+        return search.filter_balls(queryset, term[len(COMMENTARY_SEARCH_PREFIX):]), False
+
+    actions = ['rebuild_innings']
+
+    @admin.action(description='Rebuild innings totals for the selected balls\' matches')
+    def rebuild_innings(self, request, queryset):
+        match_ids = set(queryset.values_list('match_id', flat=True))
+        for match_id in match_ids:
+            innings.rebuild_match(match_id)
+        self.message_user(request, f"Rebuilt innings totals for {len(match_ids)} match(es).")
+
+@admin.register(InningsScore)
+class InningsScoreAdmin(admin.ModelAdmin):
+    list_display = ('match', 'batting_team', 'runs', 'wickets', 'overs', 'wides', 'no_balls', 'updated_at')
+    raw_id_fields = ('match', 'batting_team')
+    list_select_related = ('match__team1', 'match__team2', 'batting_team')
+    # Totals are maintained from Ball data; edit the balls instead
+    readonly_fields = ('runs', 'wickets', 'legal_balls', 'wides', 'no_balls', 'over_runs', 'over_wickets', 'last_ball_id')
+
+@admin.register(PlayerCareerStats)
+class PlayerCareerStatsAdmin(admin.ModelAdmin):
+    list_display = ('player', 'matches', 'runs', 'wickets', 'strike_rate', 'economy', 'updated_at')
+    list_select_related = ('player', 'player__team')
+    search_fields = ('player__name',)
+    # Maintained from PlayerMatchPerformance; edit the performances instead
+    readonly_fields = ('player', 'matches', 'runs', 'wickets', 'balls_faced', 'balls_bowled', 'runs_conceded', 'dismissals')
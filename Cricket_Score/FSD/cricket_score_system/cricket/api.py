@@ -0,0 +1,562 @@
+# cricket/api.py
+
+"""
+JSON endpoints used by the match pages' JavaScript.
+"""
+
+import json
+
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET, require_POST
+
+from . import commentary, graphs, innings, leaderboards, matchups, prediction, scoring, search, simulation
+from .cache import match_version
+from .live import get_broadcaster
+from .models import Match, Player, PlayerMatchPerformance, Team
+from .pagination import KeysetPaginator, match_filters, page_size
+
+# Cap on deliveries returned in one update; a client far behind gets the latest ones
+LIVE_UPDATE_MAX_BALLS = 60
+# Rendered update bodies are shared by every viewer polling the same match and cursor
+LIVE_UPDATE_CACHE_TTL = 60
+# Seconds between SSE keep-alive comments, so proxies don't close idle streams
+STREAM_KEEPALIVE = 15
+
+
+def _etag_matches(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(',')]
+    return etag in candidates or '*' in candidates
+
+
+def serialize_ball(ball):
+    """
+    A delivery in the shape the commentary list's JavaScript renders.
+    """
+    return {
+        'id': ball.pk,
+        'sequence': ball.sequence,
+        'innings': ball.innings,
+        'over': ball.over,
+        'batsman_name': ball.batsman.name,
+        'bowler_name': ball.bowler.name,
+        'runs': ball.runs,
+        'is_wicket': ball.is_wicket,
+        'is_wide': ball.is_wide,
+        'is_no_ball': ball.is_no_ball,
+        'commentary': ball.commentary,
+    }
+
+
+def serialize_innings(state):
+    return {
+        'batting_team_id': state.batting_team_id,
+        'runs': state.runs,
+        'wickets': state.wickets,
+        'overs': state.overs,
+        'extras': state.extras,
+    }
+
+
+def serialize_match(match):
+    return {
+        'id': match.pk,
+        'name': str(match),
+        'team1': {'id': match.team1_id, 'name': match.team1.name},
+        'team2': {'id': match.team2_id, 'name': match.team2.name},
+        'date': match.date.isoformat(),
+        'venue': match.venue,
+        'status': match.status,
+        'winner_id': match.winner_id,
+    }
+
+
+def serialize_performance(performance):
+    return {
+        'match': serialize_match(performance.match),
+        'runs_scored': performance.runs_scored,
+        'balls_faced': performance.balls_faced,
+        'wickets_taken': performance.wickets_taken,
+        'overs_bowled': performance.overs_bowled,
+        'runs_conceded': performance.runs_conceded,
+        'is_out': performance.is_out,
+    }
+
+
+def serialize_matchup_stats(row):
+    return {
+        'balls': row.balls,
+        'runs': row.runs,
+        'dismissals': row.dismissals,
+        'dots': row.dots,
+        'fours': row.fours,
+        'sixes': row.sixes,
+        'boundaries': row.boundaries,
+        'strike_rate': row.strike_rate,
+        'average': row.average,
+        'dot_percentage': row.dot_percentage,
+    }
+
+
+def serialize_player_matchup(row):
+    return {
+        'batsman': {'id': row.batsman_id, 'name': row.batsman.name},
+        'bowler': {'id': row.bowler_id, 'name': row.bowler.name},
+        **serialize_matchup_stats(row),
+    }
+
+
+def serialize_team_matchup(row):
+    return {
+        'batting_team': {'id': row.batting_team_id, 'name': row.batting_team.name},
+        'bowling_team': {'id': row.bowling_team_id, 'name': row.bowling_team.name},
+        **serialize_matchup_stats(row),
+    }
+
+
+def _page_response(page, serialize):
+    return JsonResponse({
+        'success': True,
+        'results': [serialize(obj) for obj in page],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    })
+
+
+@require_GET
+def match_list(request):
+    """
+    Keyset-paged match list, newest first: /api/matches/?cursor=&page_size=
+    Takes the same status/team/venue/from/to filters as the all matches page.
+    """
+    try:
+        matches = Match.objects.with_teams().filtered(**match_filters(request.GET))
+        page = KeysetPaginator(matches, per_page=page_size(request.GET)).page(request.GET.get('cursor'))
+    except ValueError as error:
+        return JsonResponse({'success': False, 'message': str(error)}, status=400)
+    return _page_response(page, serialize_match)
+
+
+@require_GET
+def player_matches(request, player_id):
+    """
+    Keyset-paged performances of one player, newest match first:
+    /api/players/<id>/matches/?cursor=&page_size=
+    """
+    player = get_object_or_404(Player, pk=player_id)
+    performances = PlayerMatchPerformance.objects.with_match().filter(player=player)
+    paginator = KeysetPaginator(performances, 'match_date', 'match_id', per_page=page_size(request.GET))
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except ValueError as error:
+        return JsonResponse({'success': False, 'message': str(error)}, status=400)
+    return _page_response(page, serialize_performance)
+
+
+@require_GET
+def player_matchups(request, player_id):
+    """
+    A player's top matchups from the index, both ways:
+    /api/players/<id>/matchups/ -> {'batting': [...], 'bowling': [...]}
+    """
+    player = get_object_or_404(Player, pk=player_id)
+    rows = matchups.player_matchups(player.pk)
+    return JsonResponse({
+        'success': True,
+        'player_id': player.pk,
+        **{side: [serialize_player_matchup(row) for row in side_rows] for side, side_rows in rows.items()},
+    })
+
+
+@require_GET
+def player_matchup(request, batsman_id, bowler_id):
+    """
+    One batsman against one bowler: /api/matchups/players/<batsman_id>/<bowler_id>/.
+    A single unique-index lookup; zeros if they have never met.
+    """
+    players = Player.objects.in_bulk([batsman_id, bowler_id])
+    if batsman_id not in players or bowler_id not in players:
+        return JsonResponse({'success': False, 'message': "Player not found."}, status=404)
+    row = matchups.player_matchup(batsman_id, bowler_id)
+    row.batsman, row.bowler = players[batsman_id], players[bowler_id]
+    return JsonResponse({'success': True, **serialize_player_matchup(row)})
+
+
+@require_GET
+def team_matchup(request, team_id, other_team_id):
+    """
+    Head to head of two teams, each batting against the other:
+    /api/matchups/teams/<team_id>/<other_team_id>/
+    """
+    teams = Team.objects.in_bulk([team_id, other_team_id])
+    if team_id not in teams or other_team_id not in teams:
+        return JsonResponse({'success': False, 'message': "Team not found."}, status=404)
+    rows = matchups.head_to_head(team_id, other_team_id)
+    for row in rows:
+        row.batting_team, row.bowling_team = teams[row.batting_team_id], teams[row.bowling_team_id]
+    return JsonResponse({'success': True, 'innings': [serialize_team_matchup(row) for row in rows]})
+
+
+def _board_request(request, stat):
+    if stat not in leaderboards.BOARDS:
+        raise ValueError(f"Unknown leaderboard '{stat}'; use one of {', '.join(leaderboards.BOARDS)}.")
+    return leaderboards.parse_scope(request.GET)
+
+
+@require_GET
+def leaderboard(request, stat):
+    """
+    The top of one board, best first:
+    /api/leaderboards/<runs|wickets|strike_rate|economy>/?team=|season=|venue=&limit=
+    """
+    try:
+        scope, value = _board_request(request, stat)
+        limit = min(max(int(request.GET.get('limit', leaderboards.TOP_PLAYERS)), 1), leaderboards.MAX_TOP_PLAYERS)
+    except ValueError as error:
+        return JsonResponse({'success': False, 'message': str(error)}, status=400)
+    entries = leaderboards.with_players({stat: leaderboards.top(stat, scope, value, limit)})[stat]
+    return JsonResponse({
+        'success': True,
+        'board': stat,
+        'scope': scope,
+        'value': value,
+        'results': [
+            {'rank': entry['rank'], 'player': {'id': entry['player'].pk, 'name': entry['player'].name}, 'score': entry['score']}
+            for entry in entries
+        ],
+    })
+
+
+@require_GET
+def leaderboard_rank(request, stat, player_id):
+    """
+    Where one player stands on a board:
+    /api/leaderboards/<stat>/players/<id>/?team=|season=|venue=
+    """
+    try:
+        scope, value = _board_request(request, stat)
+    except ValueError as error:
+        return JsonResponse({'success': False, 'message': str(error)}, status=400)
+    player = get_object_or_404(Player, pk=player_id)
+    standing = leaderboards.player_rank(player.pk, stat, scope, value)
+    if standing is None:
+        return JsonResponse({'success': False, 'message': f"{player.name} is not on this leaderboard."}, status=404)
+    return JsonResponse({'success': True, 'board': stat, 'scope': scope, 'value': value, 'player_id': player.pk, **standing})
+
+
+@require_GET
+def search_balls(request):
+    """
+    Deliveries matching a full-text search, most relevant first:
+    /api/search/?q=sixes by Pandey&page=&page_size=
+    """
+    query = request.GET.get('q', '').strip()
+    try:
+        page = search.page_number(request.GET)
+    except ValueError as error:
+        return JsonResponse({'success': False, 'message': str(error)}, status=400)
+    if not query:
+        return JsonResponse({'success': False, 'message': "q is required."}, status=400)
+    results = search.search(query, page, page_size(request.GET, default=search.SEARCH_PAGE_SIZE))
+    return JsonResponse({
+        'success': True,
+        'query': query,
+        'terms': results.terms,
+        'page': results.page,
+        'next_page': results.page + 1 if results.has_next else None,
+        'results': [
+            {**serialize_ball(ball), 'match': {'id': ball.match_id, 'name': str(ball.match), 'venue': ball.match.venue}}
+            for ball in results.balls
+        ],
+    })
+
+
+def build_match_update(match, since):
+    """
+    Everything that changed in a match after delivery number `since`:
+    current scores, new deliveries (oldest first) and the over-by-over graph.
+    A client that is only a few balls behind gets the graph as a tail from the
+    first over those balls touched; otherwise the whole chart is sent.
+    """
+    snapshot = innings.match_snapshot(match)
+    series = graphs.match_series(match, snapshot)
+
+    new_balls = list(
+        match.balls.with_players()
+        .filter(sequence__gt=since)
+        .order_by('-sequence')[:LIVE_UPDATE_MAX_BALLS + 1]
+    )
+    truncated = len(new_balls) > LIVE_UPDATE_MAX_BALLS
+    new_balls = new_balls[:LIVE_UPDATE_MAX_BALLS]
+    new_balls.reverse()
+
+    if since and new_balls and not truncated:
+        graph = {'graph_tail': graphs.series_tail(match, series, min(ball.over_number for ball in new_balls))}
+    else:
+        graph = {'graph_data': graphs.chart_data(match, series)}
+    return {
+        'success': True,
+        'match_id': match.pk,
+        'status': match.status,
+        'winner_id': match.winner_id,
+        'cursor': new_balls[-1].sequence if new_balls else since,
+        'team1_score': snapshot['team1_score'],
+        'team2_score': snapshot['team2_score'],
+        'innings': [serialize_innings(state) for state in snapshot['innings'].values()],
+        **prediction.match_prediction(match, snapshot),
+        'new_balls': [serialize_ball(ball) for ball in new_balls],
+        'truncated': truncated,
+        **graph,
+    }
+
+
+@require_GET
+def match_update(request, match_id):
+    """
+    Live score delta for a match: /api/matches/<id>/update/?since=<delivery sequence>.
+
+    The response carries a strong ETag built from the match version and the
+    cursor. A poll whose If-None-Match still matches gets a bodyless 304 without
+    any database queries; otherwise the body is served from a cache shared by
+    every viewer at the same cursor.
+    """
+    try:
+        since = max(int(request.GET.get('since', 0)), 0)
+    except ValueError:
+        return JsonResponse({'success': False, 'message': "'since' must be a delivery sequence number."}, status=400)
+
+    version = match_version(match_id)
+    if version == "missing":
+        return JsonResponse({'success': False, 'message': "Match not found."}, status=404)
+
+    etag = f'"{match_id}-{version}-{since}"'
+    if _etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        cache_key = f"cricket:match-update:{match_id}:{version}:{since}"
+        body = cache.get(cache_key)
+        if body is None:
+            match = Match.objects.with_teams().get(pk=match_id)
+            body = json.dumps(build_match_update(match, since))
+            cache.set(cache_key, body, LIVE_UPDATE_CACHE_TTL)
+        response = HttpResponse(body, content_type='application/json')
+
+    response['ETag'] = etag
+    # Clients may keep the body but must revalidate before reusing it
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@require_GET
+def match_commentary(request, match_id):
+    """
+    Ball-by-ball commentary, newest first, a few whole overs per page:
+    /api/matches/<id>/commentary/?before=<delivery sequence>&overs=<n>.
+    Without `before` it starts from the latest delivery; each page gives the
+    `before` of the next older one.
+    """
+    try:
+        before = int(request.GET['before']) if request.GET.get('before') else None
+    except ValueError:
+        return JsonResponse({'success': False, 'message': "'before' must be a delivery sequence number."}, status=400)
+    if not Match.objects.filter(pk=match_id).exists():
+        return JsonResponse({'success': False, 'message': "Match not found."}, status=404)
+
+    page = commentary.commentary_page(match_id, before, commentary.over_count(request.GET))
+    return JsonResponse({
+        'success': True,
+        'match_id': match_id,
+        'balls': [serialize_ball(ball) for ball in page.balls],
+        'next_before': page.next_before,
+        'has_more': page.has_more,
+    })
+
+
+@require_GET
+def match_simulation(request, match_id):
+    """
+    Monte Carlo finish of a live match: /api/matches/<id>/simulate/?n=<simulations>,
+    rounded up to one of simulation.SIMULATION_COUNTS. Returns win probabilities
+    with 95% bands and the spread of both innings totals.
+    """
+    try:
+        n = int(request.GET.get('n', simulation.DEFAULT_SIMULATIONS))
+    except ValueError:
+        return JsonResponse({'success': False, 'message': "'n' must be a number."}, status=400)
+    n = simulation.simulation_count(n)
+
+    match = get_object_or_404(Match.objects.with_teams(), pk=match_id)
+    result = simulation.simulate_match(match, innings.match_snapshot(match), n)
+    if result is None:
+        return JsonResponse({'success': False, 'message': "Match is already completed."}, status=409)
+    return JsonResponse(result)
+
+
+@require_GET
+def match_graph(request, match_id):
+    """
+    Graph series of a match: /api/matches/<id>/graph/?from_over=<over>.
+    Without from_over, every over of every innings; with it, only the tail
+    from that over, for appending to a live chart. ETagged like live updates.
+    """
+    try:
+        from_over = max(int(request.GET.get('from_over', 0)), 0)
+    except ValueError:
+        return JsonResponse({'success': False, 'message': "'from_over' must be an over number."}, status=400)
+
+    version = match_version(match_id)
+    if version == "missing":
+        return JsonResponse({'success': False, 'message': "Match not found."}, status=404)
+
+    etag = f'"graph-{match_id}-{version}-{from_over}"'
+    if _etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        match = Match.objects.with_teams().get(pk=match_id)
+        series = graphs.match_series(match)
+        response = JsonResponse({'success': True, 'match_id': match.pk, **graphs.series_tail(match, series, from_over)})
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@require_GET
+def graph_comparison(request):
+    """
+    One graph series of several matches on shared axes:
+    /api/graphs/compare/?matches=<id>,<id>,...&series=worm|manhattan|run_rate.
+    Each match's series comes from its cache entry; only stale ones are re-aggregated.
+    """
+    kind = request.GET.get('series', 'worm')
+    if kind not in graphs.SERIES:
+        return JsonResponse({'success': False, 'message': f"'series' must be one of {', '.join(graphs.SERIES)}."}, status=400)
+    try:
+        match_ids = list(dict.fromkeys(int(value) for value in request.GET.get('matches', '').split(',') if value.strip()))
+    except ValueError:
+        return JsonResponse({'success': False, 'message': "'matches' must be a comma-separated list of match ids."}, status=400)
+    if not 1 <= len(match_ids) <= graphs.MAX_COMPARE_MATCHES:
+        return JsonResponse({'success': False, 'message': f"Compare between 1 and {graphs.MAX_COMPARE_MATCHES} matches."}, status=400)
+
+    matches = {match.pk: match for match in Match.objects.with_teams().filter(pk__in=match_ids).prefetch_related('innings_scores')}
+    missing = [match_id for match_id in match_ids if match_id not in matches]
+    if missing:
+        return JsonResponse({'success': False, 'message': f"Unknown match id(s): {', '.join(map(str, missing))}."}, status=404)
+    matches = [matches[match_id] for match_id in match_ids]
+    chart = graphs.comparison_chart(matches, graphs.many_series(matches), kind)
+    return JsonResponse({'success': True, 'series': kind, **chart})
+
+
+def ball_event(ball):
+    """
+    Push event for a newly recorded delivery. Same shape as a match update,
+    so the page applies pushed and polled data the same way.
+    """
+    return deliveries_event(ball.match_id, [ball])
+
+
+def deliveries_event(match_id, balls):
+    """
+    One push event for several deliveries recorded together, oldest first.
+    """
+    match = Match.objects.with_teams().get(pk=match_id)
+    snapshot = innings.match_snapshot(match)
+    return {
+        'type': 'ball',
+        'match_id': match.pk,
+        'status': match.status,
+        'cursor': balls[-1].sequence,
+        'team1_score': snapshot['team1_score'],
+        'team2_score': snapshot['team2_score'],
+        **prediction.match_prediction(match, snapshot),
+        'new_balls': [serialize_ball(ball) for ball in balls],
+        'graph_tail': graphs.series_tail(
+            match, graphs.match_series(match, snapshot), min(ball.over_number for ball in balls)
+        ),
+    }
+
+
+@require_POST
+def record_deliveries(request, match_id):
+    """
+    Scorer endpoint: POST /api/matches/<id>/deliveries/ with one delivery,
+    a list, or {"deliveries": [...]}; each one
+    {"batsman_id", "bowler_id", "runs", "is_wicket", "is_wide", "is_no_ball",
+    "commentary", "over" (optional, checked against the next ball)}.
+
+    Needs the cricket.add_ball permission. All deliveries are written or
+    none. Send an Idempotency-Key header to make retries safe: a repeat of a
+    recorded request gets the original response back.
+    """
+    if not request.user.has_perm('cricket.add_ball'):
+        return JsonResponse({'success': False, 'message': "Scoring needs the add ball permission."}, status=403)
+    key = request.headers.get('Idempotency-Key', '').strip()
+    if len(key) > scoring.IDEMPOTENCY_KEY_MAX_LENGTH:
+        return JsonResponse({'success': False, 'message': "Idempotency-Key is too long."}, status=400)
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'success': False, 'message': "The body must be JSON."}, status=400)
+    body_hash = scoring.request_hash(payload)
+
+    with transaction.atomic():
+        # Requests for one match queue here; other matches aren't held up
+        match = get_object_or_404(Match.objects.select_for_update(), pk=match_id)
+        try:
+            previous = scoring.stored_response(match, key, body_hash) if key else None
+            if previous is not None:
+                response = JsonResponse(previous.response, status=previous.status_code)
+                response['Idempotent-Replayed'] = 'true'
+                return response
+            balls, scores = scoring.record_deliveries(match, payload)
+        except scoring.ScoringError as error:
+            return JsonResponse({'success': False, 'message': str(error), 'index': error.index}, status=error.status)
+
+        body = {
+            'success': True,
+            'match_id': match.pk,
+            'cursor': balls[-1].sequence,
+            'balls': [serialize_ball(ball) for ball in balls],
+            'innings': [serialize_innings(score) for score in scores],
+        }
+        if key:
+            scoring.store_response(match, key, body_hash, 201, body)
+        transaction.on_commit(
+            lambda: get_broadcaster().publish(match.pk, deliveries_event(match.pk, balls)), robust=True
+        )
+    return JsonResponse(body, status=201)
+
+
+async def _event_stream(match_id):
+    yield "retry: 3000\n\n"
+    async for message in get_broadcaster().listen(match_id, timeout=STREAM_KEEPALIVE):
+        if message is None:
+            yield ": keep-alive\n\n"
+        else:
+            yield f"data: {message}\n\n"
+
+
+async def match_stream(request, match_id):
+    """
+    Server-Sent Events stream of a match's live events: /api/matches/<id>/stream/.
+    Every connected viewer is fed from one in-process subscription per match.
+    Needs an ASGI server (see cricket_score_system/asgi.py); under WSGI the
+    page falls back to polling the update endpoint.
+    """
+    if request.method != 'GET':
+        return HttpResponse(status=405, headers={'Allow': 'GET'})
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would be tied up for the whole life of the stream
+        return JsonResponse({'success': False, 'message': "Live streaming requires the ASGI server."}, status=503)
+    if not await Match.objects.filter(pk=match_id).aexists():
+        return JsonResponse({'success': False, 'message': "Match not found."}, status=404)
+
+    response = StreamingHttpResponse(_event_stream(match_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no' # Stop nginx from buffering the stream
+    return response
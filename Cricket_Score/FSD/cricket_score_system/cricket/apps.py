@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class CricketConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cricket'
+
+    def ready(self):
+        # Connect model signal handlers (innings totals etc.)
+        from . import signals  # noqa: F401
+        # Lets the metrics middleware time template rendering
+        from .instrumentation import install_template_timer
+        install_template_timer()
@@ -0,0 +1,397 @@
+# cricket/ballstore.py
+
+"""
+Columnar, memory-mapped copy of the Ball table for analytics.
+
+Scanning every delivery through the ORM means a model instance per row, each
+with its commentary text and two related players. The ball store keeps the
+same data as fixed-width typed columns, one file per column, opened with
+numpy.memmap, so a scan over millions of deliveries is a few vectorised
+operations on pages the OS maps in on demand:
+
+  ball_id          int64   Ball primary key, ascending
+  match_id         int32
+  batsman_id       int32
+  bowler_id        int32
+  batting_team_id  int32   the batsman's team
+  sequence         int32   the ball's place in its match (Ball.sequence)
+  innings          int8
+  runs             int8    off the bat
+  flags            uint8   bit field: WICKET | WIDE | NO_BALL
+  over             int16   over_number * 10 + ball_in_over (2.3 -> 23)
+  commentary_end   int64   end offset of the ball's text in commentary.bin
+
+Commentary is stored UTF-8 encoded back to back in commentary.bin and only
+decoded for the rows asked for. manifest.json holds the number of complete
+rows; readers never look past it, so a sync that dies half way leaves the
+store readable and the next sync cuts the partial rows off.
+
+sync_ball_store() appends the balls recorded since the last sync. If rows
+already exported were edited or deleted, or with full=True, the store is
+rebuilt in a new directory and swapped in. Edits and deletes are found in the
+BallChange log the Ball signals write, so a sync with nothing to do costs a
+couple of indexed queries however many balls there are; each sync consumes
+the log entries it saw, so keep one store per database.
+
+Changes that skip the signals (queryset update(), raw SQL) aren't logged.
+verify=True (`sync_ball_store --verify`, e.g. nightly) also compares the
+checksum the manifest keeps of every column with one the database works out
+over the exported ids: per column, the sum of each row's value times a weight
+taken from its id (so swapping values between rows shows too), with
+commentary counted as the first hex digits of its MD5. That is a full scan.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Case, Count, F, IntegerField, Sum, Value, When
+from django.db.models.functions import MD5, Mod, StrIndex, Substr
+
+from .models import Ball, BallChange
+
+FORMAT_VERSION = 3
+COLUMNS = {
+    'ball_id': np.int64,
+    'match_id': np.int32,
+    'batsman_id': np.int32,
+    'bowler_id': np.int32,
+    'batting_team_id': np.int32,
+    'sequence': np.int32,
+    'innings': np.int8,
+    'runs': np.int8,
+    'flags': np.uint8,
+    'over': np.int16,
+    'commentary_end': np.int64,
+}
+WICKET, WIDE, NO_BALL = 1, 2, 4
+MANIFEST = 'manifest.json'
+COMMENTARY = 'commentary.bin'
+EXPORT_CHUNK = 50000 # Balls encoded and appended at a time
+# Row weights are id % CHECKSUM_MODULUS + 1, small enough that no sum overflows
+CHECKSUM_MODULUS = 1021
+DIGEST_DIGITS = 4 # Hex digits of a commentary's MD5 that go into the checksum
+CHECKSUM_COLUMNS = (
+    'match_id', 'batsman_id', 'bowler_id', 'batting_team_id', 'sequence', 'innings', 'runs', 'flags', 'over',
+    'commentary',
+)
+
+BALL_FIELDS = (
+    'id', 'match_id', 'batsman_id', 'bowler_id', 'batsman__team_id', 'sequence', 'innings',
+    'runs', 'is_wicket', 'is_wide', 'is_no_ball', 'over_number', 'ball_in_over', 'commentary',
+)
+
+
+class BallStoreError(Exception):
+    pass
+
+
+def store_path():
+    return Path(getattr(settings, 'CRICKET_BALL_STORE', settings.BASE_DIR / 'ball_store'))
+
+
+def _read_manifest(path):
+    try:
+        with open(path / MANIFEST, encoding='utf-8') as handle:
+            manifest = json.load(handle)
+    except FileNotFoundError:
+        return None
+    return manifest if manifest.get('format') == FORMAT_VERSION else None
+
+
+def _write_manifest(path, manifest):
+    tmp = path / f"{MANIFEST}.tmp"
+    tmp.write_text(json.dumps(manifest), encoding='utf-8')
+    os.replace(tmp, path / MANIFEST) # The commit point of a sync
+
+
+def _empty_manifest():
+    return {
+        'format': FORMAT_VERSION, 'rows': 0, 'last_ball_id': 0, 'commentary_bytes': 0,
+        'checksum': dict.fromkeys(CHECKSUM_COLUMNS, 0),
+    }
+
+
+def _truncate(path, manifest):
+    # Drop anything a failed sync appended after the last committed row
+    for name, dtype in COLUMNS.items():
+        with open(path / f"{name}.bin", 'ab') as handle:
+            handle.truncate(manifest['rows'] * np.dtype(dtype).itemsize)
+    with open(path / COMMENTARY, 'ab') as handle:
+        handle.truncate(manifest['commentary_bytes'])
+
+
+def _chunks(after_ball_id):
+    rows = Ball.objects.filter(id__gt=after_ball_id).order_by('id').values_list(*BALL_FIELDS)
+    batch = []
+    for row in rows.iterator(chunk_size=5000):
+        batch.append(row)
+        if len(batch) == EXPORT_CHUNK:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def encode_balls(rows, commentary_start=0):
+    """
+    Column arrays and the commentary blob for a batch of BALL_FIELDS rows.
+    """
+    (ids, matches, batsmen, bowlers, teams, sequences, innings,
+     runs, wickets, wides, no_balls, over_numbers, balls_in_over, texts) = zip(*rows)
+    blobs = [(text or '').encode('utf-8') for text in texts]
+    lengths = np.fromiter(map(len, blobs), dtype=np.int64, count=len(blobs))
+    flags = (
+        np.array(wickets, dtype=np.uint8) * WICKET
+        | np.array(wides, dtype=np.uint8) * WIDE
+        | np.array(no_balls, dtype=np.uint8) * NO_BALL
+    )
+    columns = {
+        'ball_id': np.array(ids, dtype=np.int64),
+        'match_id': np.array(matches, dtype=np.int32),
+        'batsman_id': np.array(batsmen, dtype=np.int32),
+        'bowler_id': np.array(bowlers, dtype=np.int32),
+        'batting_team_id': np.array(teams, dtype=np.int32),
+        'sequence': np.array(sequences, dtype=np.int32),
+        'innings': np.array(innings, dtype=np.int8),
+        'runs': np.clip(runs, 0, 127).astype(np.int8),
+        'flags': flags,
+        'over': np.array(over_numbers, dtype=np.int16) * 10 + np.array(balls_in_over, dtype=np.int16),
+        'commentary_end': commentary_start + np.cumsum(lengths),
+    }
+    return columns, b''.join(blobs)
+
+
+def commentary_digest(text):
+    return int(hashlib.md5((text or '').encode('utf-8')).hexdigest()[:DIGEST_DIGITS], 16)
+
+
+def _checksum(columns, texts):
+    weights = columns['ball_id'] % CHECKSUM_MODULUS + 1
+    values = {name: columns[name] for name in CHECKSUM_COLUMNS if name != 'commentary'}
+    values['commentary'] = np.fromiter(map(commentary_digest, texts), dtype=np.int64, count=len(texts))
+    return {name: int((weights * column.astype(np.int64)).sum()) for name, column in values.items()}
+
+
+def _append(path, manifest, after_ball_id):
+    added = 0
+    for batch in _chunks(after_ball_id):
+        columns, blob = encode_balls(batch, manifest['commentary_bytes'])
+        for name, values in columns.items():
+            with open(path / f"{name}.bin", 'ab') as handle:
+                handle.write(values.tobytes())
+        with open(path / COMMENTARY, 'ab') as handle:
+            handle.write(blob)
+        checksum = _checksum(columns, [row[-1] for row in batch])
+        manifest.update(
+            rows=manifest['rows'] + len(batch),
+            last_ball_id=int(columns['ball_id'][-1]),
+            commentary_bytes=manifest['commentary_bytes'] + len(blob),
+            checksum={name: manifest['checksum'][name] + checksum[name] for name in CHECKSUM_COLUMNS},
+        )
+        _write_manifest(path, manifest)
+        added += len(batch)
+    return added
+
+
+def _hex_digits(expression, count):
+    # The leading hex digits of a string as a number, in portable SQL
+    value = Value(0)
+    for position in range(1, count + 1):
+        digit = StrIndex(Value('0123456789abcdef'), Substr(expression, position, 1)) - 1
+        value = value * 16 + digit
+    return value
+
+
+def _database_checksum(balls):
+    """
+    The manifest's checksum, and the row count, worked out by the database.
+    """
+    weight = Mod(F('id'), CHECKSUM_MODULUS) + 1
+    values = {
+        'match_id': F('match_id'),
+        'batsman_id': F('batsman_id'),
+        'bowler_id': F('bowler_id'),
+        'batting_team_id': F('batsman__team_id'),
+        'sequence': F('sequence'),
+        'innings': F('innings'),
+        'runs': F('runs'),
+        'flags': (
+            Case(When(is_wicket=True, then=Value(WICKET)), default=Value(0))
+            + Case(When(is_wide=True, then=Value(WIDE)), default=Value(0))
+            + Case(When(is_no_ball=True, then=Value(NO_BALL)), default=Value(0))
+        ),
+        'over': F('over_number') * 10 + F('ball_in_over'),
+        'commentary': _hex_digits(MD5('commentary'), DIGEST_DIGITS),
+    }
+    totals = balls.order_by().aggregate(
+        rows=Count('id'),
+        **{f'total_{name}': Sum(weight * value, output_field=IntegerField()) for name, value in values.items()},
+    )
+    return totals['rows'], {name: totals[f'total_{name}'] or 0 for name in CHECKSUM_COLUMNS}
+
+
+def record_change(ball_id=None):
+    """
+    Logs an edit or delete of a ball (of many balls when ball_id is None) for
+    the next sync. Nothing is logged while there is no store to sync.
+    """
+    if (store_path() / MANIFEST).exists():
+        BallChange.objects.create(ball_id=ball_id)
+
+
+def _pending_changes(manifest):
+    """
+    The ids of the logged changes, and whether any of them touch exported balls.
+    """
+    changes = list(BallChange.objects.values_list('id', 'ball_id'))
+    return [pk for pk, _ in changes], any(ball_id is None or ball_id <= manifest['last_ball_id'] for _, ball_id in changes)
+
+
+def _checksum_differs(manifest):
+    rows, checksum = _database_checksum(Ball.objects.filter(id__lte=manifest['last_ball_id']))
+    return rows != manifest['rows'] or checksum != manifest['checksum']
+
+
+@dataclass
+class SyncResult:
+    added: int
+    rows: int
+    rebuilt: bool
+
+
+def _rebuild(path):
+    building = path.with_name(f"{path.name}.building")
+    shutil.rmtree(building, ignore_errors=True)
+    building.mkdir(parents=True)
+    manifest = _empty_manifest()
+    _truncate(building, manifest)
+    _write_manifest(building, manifest)
+    _append(building, manifest, 0)
+
+    # Open memmaps keep reading the old files until they are closed
+    retired = path.with_name(f"{path.name}.old")
+    shutil.rmtree(retired, ignore_errors=True)
+    if path.exists():
+        path.rename(retired)
+    building.rename(path)
+    shutil.rmtree(retired, ignore_errors=True)
+    return manifest
+
+
+def sync_ball_store(path=None, full=False, verify=False):
+    """
+    Brings the store at `path` (settings.CRICKET_BALL_STORE) up to date with
+    the Ball table. verify=True also rebuilds if the store's checksum doesn't
+    match the database's. Returns a SyncResult.
+    """
+    path = Path(path or store_path())
+    manifest = _read_manifest(path)
+    # Read before exporting: a change logged meanwhile stays for the next sync
+    seen, stale = _pending_changes(manifest or _empty_manifest())
+    if full or manifest is None or stale or (verify and _checksum_differs(manifest)):
+        manifest = _rebuild(path)
+        result = SyncResult(added=manifest['rows'], rows=manifest['rows'], rebuilt=True)
+    else:
+        _truncate(path, manifest)
+        added = _append(path, manifest, manifest['last_ball_id'])
+        result = SyncResult(added=added, rows=manifest['rows'], rebuilt=False)
+    if seen:
+        # Only the entries read above: one committed since may not be exported yet
+        BallChange.objects.filter(pk__in=seen).delete()
+    return result
+
+
+class BallStore:
+    """
+    Read-only view of a synced store. Columns are memory-mapped on first use
+    and returned as NumPy arrays without copying; store['runs'][mask] and
+    friends work as on any array.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path or store_path())
+        manifest = _read_manifest(self.path)
+        if manifest is None:
+            raise BallStoreError(f"No ball store at {self.path}; run `manage.py sync_ball_store` first.")
+        self.rows = manifest['rows']
+        self.last_ball_id = manifest['last_ball_id']
+        self._columns = {}
+
+    def __len__(self):
+        return self.rows
+
+    def _map(self, filename, dtype, count):
+        if count == 0: # mmap can't map an empty file
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self.path / filename, dtype=dtype, mode='r', shape=(count,))
+
+    def __getitem__(self, name):
+        if name not in self._columns:
+            if name not in COLUMNS:
+                raise KeyError(name)
+            self._columns[name] = self._map(f"{name}.bin", COLUMNS[name], self.rows)
+        return self._columns[name]
+
+    @property
+    def is_wicket(self):
+        return (self['flags'] & WICKET) != 0
+
+    @property
+    def is_wide(self):
+        return (self['flags'] & WIDE) != 0
+
+    @property
+    def is_no_ball(self):
+        return (self['flags'] & NO_BALL) != 0
+
+    @property
+    def is_legal(self):
+        return (self['flags'] & (WIDE | NO_BALL)) == 0
+
+    @property
+    def total_runs(self):
+        """
+        Runs off each delivery including the one-run penalty for wides and no-balls.
+        """
+        return self['runs'] + (~self.is_legal).astype(np.int16)
+
+    def rows_for_matches(self, match_ids):
+        return np.flatnonzero(np.isin(self['match_id'], match_ids))
+
+    def commentary(self, rows):
+        """
+        Commentary text of the given row positions, decoded on demand.
+        """
+        ends = self['commentary_end']
+        blob = self._map(COMMENTARY, np.uint8, int(ends[-1]) if self.rows else 0)
+        texts = []
+        for row in np.atleast_1d(rows):
+            start = int(ends[row - 1]) if row else 0
+            texts.append(bytes(blob[start:int(ends[row])]).decode('utf-8'))
+        return texts
+
+
+def player_totals(store, rows=None):
+    """
+    Career-style totals for every player in one scan:
+    {'player_id', 'runs_scored', 'balls_faced', 'wickets_taken', 'runs_conceded'},
+    each an array aligned on player_id. `rows` restricts the scan (a mask or
+    positions, e.g. from rows_for_matches).
+    """
+    select = (lambda column: column) if rows is None else (lambda column: column[rows])
+    batsmen, bowlers = select(store['batsman_id']), select(store['bowler_id'])
+    size = int(max(batsmen.max(initial=0), bowlers.max(initial=0))) + 1
+    totals = {
+        'runs_scored': np.bincount(batsmen, weights=select(store['runs']), minlength=size),
+        'balls_faced': np.bincount(batsmen, weights=~select(store.is_wide), minlength=size),
+        'wickets_taken': np.bincount(bowlers, weights=select(store.is_wicket), minlength=size),
+        'runs_conceded': np.bincount(bowlers, weights=select(store.total_runs), minlength=size),
+    }
+    played = np.flatnonzero(np.bincount(batsmen, minlength=size) + np.bincount(bowlers, minlength=size))
+    return {'player_id': played, **{name: column[played].astype(np.int64) for name, column in totals.items()}}
@@ -0,0 +1,217 @@
+# cricket/benchmarks.py
+
+"""
+Repeatable benchmarks for the pages, admin changelists, bulk loading and
+aggregation, meant to run against a synthetic league (cricket/synthetic.py)
+so every run sees the same data. `manage.py run_benchmarks` builds the
+league in a throwaway test database, runs the suite and compares it with a
+stored baseline.
+
+Each scenario is timed over a number of iterations, with the cache cleared
+before each one so pages are measured uncached, and reported as latency
+percentiles. One further run counts its queries and records its peak Python
+memory with tracemalloc; it is kept apart from the timed runs because
+tracing slows everything down. Scenarios that write run in a transaction
+that is rolled back, so they can be repeated.
+"""
+
+import json
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import career, ingest, leaderboards, matchups, rollup, synthetic
+from .models import Ball, Match, Player, PlayerCareerStats, PlayerMatchPerformance
+
+DEFAULT_ITERATIONS = 20
+# p95 latency and peak memory may grow this much before it counts as a regression
+DEFAULT_TOLERANCE = 0.25
+# Changes smaller than these are noise, whatever the percentage
+LATENCY_FLOOR_MS = 5.0
+MEMORY_FLOOR_KIB = 256
+INGEST_MATCHES = 10
+
+
+def baseline_path():
+    return Path(getattr(settings, 'CRICKET_BENCHMARK_BASELINE', settings.BASE_DIR / 'benchmarks' / 'baseline.json'))
+
+
+@dataclass
+class Scenario:
+    name: str
+    run: object # Called with no arguments
+    iterations: int = DEFAULT_ITERATIONS
+    writes: bool = False # Roll back after each run
+
+
+@dataclass
+class Result:
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    mean_ms: float
+    queries: int
+    peak_kib: int
+    iterations: int
+
+
+def _get(client, url, params=None):
+    def run():
+        response = client.get(url, params or {})
+        if response.status_code != 200:
+            raise AssertionError(f"{url} answered {response.status_code}")
+        response.content # Render lazily evaluated querysets too
+    return run
+
+
+def _rolled_back(run):
+    with transaction.atomic():
+        run()
+        transaction.set_rollback(True)
+
+
+def scenarios(seed=0):
+    """
+    The suite, built against whatever data is in the database: the busiest
+    match, the highest run-scorer and a superuser for the admin pages.
+    """
+    from django.contrib.auth.models import User
+
+    visitor = Client()
+    staff = Client()
+    admin, _ = User.objects.get_or_create(username='benchmark', defaults={'is_staff': True, 'is_superuser': True})
+    staff.force_login(admin)
+
+    match = Match.objects.annotate(total_balls=Count('balls')).order_by('-total_balls', 'pk').first()
+    player = PlayerCareerStats.objects.order_by('-runs', 'player_id').first()
+    player_id = player.player_id if player else Player.objects.values_list('id', flat=True).first()
+    team_id = Match.objects.values_list('team1_id', flat=True).first()
+
+    # New scorecards between two league sides; each import is rolled back, so they stay new
+    squads = synthetic.league_squads(2, seed)
+    incoming = [
+        synthetic.play_match(squads[0], squads[1], f"benchmark:{seed}:{number}", match.date if match else None, seed)
+        for number in range(INGEST_MATCHES)
+    ]
+    completed = list(Match.objects.filter(status='Completed').values_list('id', flat=True))
+
+    return [
+        Scenario('view: home', _get(visitor, reverse('home'))),
+        Scenario('view: all matches', _get(visitor, reverse('all_matches'))),
+        Scenario('view: all matches, completed', _get(visitor, reverse('all_matches'), {'status': 'Completed'})),
+        Scenario('view: team detail', _get(visitor, reverse('team_detail', args=[team_id]))),
+        Scenario('view: match detail', _get(visitor, reverse('match_detail', args=[match.pk]))),
+        Scenario('view: player stats', _get(visitor, reverse('player_stats', args=[player_id]))),
+        Scenario('api: match update', _get(visitor, reverse('api_match_update', args=[match.pk]))),
+        Scenario('admin: matches', _get(staff, reverse('admin:cricket_match_changelist'))),
+        Scenario('admin: players', _get(staff, reverse('admin:cricket_player_changelist'))),
+        Scenario('admin: performances', _get(staff, reverse('admin:cricket_playermatchperformance_changelist'))),
+        Scenario('admin: balls', _get(staff, reverse('admin:cricket_ball_changelist'))),
+        Scenario(f'ingest: {INGEST_MATCHES} matches', lambda: ingest.import_scorecards(incoming), iterations=5, writes=True),
+        Scenario('aggregate: rollup all matches', lambda: rollup.rollup_matches(completed), iterations=3, writes=True),
+        Scenario('aggregate: career stats', career.rebuild_career_stats, iterations=5, writes=True),
+        Scenario('aggregate: matchups', matchups.rebuild_matchups, iterations=5, writes=True),
+        Scenario('aggregate: leaderboards', leaderboards.rebuild_leaderboards, iterations=5),
+    ]
+
+
+def measure(scenario):
+    """
+    Times one scenario and takes its query count and peak memory. Returns a Result.
+    """
+    run = (lambda: _rolled_back(scenario.run)) if scenario.writes else scenario.run
+    cache.clear()
+    run() # Warm-up: imports, template loading, first connection
+    samples = []
+    for _ in range(scenario.iterations):
+        cache.clear()
+        started = time.perf_counter()
+        run()
+        samples.append((time.perf_counter() - started) * 1000)
+
+    cache.clear()
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return Result(
+        p50_ms=round(float(p50), 2), p95_ms=round(float(p95), 2), p99_ms=round(float(p99), 2),
+        mean_ms=round(float(np.mean(samples)), 2), queries=len(queries), peak_kib=peak // 1024,
+        iterations=scenario.iterations,
+    )
+
+
+def run_suite(selected=None, iterations=None, seed=0, progress=None):
+    """
+    Runs every scenario whose name contains one of `selected` (all by
+    default). `iterations` overrides each scenario's own count.
+    Returns {name: Result}.
+    """
+    results = {}
+    for scenario in scenarios(seed):
+        if selected and not any(part in scenario.name for part in selected):
+            continue
+        if iterations:
+            scenario.iterations = iterations
+        results[scenario.name] = measure(scenario)
+        if progress:
+            progress(scenario.name, results[scenario.name])
+    return results
+
+
+def data_size():
+    return {
+        'matches': Match.objects.count(),
+        'balls': Ball.objects.count(),
+        'players': Player.objects.count(),
+        'performances': PlayerMatchPerformance.objects.count(),
+    }
+
+
+def save_baseline(results, path=None, **meta):
+    path = Path(path or baseline_path())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    document = {**meta, 'results': {name: asdict(result) for name, result in results.items()}}
+    path.write_text(json.dumps(document, indent=2, sort_keys=True) + "\n", encoding='utf-8')
+    return path
+
+
+def load_baseline(path=None):
+    path = Path(path or baseline_path())
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Regressions of `results` against a baseline document, as readable lines:
+    any extra query, or p95 latency or peak memory grown by more than
+    `tolerance` (and more than the noise floors).
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        if result.queries > before['queries']:
+            regressions.append(f"{name}: {result.queries} queries, was {before['queries']}")
+        if result.p95_ms > before['p95_ms'] * (1 + tolerance) and result.p95_ms - before['p95_ms'] > LATENCY_FLOOR_MS:
+            regressions.append(f"{name}: p95 {result.p95_ms:.1f} ms, was {before['p95_ms']:.1f} ms")
+        if result.peak_kib > before['peak_kib'] * (1 + tolerance) and result.peak_kib - before['peak_kib'] > MEMORY_FLOOR_KIB:
+            regressions.append(f"{name}: peak memory {result.peak_kib} KiB, was {before['peak_kib']} KiB")
+    return regressions
@@ -0,0 +1,205 @@
+# cricket/cache.py
+
+"""
+Cache helpers shared by the views.
+
+A match's "version" is an opaque token that changes whenever its status,
+winner or innings totals change. Live endpoints key their ETags and cached responses
+on it, so an unchanged poll is answered from the cache without touching the ORM.
+
+Public pages and template fragments are keyed on per-model version counters
+instead: every save or delete of a Team, Player or Match bumps that model's
+counter (see cricket/signals.py; bulk writers skip the signals and bump it
+themselves), which moves every key built on it. Nothing is ever deleted;
+entries under old versions simply age out of the cache.
+"""
+
+import functools
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import HttpResponse
+
+# How long a version read back from the database may be trusted. Bumps clear the
+# cache directly; this only bounds staleness when each worker has its own
+# local-memory cache and therefore never sees another worker's bump.
+MATCH_VERSION_TTL = getattr(settings, 'CRICKET_MATCH_VERSION_TTL', 5)
+
+
+def _match_version_key(match_id):
+    return f"cricket:match-version:{match_id}"
+
+
+def _version_from_db(match_id):
+    from .models import Match
+
+    rows = (
+        Match.objects.filter(pk=match_id)
+        .values('status', 'winner_id')
+        .annotate(
+            innings=Count('innings_scores'),
+            last_ball=Max('innings_scores__last_ball_id'),
+            updated=Max('innings_scores__updated_at'),
+        )
+    )
+    row = next(iter(rows), None)
+    if row is None:
+        return "missing"
+    return _format_version(row['status'], row['winner_id'], row['innings'], row['last_ball'], row['updated'])
+
+
+def _format_version(status, winner_id, innings, last_ball, updated):
+    updated = updated.timestamp() if updated else 0
+    return f"{status}.{winner_id or 0}.{innings}.{last_ball or 0}.{updated:.6f}"
+
+
+def snapshot_version(match, snapshot):
+    """
+    The same token as match_version(), worked out from a match and its already
+    loaded snapshot (innings.match_snapshot) without another query.
+    """
+    states = snapshot['innings'].values()
+    updated = max((state.updated_at for state in states), default=None)
+    return _format_version(match.status, match.winner_id, len(states), snapshot['last_ball_id'], updated)
+
+
+def match_version(match_id):
+    """
+    Current version token for a match. A cache hit costs no queries.
+    """
+    key = _match_version_key(match_id)
+    version = cache.get(key)
+    if version is None:
+        version = _version_from_db(match_id)
+        cache.set(key, version, MATCH_VERSION_TTL)
+    return version
+
+
+def bump_match_version(match_id):
+    """
+    Drops the cached version once the current transaction commits. The next
+    read derives a new token from the updated innings totals, invalidating
+    every ETag and cached response built on the old one.
+    """
+    transaction.on_commit(lambda: cache.delete(_match_version_key(match_id)))
+
+
+# Rendered public pages and fragments. Versions move on every change, so this
+# only bounds how long unused entries linger.
+PAGE_CACHE_TTL = getattr(settings, 'CRICKET_PAGE_CACHE_TTL', 60 * 60)
+
+# What each cached fragment shows, and so which model versions it is keyed on
+FRAGMENT_MODELS = {
+    'match_card': ('match', 'team'),
+}
+
+
+class CacheMetrics:
+    """
+    Per-process hit/miss counters for each cached page and fragment.
+    """
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, hit):
+        with self._lock:
+            counts = self._counts.setdefault(name, {'hits': 0, 'misses': 0})
+            counts['hits' if hit else 'misses'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(counts) for name, counts in self._counts.items()}
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+cache_metrics = CacheMetrics()
+
+
+def _model_version_key(label):
+    return f"cricket:model-version:{label}"
+
+
+def model_versions(labels):
+    """
+    Current version counters for the given model labels ('match', 'team', ...),
+    in one cache round trip. A missing counter starts from the clock, so it
+    never repeats a value used before the cache was cleared.
+    """
+    keys = {label: _model_version_key(label) for label in labels}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for label, key in keys.items():
+        if key not in found:
+            cache.add(key, time.time_ns() // 1000, None)
+            found[key] = cache.get(key)
+        versions[label] = found[key]
+    return versions
+
+
+def bump_model_version(label):
+    """
+    Moves a model's version once the current transaction commits.
+    """
+    key = _model_version_key(label)
+
+    def bump():
+        try:
+            cache.incr(key)
+        except ValueError: # Never read yet, or evicted
+            cache.set(key, time.time_ns() // 1000, None)
+
+    transaction.on_commit(bump)
+
+
+def versioned_key(name, labels, *parts, versions=None):
+    """
+    Cache key for `name` that changes whenever any of the models in `labels`
+    changes. `parts` (ids, paths, ...) tell apart entries of the same name.
+    Pass `versions` (from model_versions) to reuse an earlier lookup.
+    """
+    versions = versions or model_versions(labels)
+    version = '.'.join(str(versions[label]) for label in labels)
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+    return f"cricket:{name}:{version}:{digest}"
+
+
+def versioned_page(name, labels, vary=None):
+    """
+    Caches a view's rendered GET responses under its model versions and the
+    full request path. `vary(request)` adds anything else the page depends on
+    (e.g. today's date). Only 200 responses are stored.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+            extra = vary(request) if vary else ''
+            key = versioned_key(f"page:{name}", labels, request.get_full_path(), extra)
+            cached = cache.get(key)
+            cache_metrics.record(f"page:{name}", cached is not None)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                response['X-Cache'] = 'HIT'
+                return response
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                if hasattr(response, 'render'):
+                    response.render()
+                cache.set(key, (response.content, response['Content-Type']), PAGE_CACHE_TTL)
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,105 @@
+# cricket/career.py
+
+"""
+Maintains PlayerCareerStats from PlayerMatchPerformance.
+
+Every change to a performance row is turned into a delta (new contribution
+minus old contribution) and applied with a single UPDATE ... SET x = x + n,
+so concurrent writers never lose increments and no performances are rescanned.
+"""
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import PlayerCareerStats, PlayerMatchPerformance, overs_to_balls
+
+CAREER_FIELDS = ('matches', 'runs', 'wickets', 'balls_faced', 'balls_bowled', 'runs_conceded', 'dismissals')
+
+
+def contribution(performance):
+    """
+    What a single performance adds to its player's career totals.
+    """
+    return {
+        'matches': 1,
+        'runs': performance.runs_scored,
+        'wickets': performance.wickets_taken,
+        'balls_faced': performance.balls_faced,
+        'balls_bowled': overs_to_balls(performance.overs_bowled),
+        'runs_conceded': performance.runs_conceded,
+        'dismissals': int(performance.is_out),
+    }
+
+
+def apply_delta(player_id, delta, sign=1):
+    """
+    Adds (sign=1) or removes (sign=-1) a contribution from a player's totals.
+    """
+    changes = {field: F(field) + sign * delta[field] for field in CAREER_FIELDS if delta[field]}
+    if not changes:
+        return
+    if not PlayerCareerStats.objects.filter(player_id=player_id).update(**changes) and sign > 0:
+        # First performance for this player: create the row, then apply the delta.
+        # A removal with no row left (a cascade deleted it first) has nothing to undo.
+        PlayerCareerStats.objects.get_or_create(player_id=player_id)
+        PlayerCareerStats.objects.filter(player_id=player_id).update(**changes)
+
+
+def performance_changed(old, new):
+    """
+    Applies a create (old is None), update or delete (new is None) of a performance.
+    """
+    if old is not None and new is not None and old.player_id == new.player_id:
+        old_totals, new_totals = contribution(old), contribution(new)
+        delta = {field: new_totals[field] - old_totals[field] for field in CAREER_FIELDS}
+        apply_delta(new.player_id, delta)
+        return
+    if old is not None:
+        apply_delta(old.player_id, contribution(old), sign=-1)
+    if new is not None:
+        apply_delta(new.player_id, contribution(new))
+
+
+def rebuild_career_stats(player_ids=None):
+    """
+    Recomputes career totals from PlayerMatchPerformance with one grouped query.
+    Pass player_ids to limit the rebuild to those players.
+    Returns the number of players written.
+    """
+    performances = PlayerMatchPerformance.objects.order_by()
+    existing = PlayerCareerStats.objects.all()
+    if player_ids is not None:
+        performances = performances.filter(player_id__in=player_ids)
+        existing = existing.filter(player_id__in=player_ids)
+
+    rows = performances.values('player_id').annotate(
+        matches=Count('id'),
+        runs=Sum('runs_scored'),
+        wickets=Sum('wickets_taken'),
+        balls_faced=Sum('balls_faced'),
+        runs_conceded=Sum('runs_conceded'),
+    )
+    # Overs are stored in cricket notation, so they have to be converted per row
+    balls_bowled = {}
+    dismissals = {}
+    for player_id, overs, is_out in performances.values_list('player_id', 'overs_bowled', 'is_out').iterator():
+        balls_bowled[player_id] = balls_bowled.get(player_id, 0) + overs_to_balls(overs)
+        dismissals[player_id] = dismissals.get(player_id, 0) + int(is_out)
+
+    stats = [
+        PlayerCareerStats(
+            player_id=row['player_id'],
+            matches=row['matches'],
+            runs=row['runs'],
+            wickets=row['wickets'],
+            balls_faced=row['balls_faced'],
+            balls_bowled=balls_bowled.get(row['player_id'], 0),
+            runs_conceded=row['runs_conceded'],
+            dismissals=dismissals.get(row['player_id'], 0),
+        )
+        for row in rows
+    ]
+    with transaction.atomic():
+        existing.delete()
+        PlayerCareerStats.objects.bulk_create(stats, batch_size=500)
+    return len(stats)
@@ -0,0 +1,85 @@
+# cricket/commentary.py
+
+"""
+The ball-by-ball commentary feed: a match's deliveries newest first, in
+pages of whole overs.
+
+match_detail renders only the first page (the latest FEED_OVERS overs); the
+page loads older ones from /api/matches/<id>/commentary/?before=<sequence>
+as the reader scrolls. A page costs two queries whatever its position: its
+deliveries (plus the first ball of the next older over, to tell whether
+there is more) and one lookup for the names of every player on it.
+"""
+
+from django.db.models import Min, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Ball, Player
+
+FEED_OVERS = 2
+MAX_FEED_OVERS = 10
+
+
+class CommentaryPage:
+    def __init__(self, balls, next_before):
+        self.balls = balls # Newest first
+        self.next_before = next_before # Pass as ?before= for the next older page; None on the last
+
+    @property
+    def has_more(self):
+        return self.next_before is not None
+
+    @property
+    def cursor(self):
+        # The newest delivery on the page; live updates continue after it
+        return self.balls[0].sequence if self.balls else 0
+
+
+def attach_players(balls):
+    """
+    Sets ball.batsman and ball.bowler on every ball from one query for their names.
+    """
+    ids = {ball.batsman_id for ball in balls} | {ball.bowler_id for ball in balls}
+    players = Player.objects.only('name').in_bulk(ids)
+    for ball in balls:
+        ball.batsman = players[ball.batsman_id]
+        ball.bowler = players[ball.bowler_id]
+    return balls
+
+
+def commentary_page(match_id, before=None, overs=FEED_OVERS):
+    """
+    The latest `overs` overs of a match's deliveries before delivery number
+    `before` (the latest overs of all when None).
+    """
+    balls = Ball.objects.filter(match_id=match_id)
+    if before is not None:
+        balls = balls.filter(sequence__lt=before)
+    # Where the (overs + 1)th over back starts; the extra over only tells whether there are more
+    over_starts = (
+        balls.order_by().values('innings', 'over_number').annotate(start=Min('sequence')).order_by('-start').values('start')
+    )
+    rows = list(
+        balls.filter(sequence__gte=Coalesce(Subquery(over_starts[overs:overs + 1]), 0)).order_by('-sequence')
+    )
+
+    page, seen = [], []
+    for ball in rows:
+        key = (ball.innings, ball.over_number)
+        if key not in seen:
+            if len(seen) == overs:
+                break
+            seen.append(key)
+        page.append(ball)
+    next_before = page[-1].sequence if len(page) < len(rows) else None
+    return CommentaryPage(attach_players(page), next_before)
+
+
+def over_count(params, default=FEED_OVERS):
+    """
+    Reads ?overs= from a QueryDict, clamped to 1..MAX_FEED_OVERS.
+    """
+    try:
+        return min(max(int(params.get('overs', default)), 1), MAX_FEED_OVERS)
+    except ValueError:
+        return default
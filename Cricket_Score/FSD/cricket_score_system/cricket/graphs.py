@@ -0,0 +1,153 @@
+# cricket/graphs.py
+
+"""
+Over-by-over graph series for a match: the Manhattan (runs per over), the
+worm (runs at the end of each over) and the run rate, for every innings.
+
+All of them come out of one pass over the match's balls in delivery order. The
+result is cached under the match's version token (see cricket/cache.py), so
+the match page, live updates and multi-match comparisons share a single
+aggregation per change in the match. Series are plain lists indexed by over
+number, which keeps the JSON compact; a live update only carries the overs
+from the first one it touched (series_tail), and charts.js splices them in.
+"""
+
+from itertools import accumulate
+
+from django.core.cache import cache
+
+from .cache import PAGE_CACHE_TTL, cache_metrics, snapshot_version
+from .innings import match_snapshot
+from .models import Ball
+
+SERIES = ('manhattan', 'worm', 'run_rate')
+MAX_COMPARE_MATCHES = 10
+
+
+def build_series(match_id):
+    """
+    Folds a match's balls into per-innings series with a single query.
+    Innings are listed in batting order.
+    """
+    balls = (
+        Ball.objects.filter(match_id=match_id)
+        .order_by('sequence')
+        .values_list('innings', 'batsman__team_id', 'over_number', 'runs', 'is_wicket', 'is_wide', 'is_no_ball')
+    )
+    buckets = {}
+    for number, team_id, index, runs, is_wicket, is_wide, is_no_ball in balls.iterator(chunk_size=2000):
+        bucket = buckets.setdefault(team_id, {'innings': number, 'runs': [], 'wickets': [], 'legal': []})
+        while len(bucket['runs']) <= index: # Over N always lives at index N
+            for column in ('runs', 'wickets', 'legal'):
+                bucket[column].append(0)
+        bucket['runs'][index] += runs + int(is_wide) + int(is_no_ball)
+        bucket['wickets'][index] += int(is_wicket)
+        bucket['legal'][index] += int(not (is_wide or is_no_ball))
+
+    innings = []
+    for team_id, bucket in sorted(buckets.items(), key=lambda item: item[1]['innings']):
+        worm = list(accumulate(bucket['runs']))
+        balls_bowled = accumulate(bucket['legal'])
+        innings.append({
+            'team_id': team_id,
+            'manhattan': bucket['runs'],
+            'wickets': bucket['wickets'],
+            'worm': worm,
+            # Runs per six legal balls so far; a partial over counts what has been bowled
+            'run_rate': [round(total * 6 / legal, 2) if legal else 0.0 for total, legal in zip(worm, balls_bowled)],
+        })
+    return {'match_id': match_id, 'innings': innings}
+
+
+def _series_key(match, snapshot):
+    return f"cricket:graph-series:{match.pk}:{snapshot_version(match, snapshot)}"
+
+
+def match_series(match, snapshot=None):
+    """
+    Cached series for one match. With its snapshot already loaded, a cache hit
+    costs no queries.
+    """
+    key = _series_key(match, snapshot or match_snapshot(match))
+    series = cache.get(key)
+    cache_metrics.record('graph_series', series is not None)
+    if series is None:
+        series = build_series(match.pk)
+        cache.set(key, series, PAGE_CACHE_TTL)
+    return series
+
+
+def many_series(matches):
+    """
+    Series for several matches (loaded with their innings_scores) in one cache
+    round trip; only the matches missing from the cache are aggregated.
+    Returns a dict keyed by match id.
+    """
+    keys = {match.pk: _series_key(match, match_snapshot(match)) for match in matches}
+    found = cache.get_many(keys.values())
+    series, missing = {}, {}
+    for match_id, key in keys.items():
+        cache_metrics.record('graph_series', key in found)
+        if key not in found:
+            found[key] = missing[key] = build_series(match_id)
+        series[match_id] = found[key]
+    if missing:
+        cache.set_many(missing, PAGE_CACHE_TTL)
+    return series
+
+
+def _team_names(match):
+    return {match.team1_id: match.team1.name, match.team2_id: match.team2.name}
+
+
+def series_tail(match, series, from_over):
+    """
+    Every series from over `from_over` onwards, for appending to a chart that
+    already shows the earlier overs. Innings carry their team name, so a chart
+    can add an innings it hasn't seen yet.
+    """
+    names = _team_names(match)
+    return {
+        'from_over': from_over,
+        'innings': [
+            {
+                'team_id': innings['team_id'],
+                'label': names.get(innings['team_id'], ''),
+                **{name: innings[name][from_over:] for name in SERIES + ('wickets',)},
+            }
+            for innings in series['innings']
+        ],
+    }
+
+
+def _chart(datasets):
+    longest = max((len(dataset['data']) for dataset in datasets), default=0)
+    return {'labels': [str(over + 1) for over in range(longest)], 'datasets': datasets}
+
+
+def chart_data(match, series, kind='run_rate'):
+    """
+    One series of each innings in the {labels, datasets} shape charts.js expects.
+    """
+    names = _team_names(match)
+    return _chart([
+        {'label': names.get(innings['team_id'], ''), 'team_id': innings['team_id'], 'data': innings[kind]}
+        for innings in series['innings']
+    ])
+
+
+def comparison_chart(matches, series_by_match, kind='worm'):
+    """
+    One series of every innings of several matches on the same axes.
+    """
+    datasets = []
+    for match in matches:
+        names = _team_names(match)
+        for innings in series_by_match[match.pk]['innings']:
+            datasets.append({
+                'label': f"{names.get(innings['team_id'], '')} ({match})",
+                'match_id': match.pk,
+                'team_id': innings['team_id'],
+                'data': innings[kind],
+            })
+    return _chart(datasets)
@@ -0,0 +1,388 @@
+# cricket/ingest.py
+
+"""
+Bulk loading of historical ball-by-ball scorecards.
+
+Source files are parsed into ScorecardMatch records one match at a time, so
+a season file of any size is streamed rather than read into memory. Matches
+are then written in chunks: one transaction per chunk, with matches, balls
+and innings totals each inserted by a single bulk_create. Teams and players
+are resolved through an in-memory identity map, so each name costs at most
+one query for the whole import.
+
+Every match carries an external_id (the source's match id). Matches already
+in the database are skipped, so an interrupted import can simply be re-run
+and picks up at the first chunk that didn't commit.
+
+Supported formats:
+  - Cricsheet JSON (https://cricsheet.org/format/json/), one match per file.
+  - CSV, one row per delivery, rows of a match kept together and in the
+    order they were bowled:
+    match_id,date,venue,team1,team2,winner,name,batting_team,over,
+    batsman,bowler,runs,wide,no_ball,wicket,commentary
+    `over` is in the same notation as Ball.over (2.3 = third ball of the
+    third over); winner, name and commentary may be blank.
+"""
+
+import csv
+import json
+import time as clock
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, time
+from itertools import islice
+from pathlib import Path
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import career, leaderboards, matchups, rollup, search
+from .cache import bump_model_version
+from .innings import fold_ball
+from .models import Ball, InningsScore, Match, Player, Team
+from .routers import use_primary
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+
+
+class ScorecardError(ValueError):
+    pass
+
+
+@dataclass
+class Delivery:
+    batting_team: str
+    over: float
+    batsman: str
+    bowler: str
+    runs: int = 0
+    is_wide: bool = False
+    is_no_ball: bool = False
+    is_wicket: bool = False
+    commentary: str = ''
+
+
+@dataclass
+class ScorecardMatch:
+    external_id: str
+    date: datetime
+    venue: str
+    team1: str
+    team2: str
+    winner: str = None
+    name: str = None
+    deliveries: list = field(default_factory=list)
+
+    def opponent(self, team):
+        return self.team2 if team == self.team1 else self.team1
+
+
+def _match_date(value):
+    day = parse_date(value) if value else None
+    if day is None:
+        raise ScorecardError(f"Invalid match date {value!r}.")
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _flag(value):
+    return (value or '').strip().lower() in TRUE_VALUES
+
+
+# Parsers
+
+def read_cricsheet(path):
+    """
+    One ScorecardMatch from a Cricsheet JSON file. The file name (e.g. 1234.json)
+    is Cricsheet's match id. Super overs are skipped. Byes and leg byes have no
+    place on Ball and are left out of the totals.
+    """
+    path = Path(path)
+    with path.open(encoding='utf-8') as handle:
+        data = json.load(handle)
+    info = data.get('info', {})
+    teams = info.get('teams') or []
+    if len(teams) != 2:
+        raise ScorecardError(f"{path.name}: expected two teams, got {teams!r}.")
+
+    event = info.get('event', {})
+    name = event.get('name')
+    if name and event.get('match_number'):
+        name = f"{name}, Match {event['match_number']}"
+
+    match = ScorecardMatch(
+        external_id=f"cricsheet:{path.stem}",
+        date=_match_date((info.get('dates') or [None])[0]),
+        venue=info.get('venue', ''),
+        team1=teams[0],
+        team2=teams[1],
+        winner=info.get('outcome', {}).get('winner'),
+        name=name,
+    )
+    for innings in data.get('innings', []):
+        if innings.get('super_over'):
+            continue
+        for over in innings.get('overs', []):
+            legal = 0
+            for delivery in over.get('deliveries', []):
+                extras = delivery.get('extras', {})
+                is_wide, is_no_ball = 'wides' in extras, 'noballs' in extras
+                match.deliveries.append(Delivery(
+                    batting_team=innings['team'],
+                    # Illegal deliveries share the number of the ball that follows them
+                    over=over['over'] + (legal + 1) / 10,
+                    batsman=delivery.get('batter') or delivery['batsman'], # 'batsman' in older files
+                    bowler=delivery['bowler'],
+                    runs=delivery.get('runs', {}).get('batter', 0),
+                    is_wide=is_wide,
+                    is_no_ball=is_no_ball,
+                    is_wicket=bool(delivery.get('wickets')),
+                ))
+                if not (is_wide or is_no_ball):
+                    legal += 1
+    return match
+
+
+def read_csv(path):
+    """
+    Streams ScorecardMatch records from a delivery-per-row CSV file.
+    """
+    with open(path, newline='', encoding='utf-8') as handle:
+        match = None
+        seen = set()
+        for line, row in enumerate(csv.DictReader(handle), start=2):
+            match_id = (row.get('match_id') or '').strip()
+            if not match_id:
+                raise ScorecardError(f"{path}:{line}: missing match_id.")
+            if match is None or match.external_id != match_id:
+                if match_id in seen:
+                    raise ScorecardError(f"{path}:{line}: rows for match {match_id} are not contiguous.")
+                if match is not None:
+                    yield match
+                seen.add(match_id)
+                try:
+                    match = ScorecardMatch(
+                        external_id=match_id,
+                        date=_match_date(row.get('date')),
+                        venue=row.get('venue') or '',
+                        team1=row['team1'],
+                        team2=row['team2'],
+                        winner=row.get('winner') or None,
+                        name=row.get('name') or None,
+                    )
+                except KeyError as error:
+                    raise ScorecardError(f"{path}:{line}: missing column {error}.")
+            try:
+                match.deliveries.append(Delivery(
+                    batting_team=row['batting_team'],
+                    over=float(row['over']),
+                    batsman=row['batsman'],
+                    bowler=row['bowler'],
+                    runs=int(row.get('runs') or 0),
+                    is_wide=_flag(row.get('wide')),
+                    is_no_ball=_flag(row.get('no_ball')),
+                    is_wicket=_flag(row.get('wicket')),
+                    commentary=row.get('commentary') or '',
+                ))
+            except (KeyError, ValueError) as error:
+                raise ScorecardError(f"{path}:{line}: bad delivery row ({error}).")
+        if match is not None:
+            yield match
+
+
+def read_scorecards(paths):
+    """
+    Streams matches from files or directories, picking the parser by extension.
+    """
+    for path in map(Path, paths):
+        files = sorted(path.glob('*.json')) + sorted(path.glob('*.csv')) if path.is_dir() else [path]
+        for file in files:
+            if file.suffix.lower() == '.json':
+                yield read_cricsheet(file)
+            elif file.suffix.lower() == '.csv':
+                yield from read_csv(file)
+            else:
+                raise ScorecardError(f"{file}: unsupported file type (use .json or .csv).")
+
+
+# Loader
+
+class IdentityMap:
+    """
+    Teams by name and players by (team, name), loaded once and extended as
+    new names turn up. Names created inside atomic() are only kept once it
+    commits, so a chunk that rolls back leaves no ids of rows that don't exist.
+    """
+
+    def __init__(self):
+        self.teams = {team.name: team.pk for team in Team.objects.only('id', 'name')}
+        self.players = {(team_id, name): pk for pk, team_id, name in Player.objects.values_list('id', 'team_id', 'name')}
+        self._new_teams = {}
+        self._new_players = {}
+
+    def team(self, name):
+        if name in self.teams:
+            return self.teams[name]
+        if name not in self._new_teams:
+            self._new_teams[name] = Team.objects.create(name=name).pk
+        return self._new_teams[name]
+
+    def player(self, team_id, name):
+        key = (team_id, name)
+        if key in self.players:
+            return self.players[key]
+        if key not in self._new_players:
+            self._new_players[key] = Player.objects.create(team_id=team_id, name=name).pk
+        return self._new_players[key]
+
+    @contextmanager
+    def atomic(self):
+        """
+        transaction.atomic(), keeping the names it created only if it commits.
+        """
+        try:
+            with transaction.atomic():
+                yield
+        except BaseException:
+            self._new_teams.clear()
+            self._new_players.clear()
+            raise
+        self.teams.update(self._new_teams)
+        self.players.update(self._new_players)
+        self._new_teams.clear()
+        self._new_players.clear()
+
+
+@dataclass
+class ImportStats:
+    matches: int = 0
+    skipped: int = 0
+    balls: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.balls / self.seconds if self.seconds else 0.0
+
+
+def _build_match(scorecard, identities):
+    team1, team2 = identities.team(scorecard.team1), identities.team(scorecard.team2)
+    return Match(
+        external_id=scorecard.external_id,
+        name=scorecard.name or "Unnamed Match",
+        team1_id=team1,
+        team2_id=team2,
+        date=scorecard.date,
+        venue=scorecard.venue,
+        status='Completed',
+        winner_id=identities.team(scorecard.winner) if scorecard.winner else None,
+    )
+
+
+def _build_balls(scorecard, match, identities):
+    # bulk_create skips the pre_save numbering, so number the deliveries here:
+    # innings in the order the sides first bat, sequence in file order
+    balls, innings_by_team = [], {}
+    for sequence, delivery in enumerate(scorecard.deliveries, start=1):
+        batting_team = identities.team(delivery.batting_team)
+        bowling_team = identities.team(scorecard.opponent(delivery.batting_team))
+        balls.append(Ball(
+            match=match,
+            innings=innings_by_team.setdefault(batting_team, len(innings_by_team) + 1),
+            sequence=sequence,
+            over=delivery.over,
+            batsman_id=identities.player(batting_team, delivery.batsman),
+            bowler_id=identities.player(bowling_team, delivery.bowler),
+            runs=delivery.runs,
+            is_wicket=delivery.is_wicket,
+            is_wide=delivery.is_wide,
+            is_no_ball=delivery.is_no_ball,
+            commentary=delivery.commentary,
+        ))
+    return balls
+
+
+def _fold_innings(match, balls, batting_teams):
+    states = {}
+    for ball, team_id in zip(balls, batting_teams): # Already in sequence order
+        if team_id not in states:
+            states[team_id] = InningsScore(match=match, batting_team_id=team_id, over_runs=[], over_wickets=[])
+        fold_ball(states[team_id], ball)
+    return list(states.values())
+
+
+def import_chunk(scorecards, identities, replace=False):
+    """
+    Writes one chunk of matches in a single transaction.
+    Returns (matches written, matches skipped, balls written, changed player ids).
+    """
+    keys = [scorecard.external_id for scorecard in scorecards]
+    with identities.atomic():
+        existing = Match.objects.filter(external_id__in=keys)
+        if replace:
+            existing.delete()
+            done = set()
+        else:
+            done = set(existing.values_list('external_id', flat=True))
+        todo = [scorecard for scorecard in scorecards if scorecard.external_id not in done]
+        if not todo:
+            return 0, len(scorecards), 0, set()
+
+        matches = Match.objects.bulk_create([_build_match(scorecard, identities) for scorecard in todo])
+        balls, batting_teams, per_match = [], [], []
+        for scorecard, match in zip(todo, matches):
+            match_balls = _build_balls(scorecard, match, identities)
+            per_match.append((match, match_balls))
+            balls += match_balls
+            batting_teams += [identities.team(delivery.batting_team) for delivery in scorecard.deliveries]
+        Ball.objects.bulk_create(balls, batch_size=1000)
+
+        innings, offset = [], 0
+        for match, match_balls in per_match:
+            innings += _fold_innings(match, match_balls, batting_teams[offset:offset + len(match_balls)])
+            offset += len(match_balls)
+        InningsScore.objects.bulk_create(innings)
+        search.index_matches([match.pk for match in matches]) # bulk_create skips the indexing signal
+        changed = rollup.rollup_matches([match.pk for match in matches])
+    # ...and the cached pages' version bump; only now, so no reader caches the old page under the new version
+    bump_model_version('match')
+    return len(todo), len(scorecards) - len(todo), len(balls), changed
+
+
+def import_scorecards(scorecards, chunk_size=50, replace=False, progress=None):
+    """
+    Imports an iterable of ScorecardMatch in chunks of `chunk_size` matches and
+    refreshes the affected players' career totals and matchups once at the end.
+    `progress(stats)` is called after each chunk. Returns ImportStats.
+    """
+    # The import reads back what it writes (names, then the rows the totals
+    # are derived from), so none of it may come from a lagging replica
+    with use_primary():
+        return _import_scorecards(scorecards, chunk_size, replace, progress)
+
+
+def _import_scorecards(scorecards, chunk_size, replace, progress):
+    identities = IdentityMap()
+    stats = ImportStats()
+    changed = set()
+    started = clock.perf_counter()
+    scorecards = iter(scorecards)
+    while True:
+        chunk = list(islice(scorecards, chunk_size))
+        if not chunk:
+            break
+        written, skipped, balls, chunk_changed = import_chunk(chunk, identities, replace=replace)
+        stats.matches += written
+        stats.skipped += skipped
+        stats.balls += balls
+        changed |= chunk_changed
+        stats.seconds = clock.perf_counter() - started
+        if progress:
+            progress(stats)
+
+    if changed:
+        career.rebuild_career_stats(changed)
+        matchups.rebuild_matchups(changed)
+        leaderboards.refresh_players(changed)
+    stats.seconds = clock.perf_counter() - started
+    return stats
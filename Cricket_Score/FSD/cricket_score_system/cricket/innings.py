@@ -0,0 +1,168 @@
+# cricket/innings.py
+
+"""
+Incremental innings-state engine.
+
+Every Ball is folded into the InningsScore row of the side that is batting,
+so the cost of recording a delivery is constant and reading a live score is a
+single-row lookup per innings, no matter how many balls have been bowled.
+Edits and deletions of historical balls trigger a full rebuild of that match.
+"""
+
+from django.db import transaction
+from django.db.models import Max, Q
+
+from .cache import bump_match_version
+from .models import Ball, InningsScore, Match
+
+
+def ball_extras(ball):
+    """
+    Extra runs conceded on a delivery: one for a wide, one for a no-ball.
+    """
+    return int(ball.is_wide) + int(ball.is_no_ball)
+
+
+def is_legal_delivery(ball):
+    """
+    Wides and no-balls have to be re-bowled, so they don't count towards the over.
+    """
+    return not (ball.is_wide or ball.is_no_ball)
+
+
+def _bump_bucket(buckets, index, amount):
+    # Grow the per-over list on demand so over N always lives at index N
+    if len(buckets) <= index:
+        buckets.extend([0] * (index + 1 - len(buckets)))
+    buckets[index] += amount
+
+
+def fold_ball(state, ball):
+    """
+    Adds one delivery to an InningsScore in memory. Does not save.
+    """
+    extras = ball_extras(ball)
+    total = ball.runs + extras
+    over_index = ball.over_number
+
+    state.runs += total
+    state.wides += int(ball.is_wide)
+    state.no_balls += int(ball.is_no_ball)
+    if is_legal_delivery(ball):
+        state.legal_balls += 1
+    if ball.is_wicket:
+        state.wickets += 1
+
+    _bump_bucket(state.over_runs, over_index, total)
+    _bump_bucket(state.over_wickets, over_index, int(ball.is_wicket))
+    state.last_ball_id = max(state.last_ball_id or 0, ball.pk)
+    return state
+
+
+def number_delivery(ball):
+    """
+    Gives a new Ball the next sequence number of its match and, unless set,
+    its innings: the batting side's existing innings, or the next one if the
+    side hasn't batted yet. One query. Does not save.
+    """
+    batting_team_id = ball.batsman.team_id
+    numbers = Ball.objects.filter(match_id=ball.match_id).aggregate(
+        last_sequence=Max('sequence'),
+        last_innings=Max('innings'),
+        own_innings=Max('innings', filter=Q(batsman__team_id=batting_team_id)),
+    )
+    # Two writers racing on one match hit the (match, sequence) constraint rather than share a number
+    ball.sequence = (numbers['last_sequence'] or 0) + 1
+    if ball.innings is None:
+        ball.innings = numbers['own_innings'] or (numbers['last_innings'] or 0) + 1
+    return ball
+
+
+def record_ball(ball):
+    """
+    Folds a newly created Ball into its innings. O(1) per delivery.
+    """
+    batting_team_id = ball.batsman.team_id
+    with transaction.atomic():
+        state, _ = InningsScore.objects.select_for_update().get_or_create(
+            match_id=ball.match_id,
+            batting_team_id=batting_team_id,
+        )
+        fold_ball(state, ball)
+        state.save()
+    bump_match_version(ball.match_id)
+    return state
+
+
+def rebuild_match(match_id):
+    """
+    Recomputes every innings of a match from scratch by streaming its balls once.
+    Used after historical balls are edited or deleted.
+    """
+    states = {}
+    balls = (
+        Ball.objects.filter(match_id=match_id)
+        .select_related('batsman')
+        .only('id', 'match_id', 'over_number', 'runs', 'is_wicket', 'is_wide', 'is_no_ball', 'batsman__team_id')
+        .order_by('sequence')
+    )
+    for ball in balls.iterator():
+        team_id = ball.batsman.team_id
+        if team_id not in states:
+            states[team_id] = InningsScore(match_id=match_id, batting_team_id=team_id, over_runs=[], over_wickets=[])
+        fold_ball(states[team_id], ball)
+
+    with transaction.atomic():
+        InningsScore.objects.filter(match_id=match_id).delete()
+        InningsScore.objects.bulk_create(states.values())
+    bump_match_version(match_id)
+    return list(states.values())
+
+
+def schedule_rebuild(match_id):
+    """
+    Queues a rebuild for when the current transaction commits.
+    Deleting a match cascades to hundreds of balls; this keeps that to one rebuild.
+    """
+    connection = transaction.get_connection()
+    # Callbacks queued in this transaction are dropped by Django on rollback,
+    # so checking them is enough to avoid queueing the same match twice.
+    for queued in connection.run_on_commit:
+        if getattr(queued[1], 'rebuild_match_id', None) == match_id:
+            return
+
+    def run():
+        if Match.objects.filter(pk=match_id).exists():
+            rebuild_match(match_id)
+
+    run.rebuild_match_id = match_id
+    transaction.on_commit(run)
+
+
+def format_score(state):
+    """
+    Scoreboard string for an innings, e.g. "145/3 (17.2 ov)".
+    """
+    if state is None:
+        return "Yet to bat"
+    return str(state)
+
+
+def match_snapshot(match):
+    """
+    Precomputed scoreboard for a match: one query for all its innings.
+    Returns a dict keyed by batting team id plus the formatted score strings.
+    """
+    states = {state.batting_team_id: state for state in match.innings_scores.all()}
+    team1_state = states.get(match.team1_id)
+    team2_state = states.get(match.team2_id)
+    return {
+        'innings': states,
+        'team1_innings': team1_state,
+        'team2_innings': team2_state,
+        'team1_score': format_score(team1_state),
+        'team2_score': format_score(team2_state),
+        # Newest delivery folded into any innings; part of the match version
+        'last_ball_id': max((state.last_ball_id or 0 for state in states.values()), default=0),
+    }
+
@@ -0,0 +1,298 @@
+# cricket/instrumentation.py
+
+"""
+Per-request performance metrics.
+
+RequestMetricsMiddleware times every request and, for a sampled share of
+them (settings.CRICKET_METRICS_SAMPLE_RATE), also counts its queries, their
+time and the time spent rendering templates. Everything is recorded per URL
+name ('match_detail', 'admin:cricket_ball_changelist', ...) into fixed-bucket
+histograms kept in the process, so recording is a few additions under a lock.
+
+/metrics/ serves them, with the page and fragment cache counters, in the
+Prometheus text format. The histograms are per process: with several
+workers, scrape each one (or run them behind a multiprocess-aware exporter).
+
+A sampled request slower than settings.CRICKET_SLOW_REQUEST_MS is logged on
+the 'cricket.slow_requests' logger with its slowest statements and any
+statement it repeated, which is usually an N+1 query.
+
+Template time is the outermost render only, so includes and form widgets
+rendered within a template count once; queries run lazily from a template
+count towards both the database and the template time. The middleware is sync-only: under ASGI Django runs
+it on the same thread as the (sync) views, which is where their queries run.
+"""
+
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from .cache import cache_metrics
+
+slow_log = logging.getLogger('cricket.slow_requests')
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+# Requests that matched no URL share one label, so scanners can't grow the metrics
+UNMATCHED_ROUTE = '<unmatched>'
+# Statements kept per sampled request for the slow log
+MAX_STATEMENTS = 500
+SLOW_LOG_STATEMENTS = 5
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """
+    Counts of observations per bucket (upper bounds, plus one for +Inf) and their sum.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+
+# name -> (help, buckets); every route gets one of each
+HISTOGRAMS = {
+    'cricket_request_duration_seconds': ("Time to produce the response.", SECONDS_BUCKETS),
+    'cricket_request_db_seconds': ("Time spent in database queries (sampled requests).", SECONDS_BUCKETS),
+    'cricket_request_template_seconds': ("Time spent rendering templates (sampled requests).", SECONDS_BUCKETS),
+    'cricket_request_queries': ("Database queries per request (sampled requests).", QUERY_BUCKETS),
+}
+
+
+class RequestMetrics:
+    """
+    The process's per-route histograms and response counters.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+            self._responses = Counter()
+            self._slow = Counter()
+
+    def record(self, route, status, duration, timing=None, slow=False):
+        with self._lock:
+            self._responses[route, status] += 1
+            self._observe('cricket_request_duration_seconds', route, duration)
+            if timing is not None:
+                self._observe('cricket_request_db_seconds', route, timing.db_seconds)
+                self._observe('cricket_request_template_seconds', route, timing.template_seconds)
+                self._observe('cricket_request_queries', route, timing.queries)
+            if slow:
+                self._slow[route] += 1
+
+    def _observe(self, name, route, value):
+        histogram = self._histograms.get((name, route))
+        if histogram is None:
+            histogram = self._histograms[name, route] = Histogram(HISTOGRAMS[name][1])
+        histogram.observe(value)
+
+    def snapshot(self):
+        """
+        {'histograms': {(name, route): (cumulative buckets, sum, count)},
+        'responses': {(route, status): count}, 'slow': {route: count}}.
+        """
+        with self._lock:
+            return {
+                'histograms': {
+                    key: (list(histogram.cumulative()), histogram.sum, histogram.count)
+                    for key, histogram in self._histograms.items()
+                },
+                'responses': dict(self._responses),
+                'slow': dict(self._slow),
+            }
+
+
+request_metrics = RequestMetrics()
+
+
+class RequestTiming:
+    """
+    What one sampled request spent: queries, their time, template time and
+    the statements themselves. Also the database execute wrapper counting them.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.rendering = False # Inside a template render already
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db_seconds += elapsed
+            if len(self.statements) < MAX_STATEMENTS:
+                self.statements.append((elapsed, sql))
+
+
+_current_timing = ContextVar('cricket_request_timing', default=None)
+
+
+def install_template_timer():
+    """
+    Wraps Django template rendering so sampled requests can add up their
+    template time. Called once from the app's ready().
+    """
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, 'timed', False):
+        return
+    render = Template.render
+
+    def timed_render(self, context=None, request=None):
+        timing = _current_timing.get()
+        if timing is None or timing.rendering:
+            # Form widgets and the like render templates within templates; count the outer one only
+            return render(self, context, request)
+        timing.rendering = True
+        started = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            timing.rendering = False
+            timing.template_seconds += time.perf_counter() - started
+
+    timed_render.timed = True
+    Template.render = timed_render
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None and match.view_name else UNMATCHED_ROUTE
+
+
+def log_slow_request(request, route, duration, timing):
+    repeated = [(sql, count) for sql, count in Counter(sql for _, sql in timing.statements).most_common(3) if count > 1]
+    lines = [
+        f"Slow request {request.method} {request.path} ({route}): {duration * 1000:.0f} ms, "
+        f"{timing.queries} queries in {timing.db_seconds * 1000:.0f} ms, templates {timing.template_seconds * 1000:.0f} ms"
+    ]
+    for elapsed, sql in sorted(timing.statements, key=lambda statement: -statement[0])[:SLOW_LOG_STATEMENTS]:
+        lines.append(f"  {elapsed * 1000:.1f} ms: {sql}")
+    for sql, count in repeated:
+        lines.append(f"  repeated {count} times: {sql}")
+    slow_log.warning("\n".join(lines))
+
+
+class RequestMetricsMiddleware:
+    """
+    Records each request's latency, and for sampled requests its queries,
+    database and template time, into request_metrics.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'CRICKET_METRICS_SAMPLE_RATE', 1.0)
+        self.slow_seconds = getattr(settings, 'CRICKET_SLOW_REQUEST_MS', 500) / 1000
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            response = self.get_response(request)
+            request_metrics.record(_route(request), response.status_code, time.perf_counter() - started)
+            return response
+
+        timing = RequestTiming()
+        token = _current_timing.set(timing)
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(timing))
+                response = self.get_response(request)
+        finally:
+            _current_timing.reset(token)
+        duration = time.perf_counter() - started
+        route = _route(request)
+        slow = duration >= self.slow_seconds
+        request_metrics.record(route, response.status_code, duration, timing, slow)
+        if slow:
+            log_slow_request(request, route, duration, timing)
+        return response
+
+
+def _labels(**labels):
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _number(value):
+    return "+Inf" if value == float('inf') else repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def prometheus_text():
+    """
+    The request histograms and counters and the cache counters in the Prometheus text format.
+    """
+    snapshot = request_metrics.snapshot()
+    lines = []
+    for name, (help_text, _) in HISTOGRAMS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for (histogram_name, route), (buckets, total, count) in sorted(snapshot['histograms'].items()):
+            if histogram_name != name:
+                continue
+            for bound, cumulative in buckets:
+                lines.append(f"{name}_bucket{_labels(route=route, le=_number(bound))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(route=route)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(route=route)} {count}")
+
+    lines += ["# HELP cricket_responses_total Responses by route and status code.", "# TYPE cricket_responses_total counter"]
+    for (route, status), count in sorted(snapshot['responses'].items()):
+        lines.append(f"cricket_responses_total{_labels(route=route, status=status)} {count}")
+    lines += ["# HELP cricket_slow_requests_total Sampled requests over the slow-request threshold.", "# TYPE cricket_slow_requests_total counter"]
+    for route, count in sorted(snapshot['slow'].items()):
+        lines.append(f"cricket_slow_requests_total{_labels(route=route)} {count}")
+    lines += ["# HELP cricket_cache_requests_total Page, fragment and graph cache lookups.", "# TYPE cricket_cache_requests_total counter"]
+    for cache_name, counts in sorted(cache_metrics.snapshot().items()):
+        lines.append(f"cricket_cache_requests_total{_labels(cache=cache_name, result='hit')} {counts['hits']}")
+        lines.append(f"cricket_cache_requests_total{_labels(cache=cache_name, result='miss')} {counts['misses']}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics(request):
+    """
+    /metrics/ for Prometheus. Open to staff, or to a scraper sending
+    "Authorization: Bearer <settings.CRICKET_METRICS_TOKEN>".
+    """
+    token = getattr(settings, 'CRICKET_METRICS_TOKEN', '')
+    header = request.headers.get('Authorization', '')
+    scraper = bool(token) and constant_time_compare(header, f"Bearer {token}")
+    if not scraper and not request.user.is_staff:
+        return HttpResponseForbidden("Metrics are available to staff or with the metrics token.")
+    return HttpResponse(prometheus_text(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,607 @@
+# cricket/leaderboards.py
+
+"""
+Leaderboards: most runs, most wickets, best strike rate and best economy,
+overall and per team, per season (the calendar year of the match) and per
+venue.
+
+Every board is a sorted set of player ids scored by the statistic, kept in a
+pluggable backend (settings.CRICKET_LEADERBOARD_BACKEND):
+  - LocalBackend (default): in-process sorted sets on an indexable skip list,
+    the structure Redis uses for its own sorted sets. Each process fills it
+    from the database on first read and only sees the refreshes made in that
+    process, so with several workers each one's boards go stale as the
+    others save performances. It suits a single worker and tests.
+  - RedisBackend: Redis sorted sets shared by every worker. Fill it once with
+    `manage.py rebuild_leaderboards`.
+Either way, top N costs O(log n + N) and a player's rank O(log n); nothing
+is grouped or sorted in SQL per request.
+
+Boards are kept current per player rather than by deltas: when a player's
+performances change, their totals are re-read (one query over that player's
+rows) and their entry in each board they belong to is replaced.
+
+A rebuild writes a new generation of keys beside the live one and then
+switches GENERATION_KEY to it, so readers keep seeing the old boards until
+the new ones are complete. It holds a lock in the backend (SET NX with an
+expiry on Redis), so only one process rebuilds at a time; players refreshed
+while it runs are noted and refreshed again on the new generation.
+"""
+
+import json
+import random
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Player, PlayerMatchPerformance, overs_to_balls
+
+BOARDS = ('runs', 'wickets', 'strike_rate', 'economy')
+BOARD_TITLES = {
+    'runs': 'Most Runs',
+    'wickets': 'Most Wickets',
+    'strike_rate': 'Best Strike Rate',
+    'economy': 'Best Economy',
+}
+LOWER_IS_BETTER = {'economy'}
+SCOPES = ('overall', 'team', 'season', 'venue')
+# Rates need a minimum sample before a player is ranked on them
+MIN_BALLS_FACED = 30
+MIN_BALLS_BOWLED = 60
+TOP_PLAYERS = 10
+MAX_TOP_PLAYERS = 100
+
+KEY_PREFIX = 'cricket:leaderboard'
+# The generation readers use; unset until the boards are first built
+GENERATION_KEY = f"{KEY_PREFIX}:generation"
+BUILD_LOCK_KEY = f"{KEY_PREFIX}:build-lock"
+# Players refreshed during a rebuild, as a sorted set
+REFRESHED_KEY = f"{KEY_PREFIX}:refreshed-during-build"
+# A rebuild that dies leaves the lock for at most this long
+BUILD_LOCK_SECONDS = 600
+
+PERFORMANCE_COLUMNS = (
+    'player_id', 'player__team_id', 'match__venue', 'match_date',
+    'runs_scored', 'balls_faced', 'wickets_taken', 'overs_bowled', 'runs_conceded',
+)
+
+
+class _Node:
+    __slots__ = ('key', 'forward', 'span')
+
+    def __init__(self, key, level):
+        self.key = key
+        self.forward = [None] * level
+        self.span = [0] * level # Nodes skipped by following forward[level]
+
+
+class SortedSet:
+    """
+    Members ordered by (score, member), with O(log n) add, discard, rank and
+    access by position. Ties order by member, as in Redis.
+    """
+    MAX_LEVEL = 32
+    P = 0.25
+
+    def __init__(self):
+        self._head = _Node(None, self.MAX_LEVEL)
+        self._level = 1
+        self._length = 0
+        self._scores = {}
+        self._random = random.Random()
+
+    def __len__(self):
+        return self._length
+
+    def __contains__(self, member):
+        return member in self._scores
+
+    def score(self, member):
+        return self._scores.get(member)
+
+    def add(self, member, score):
+        old = self._scores.get(member)
+        if old == score:
+            return
+        if old is not None:
+            self._delete((old, member))
+        self._insert((score, member))
+        self._scores[member] = score
+
+    def discard(self, member):
+        old = self._scores.pop(member, None)
+        if old is not None:
+            self._delete((old, member))
+
+    def _random_level(self):
+        level = 1
+        while level < self.MAX_LEVEL and self._random.random() < self.P:
+            level += 1
+        return level
+
+    def _insert(self, key):
+        update = [self._head] * self.MAX_LEVEL
+        rank = [0] * self.MAX_LEVEL
+        node = self._head
+        for level in reversed(range(self._level)):
+            rank[level] = 0 if level == self._level - 1 else rank[level + 1]
+            while node.forward[level] is not None and node.forward[level].key < key:
+                rank[level] += node.span[level]
+                node = node.forward[level]
+            update[level] = node
+
+        new_level = self._random_level()
+        if new_level > self._level:
+            for level in range(self._level, new_level):
+                self._head.span[level] = self._length
+            self._level = new_level
+
+        new = _Node(key, new_level)
+        for level in range(new_level):
+            new.forward[level] = update[level].forward[level]
+            update[level].forward[level] = new
+            new.span[level] = update[level].span[level] - (rank[0] - rank[level])
+            update[level].span[level] = rank[0] - rank[level] + 1
+        for level in range(new_level, self._level):
+            update[level].span[level] += 1
+        self._length += 1
+
+    def _delete(self, key):
+        update = [None] * self._level
+        node = self._head
+        for level in reversed(range(self._level)):
+            while node.forward[level] is not None and node.forward[level].key < key:
+                node = node.forward[level]
+            update[level] = node
+        node = node.forward[0]
+        for level in range(self._level):
+            if update[level].forward[level] is node:
+                update[level].span[level] += node.span[level] - 1
+                update[level].forward[level] = node.forward[level]
+            else:
+                update[level].span[level] -= 1
+        while self._level > 1 and self._head.forward[self._level - 1] is None:
+            self._level -= 1
+        self._length -= 1
+
+    def rank(self, member):
+        """
+        0-based position in ascending order, or None.
+        """
+        score = self._scores.get(member)
+        if score is None:
+            return None
+        key = (score, member)
+        traversed = 0
+        node = self._head
+        for level in reversed(range(self._level)):
+            while node.forward[level] is not None and node.forward[level].key <= key:
+                traversed += node.span[level]
+                node = node.forward[level]
+        return traversed - 1
+
+    def _node_at(self, index):
+        traversed = 0
+        node = self._head
+        for level in reversed(range(self._level)):
+            while node.forward[level] is not None and traversed + node.span[level] <= index + 1:
+                traversed += node.span[level]
+                node = node.forward[level]
+            if traversed == index + 1:
+                return node
+        return None
+
+    def range(self, start, stop):
+        """
+        (member, score) pairs at ascending positions start..stop, inclusive.
+        """
+        if stop < 0:
+            stop += self._length
+        stop = min(stop, self._length - 1)
+        if start > stop:
+            return []
+        node = self._node_at(start)
+        items = []
+        for _ in range(stop - start + 1):
+            items.append((node.key[1], node.key[0]))
+            node = node.forward[0]
+        return items
+
+
+class LocalBackend:
+    """
+    In-process sorted sets and string values, with the Redis method names.
+    """
+
+    def __init__(self, **options):
+        self._sets = {}
+        self._values = {}
+        self._expiry = {}
+        self._lock = threading.Lock()
+
+    def zadd(self, key, mapping):
+        with self._lock:
+            members = self._sets.setdefault(key, SortedSet())
+            for member, score in mapping.items():
+                members.add(member, score)
+
+    def zrem(self, key, *members):
+        with self._lock:
+            sorted_set = self._sets.get(key)
+            if sorted_set is not None:
+                for member in members:
+                    sorted_set.discard(member)
+
+    def zscore(self, key, member):
+        with self._lock:
+            sorted_set = self._sets.get(key)
+            return sorted_set.score(member) if sorted_set is not None else None
+
+    def zcard(self, key):
+        with self._lock:
+            return len(self._sets.get(key, ()))
+
+    def zrank(self, key, member, desc=False):
+        with self._lock:
+            sorted_set = self._sets.get(key)
+            rank = sorted_set.rank(member) if sorted_set is not None else None
+            if rank is None or not desc:
+                return rank
+            return len(sorted_set) - 1 - rank
+
+    def zrange(self, key, start, stop, desc=False):
+        with self._lock:
+            sorted_set = self._sets.get(key)
+            if sorted_set is None:
+                return []
+            if not desc:
+                return sorted_set.range(start, stop)
+            last = len(sorted_set) - 1
+            stop = min(stop + len(sorted_set) if stop < 0 else stop, last)
+            return sorted_set.range(last - stop, last - start)[::-1]
+
+    def _expire(self, key):
+        if key in self._expiry and self._expiry[key] <= time.monotonic():
+            del self._expiry[key]
+            self._values.pop(key, None)
+
+    def get(self, key):
+        with self._lock:
+            self._expire(key)
+            return self._values.get(key)
+
+    def set(self, key, value):
+        with self._lock:
+            self._values[key] = value
+            self._expiry.pop(key, None)
+
+    def add(self, key, value, timeout):
+        """
+        Sets the key, expiring after `timeout` seconds, unless it is already set.
+        """
+        with self._lock:
+            self._expire(key)
+            if key in self._values:
+                return False
+            self._values[key] = value
+            self._expiry[key] = time.monotonic() + timeout
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._sets.pop(key, None)
+                self._values.pop(key, None)
+                self._expiry.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for store in (self._sets, self._values):
+                for key in [key for key in store if key.startswith(prefix)]:
+                    del store[key]
+
+
+class RedisBackend:
+    """
+    Redis sorted sets. Requires the `redis` package and settings like:
+    CRICKET_LEADERBOARD_BACKEND_OPTIONS = {'url': 'redis://localhost:6379/0'}
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', **options):
+        import redis # Optional dependency, only needed for this backend
+
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+
+    def zadd(self, key, mapping):
+        if mapping:
+            self._client.zadd(key, mapping)
+
+    def zrem(self, key, *members):
+        if members:
+            self._client.zrem(key, *members)
+
+    def zscore(self, key, member):
+        return self._client.zscore(key, member)
+
+    def zcard(self, key):
+        return self._client.zcard(key)
+
+    def zrank(self, key, member, desc=False):
+        return self._client.zrevrank(key, member) if desc else self._client.zrank(key, member)
+
+    def zrange(self, key, start, stop, desc=False):
+        return self._client.zrange(key, start, stop, desc=desc, withscores=True)
+
+    def get(self, key):
+        return self._client.get(key)
+
+    def set(self, key, value):
+        self._client.set(key, value)
+
+    def add(self, key, value, timeout):
+        return bool(self._client.set(key, value, nx=True, px=int(timeout * 1000)))
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*keys)
+
+    def delete_prefix(self, prefix):
+        keys = []
+        for key in self._client.scan_iter(match=f"{prefix}*", count=1000):
+            keys.append(key)
+            if len(keys) == 1000:
+                self._client.delete(*keys)
+                keys = []
+        if keys:
+            self._client.delete(*keys)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    The process-wide leaderboard backend, built from settings on first use.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend_path = getattr(settings, 'CRICKET_LEADERBOARD_BACKEND', 'cricket.leaderboards.LocalBackend')
+                options = getattr(settings, 'CRICKET_LEADERBOARD_BACKEND_OPTIONS', {})
+                _backend = import_string(backend_path)(**options)
+    return _backend
+
+
+def reset_backend():
+    """
+    Drops the current backend so the next use starts empty or picks up changed settings (tests).
+    """
+    global _backend
+    with _backend_lock:
+        _backend = None
+
+
+def _generation_prefix(generation):
+    return f"{KEY_PREFIX}:{generation}:"
+
+
+def board_key(generation, stat, scope='overall', value=None):
+    if scope == 'overall':
+        return f"{_generation_prefix(generation)}{stat}:overall"
+    return f"{_generation_prefix(generation)}{stat}:{scope}:{value}"
+
+
+def _player_key(generation, player_id):
+    # The boards a player is currently on, so a refresh can take them off the rest
+    return f"{_generation_prefix(generation)}player:{player_id}"
+
+
+def _season(date):
+    return timezone.localtime(date).year if timezone.is_aware(date) else date.year
+
+
+def fold_performances(rows):
+    """
+    Per-scope totals from PERFORMANCE_COLUMNS rows:
+    {player_id: {(scope, value): {'runs', 'wickets', ...}}}.
+    """
+    players = {}
+    for player_id, team_id, venue, date, runs, balls_faced, wickets, overs, conceded in rows:
+        scopes = players.setdefault(player_id, {})
+        for scope in (('overall', None), ('team', team_id), ('season', _season(date)), ('venue', venue)):
+            if scope[0] != 'overall' and not scope[1]:
+                continue
+            totals = scopes.setdefault(scope, {
+                'runs': 0, 'balls_faced': 0, 'wickets': 0, 'balls_bowled': 0, 'runs_conceded': 0,
+            })
+            totals['runs'] += runs
+            totals['balls_faced'] += balls_faced
+            totals['wickets'] += wickets
+            totals['balls_bowled'] += overs_to_balls(overs)
+            totals['runs_conceded'] += conceded
+    return players
+
+
+def board_scores(totals):
+    """
+    The score on each board a set of totals qualifies for.
+    """
+    scores = {}
+    if totals['runs'] or totals['balls_faced']:
+        scores['runs'] = totals['runs']
+    if totals['balls_bowled']:
+        scores['wickets'] = totals['wickets']
+    if totals['balls_faced'] >= MIN_BALLS_FACED:
+        scores['strike_rate'] = round(totals['runs'] * 100 / totals['balls_faced'], 2)
+    if totals['balls_bowled'] >= MIN_BALLS_BOWLED:
+        scores['economy'] = round(totals['runs_conceded'] * 6 / totals['balls_bowled'], 2)
+    return scores
+
+
+def _entries(generation, scopes):
+    # {board key: score} for one player's folded totals
+    return {
+        board_key(generation, stat, *scope): score
+        for scope, totals in scopes.items()
+        for stat, score in board_scores(totals).items()
+    }
+
+
+def rebuild_leaderboards():
+    """
+    Replaces every board with totals read from PlayerMatchPerformance in one
+    pass. Returns the number of boards written, or None if another process
+    is already rebuilding.
+    """
+    backend = get_backend()
+    generation = uuid.uuid4().hex
+    if not backend.add(BUILD_LOCK_KEY, generation, BUILD_LOCK_SECONDS):
+        return None
+    try:
+        backend.delete(REFRESHED_KEY)
+        rows = PlayerMatchPerformance.objects.order_by().values_list(*PERFORMANCE_COLUMNS)
+        boards = {}
+        memberships = {}
+        for player_id, scopes in fold_performances(rows.iterator(chunk_size=2000)).items():
+            entries = _entries(generation, scopes)
+            for key, score in entries.items():
+                boards.setdefault(key, {})[str(player_id)] = score
+            memberships[player_id] = sorted(entries)
+
+        for key, members in boards.items():
+            backend.zadd(key, members)
+        for player_id, keys in memberships.items():
+            backend.set(_player_key(generation, player_id), json.dumps(keys))
+        previous = backend.get(GENERATION_KEY)
+        backend.set(GENERATION_KEY, generation) # Readers move to the new boards here
+        refreshed = [int(member) for member, _ in backend.zrange(REFRESHED_KEY, 0, -1)]
+        backend.delete(REFRESHED_KEY)
+        refresh_players(refreshed)
+        if previous:
+            backend.delete_prefix(_generation_prefix(previous))
+    finally:
+        if backend.get(BUILD_LOCK_KEY) == generation: # Not if it expired and another build took it
+            backend.delete(BUILD_LOCK_KEY)
+    return len(boards)
+
+
+def _current_generation(backend):
+    """
+    The generation to read, building the boards first if there are none yet.
+    While another process builds them, None (the boards read as empty).
+    """
+    generation = backend.get(GENERATION_KEY)
+    if generation is None:
+        rebuild_leaderboards()
+        generation = backend.get(GENERATION_KEY)
+    return generation
+
+
+def refresh_players(player_ids):
+    """
+    Re-reads the given players' performances and moves them to their new
+    place on every board. Does nothing before the boards are first built.
+    """
+    backend = get_backend()
+    player_ids = set(player_ids)
+    generation = backend.get(GENERATION_KEY)
+    if not player_ids or generation is None:
+        return
+    if backend.get(BUILD_LOCK_KEY) is not None:
+        # The rebuild may have read these players' rows before this change; it refreshes them again
+        backend.zadd(REFRESHED_KEY, {str(player_id): 0 for player_id in player_ids})
+    rows = PlayerMatchPerformance.objects.filter(player_id__in=player_ids).order_by().values_list(*PERFORMANCE_COLUMNS)
+    folded = fold_performances(rows)
+    for player_id in player_ids:
+        member = str(player_id)
+        entries = _entries(generation, folded.get(player_id, {}))
+        for key, score in entries.items():
+            backend.zadd(key, {member: score})
+        for key in set(json.loads(backend.get(_player_key(generation, player_id)) or '[]')) - set(entries):
+            backend.zrem(key, member)
+        backend.set(_player_key(generation, player_id), json.dumps(sorted(entries)))
+
+
+def schedule_refresh(player_ids):
+    """
+    Refreshes the players once the current transaction commits, so a rolled
+    back save never reaches a shared backend.
+    """
+    player_ids = set(player_ids)
+    if player_ids:
+        transaction.on_commit(lambda: refresh_players(player_ids), robust=True)
+
+
+def parse_scope(params):
+    """
+    (scope, value) from ?team=<id>, ?season=<year> or ?venue=<name>; overall
+    without any of them. Raises ValueError for bad or combined filters.
+    """
+    given = [scope for scope in SCOPES[1:] if params.get(scope)]
+    if len(given) > 1:
+        raise ValueError("Filter by only one of 'team', 'season' and 'venue'.")
+    if not given:
+        return 'overall', None
+    scope = given[0]
+    if scope == 'venue':
+        return scope, params['venue']
+    try:
+        return scope, int(params[scope])
+    except ValueError:
+        raise ValueError(f"'{scope}' must be a number.") from None
+
+
+def _display(stat, score):
+    return int(score) if stat in ('runs', 'wickets') else float(score)
+
+
+def top(stat, scope='overall', value=None, limit=TOP_PLAYERS):
+    """
+    The first `limit` (player_id, score) pairs of a board, best first.
+    """
+    backend = get_backend()
+    generation = _current_generation(backend)
+    if generation is None:
+        return []
+    rows = backend.zrange(board_key(generation, stat, scope, value), 0, limit - 1, desc=stat not in LOWER_IS_BETTER)
+    return [(int(member), _display(stat, score)) for member, score in rows]
+
+
+def player_rank(player_id, stat, scope='overall', value=None):
+    """
+    {'rank' (1 = best), 'score', 'of'} for a player on a board, or None if
+    they aren't on it.
+    """
+    backend = get_backend()
+    generation = _current_generation(backend)
+    if generation is None:
+        return None
+    key = board_key(generation, stat, scope, value)
+    rank = backend.zrank(key, str(player_id), desc=stat not in LOWER_IS_BETTER)
+    if rank is None:
+        return None
+    return {'rank': rank + 1, 'score': _display(stat, backend.zscore(key, str(player_id))), 'of': backend.zcard(key)}
+
+
+def with_players(boards):
+    """
+    Replaces the player ids in {stat: [(player_id, score)]} with
+    [{'rank', 'player', 'score'}], loading every player in one query.
+    """
+    ids = {player_id for rows in boards.values() for player_id, _ in rows}
+    players = Player.objects.with_team().in_bulk(ids)
+    return {
+        stat: [
+            {'rank': rank, 'player': players[player_id], 'score': score}
+            for rank, (player_id, score) in enumerate(rows, start=1)
+            if player_id in players
+        ]
+        for stat, rows in boards.items()
+    }
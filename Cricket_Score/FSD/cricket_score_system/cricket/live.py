@@ -0,0 +1,213 @@
+# cricket/live.py
+
+"""
+Server-push fan-out for live scores.
+
+Each process has one Broadcaster. It holds a single backend subscription per
+match and copies every event into the queue of each viewer connected to that
+process, so N viewers cost one subscription rather than N polls.
+
+Backends are pluggable through settings.CRICKET_LIVE_BACKEND:
+  - LocalBackend (default): in-process only. Enough for a single ASGI worker,
+    and the stand-in used by the tests.
+  - RedisBackend: Redis pub/sub, so a ball saved in any process (admin, scorer
+    API, management command) reaches viewers on every ASGI worker.
+"""
+
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Events a slow viewer may fall behind by before the oldest are dropped.
+# Dropped viewers catch up from the cursor-based update API.
+VIEWER_QUEUE_SIZE = 100
+
+
+def channel_name(match_id):
+    return f"cricket:match:{match_id}"
+
+
+class LocalBackend:
+    """
+    In-process publish/subscribe.
+    """
+
+    def __init__(self, **options):
+        self._listeners = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        with self._lock:
+            listeners = list(self._listeners.get(channel, ()))
+        for callback in listeners:
+            callback(message)
+
+    def subscribe(self, channel, callback):
+        """
+        Registers a callback and returns a function that removes it again.
+        """
+        with self._lock:
+            self._listeners[channel].append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                listeners = self._listeners.get(channel, [])
+                if callback in listeners:
+                    listeners.remove(callback)
+                if not listeners:
+                    self._listeners.pop(channel, None)
+
+        return unsubscribe
+
+
+class RedisBackend:
+    """
+    Redis pub/sub. Requires the `redis` package and settings like:
+    CRICKET_LIVE_BACKEND_OPTIONS = {'url': 'redis://localhost:6379/0'}
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', **options):
+        import redis # Optional dependency, only needed for this backend
+
+        self._client = redis.Redis.from_url(url)
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        self._client.publish(channel, message)
+
+    def subscribe(self, channel, callback):
+        def handler(item):
+            data = item['data']
+            callback(data.decode() if isinstance(data, bytes) else data)
+
+        with self._lock:
+            self._pubsub.subscribe(**{channel: handler})
+            # redis-py needs a subscription before its listener thread can start
+            if self._thread is None:
+                self._thread = self._pubsub.run_in_thread(sleep_time=0.05, daemon=True)
+
+        def unsubscribe():
+            with self._lock:
+                self._pubsub.unsubscribe(channel)
+
+        return unsubscribe
+
+
+def _put_dropping_oldest(queue, message):
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(message)
+
+
+class Broadcaster:
+    """
+    Fans backend events for a match out to every viewer queue in this process.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._viewers = defaultdict(set) # match_id -> {(queue, loop)}
+        self._unsubscribers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, match_id, event):
+        """
+        Sends an event (a JSON-serializable dict) to every viewer of a match.
+        Safe to call from synchronous code such as signal handlers.
+        """
+        self.backend.publish(channel_name(match_id), json.dumps(event))
+
+    def viewer_count(self, match_id):
+        return len(self._viewers.get(match_id, ()))
+
+    def _deliver(self, match_id, message):
+        # Called on whatever thread the backend delivers on; hand each message
+        # to the viewer's own event loop.
+        with self._lock:
+            viewers = list(self._viewers.get(match_id, ()))
+        for queue, loop in viewers:
+            loop.call_soon_threadsafe(_put_dropping_oldest, queue, message)
+
+    def _add_viewer(self, match_id, viewer):
+        with self._lock:
+            self._viewers[match_id].add(viewer)
+            first = match_id not in self._unsubscribers
+            if first:
+                # Reserve the slot so concurrent viewers don't subscribe twice
+                self._unsubscribers[match_id] = None
+        if first:
+            unsubscribe = self.backend.subscribe(
+                channel_name(match_id), lambda message: self._deliver(match_id, message)
+            )
+            with self._lock:
+                if match_id in self._viewers:
+                    self._unsubscribers[match_id] = unsubscribe
+                    unsubscribe = None
+                else:
+                    # Everyone left while we were subscribing
+                    self._unsubscribers.pop(match_id, None)
+            if unsubscribe is not None:
+                unsubscribe()
+
+    def _remove_viewer(self, match_id, viewer):
+        unsubscribe = None
+        with self._lock:
+            viewers = self._viewers.get(match_id)
+            if viewers is not None:
+                viewers.discard(viewer)
+                if not viewers:
+                    del self._viewers[match_id]
+                    unsubscribe = self._unsubscribers.pop(match_id, None)
+        if unsubscribe is not None:
+            unsubscribe()
+
+    async def listen(self, match_id, timeout=None):
+        """
+        Async iterator over raw JSON messages for a match.
+        Yields None whenever `timeout` seconds pass without an event, so the
+        caller can send keep-alives.
+        """
+        queue = asyncio.Queue(maxsize=VIEWER_QUEUE_SIZE)
+        viewer = (queue, asyncio.get_running_loop())
+        self._add_viewer(match_id, viewer)
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self._remove_viewer(match_id, viewer)
+
+
+_broadcaster = None
+_broadcaster_lock = threading.Lock()
+
+
+def get_broadcaster():
+    """
+    The process-wide Broadcaster, built from settings on first use.
+    """
+    global _broadcaster
+    if _broadcaster is None:
+        with _broadcaster_lock:
+            if _broadcaster is None:
+                backend_path = getattr(settings, 'CRICKET_LIVE_BACKEND', 'cricket.live.LocalBackend')
+                options = getattr(settings, 'CRICKET_LIVE_BACKEND_OPTIONS', {})
+                _broadcaster = Broadcaster(import_string(backend_path)(**options))
+    return _broadcaster
+
+
+def reset_broadcaster():
+    """
+    Drops the current Broadcaster so the next use picks up changed settings (tests).
+    """
+    global _broadcaster
+    with _broadcaster_lock:
+        _broadcaster = None
@@ -0,0 +1,92 @@
+# cricket/management/commands/explain_queries.py
+
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from cricket.models import Ball, InningsScore, Match, Player, PlayerMatchPerformance, Team
+
+# Plan lines that mean a whole table is read. SQLite prints "SCAN <table>" (a
+# full scan unless followed by an index name); PostgreSQL prints "Seq Scan on <table>".
+TABLE_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?:TABLE )?(?P<table>\w+)(?! USING (?:COVERING )?INDEX)(?!\w)'),
+    'postgresql': re.compile(r'Seq Scan on (?P<table>\w+)'),
+}
+# Plan lines for an extra sort step, reported but not counted as problems
+SORT_PATTERNS = {
+    'sqlite': re.compile(r'USE TEMP B-TREE'),
+    'postgresql': re.compile(r'^\s*(->\s*)?Sort\b', re.MULTILINE),
+}
+
+
+def hot_queries():
+    """
+    The query shapes behind the public pages, as unevaluated querysets.
+    Ids come from existing rows where possible; the plans don't depend on them.
+    """
+    now = timezone.now()
+    match_id = Match.objects.values_list('id', flat=True).first() or 0
+    player_id = Player.objects.values_list('id', flat=True).first() or 0
+    team_id = Team.objects.values_list('id', flat=True).first() or 0
+    return [
+        ('home: upcoming matches', Match.objects.filter(date__gte=now, status__in=['Upcoming', 'Live']).order_by('date')[:5]),
+        ('home: completed matches', Match.objects.filter(date__lt=now, status='Completed').order_by('-date')[:5]),
+        ('all matches: first page', Match.objects.order_by('-date', '-id')[:21]),
+        ('all matches: by status', Match.objects.filter(status='Completed').order_by('-date', '-id')[:21]),
+        ('all matches: by venue', Match.objects.filter(venue='Arena Oval').order_by('-date', '-id')[:21]),
+        ('team detail: players', Player.objects.filter(team_id=team_id).order_by('name')),
+        ('match detail: commentary', Ball.objects.filter(match_id=match_id).order_by('-sequence')),
+        ('match detail: innings', InningsScore.objects.filter(match_id=match_id)),
+        ('player stats: recent form', PlayerMatchPerformance.objects.filter(player_id=player_id).order_by('-match_date', '-match_id')[:5]),
+        ('player history: first page', PlayerMatchPerformance.objects.filter(player_id=player_id).order_by('-match_date', '-match_id')[:21]),
+        ('rollup: balls in delivery order', Ball.objects.filter(match_id=match_id).order_by('sequence').values_list('id', 'runs')),
+    ]
+
+
+def table_scans(plan, vendor=None):
+    """
+    Table names read by a full scan in an EXPLAIN plan.
+    """
+    pattern = TABLE_SCAN_PATTERNS.get(vendor or connection.vendor)
+    if pattern is None:
+        raise CommandError(f"explain_queries does not support the '{connection.vendor}' backend.")
+    return [found.group('table') for found in pattern.finditer(plan)]
+
+
+def has_sort(plan, vendor=None):
+    return bool(SORT_PATTERNS[vendor or connection.vendor].search(plan))
+
+
+class Command(BaseCommand):
+    help = "Runs EXPLAIN for the core page queries and reports any full table scans (SQLite and PostgreSQL)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fail-on-scan', action='store_true', help='Exit with an error if any query scans a table.')
+        parser.add_argument('--show-plans', action='store_true', help='Print every plan, not just the problem ones.')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in TABLE_SCAN_PATTERNS:
+            raise CommandError(f"explain_queries does not support the '{connection.vendor}' backend.")
+
+        queries = hot_queries()
+        problems = 0
+        for label, queryset in queries:
+            plan = queryset.explain()
+            scans = table_scans(plan)
+            if scans:
+                problems += 1
+                self.stdout.write(self.style.WARNING(f"{label}: table scan on {', '.join(scans)}"))
+            else:
+                note = " (sorts in memory)" if has_sort(plan) else ""
+                self.stdout.write(f"{label}: ok{note}")
+            if scans or options['show_plans']:
+                self.stdout.write('    ' + plan.replace('\n', '\n    '))
+
+        if connection.vendor == 'postgresql':
+            # The planner prefers sequential scans on small tables regardless of indexes
+            self.stdout.write("Note: PostgreSQL plans depend on table statistics; run ANALYZE on realistic data first.")
+        if problems and options['fail_on_scan']:
+            raise CommandError(f"{problems} query(ies) scan a whole table.")
+        self.stdout.write(self.style.SUCCESS(f"Checked {len(queries)} queries, {problems} with table scans."))
@@ -0,0 +1,35 @@
+# cricket/management/commands/fit_prediction_model.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from cricket import prediction
+
+
+class Command(BaseCommand):
+    help = (
+        "Fits the projected-score and win-probability tables from the first innings of completed "
+        "matches and saves them to settings.CRICKET_PREDICTION_MODEL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('match_ids', nargs='*', type=int, help='Only fit on these matches.')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        innings_count = 0
+
+        def counted(innings):
+            nonlocal innings_count
+            for deliveries in innings:
+                innings_count += 1
+                yield deliveries
+
+        model = prediction.PredictionModel.fit(counted(prediction.first_innings_from_balls(options['match_ids'])))
+        path = prediction.model_path()
+        model.save(path)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Fitted on {innings_count} innings ({int(model.samples.sum())} states) in {elapsed:.1f}s; saved to {path}."
+        ))
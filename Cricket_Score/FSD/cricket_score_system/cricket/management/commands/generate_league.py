@@ -0,0 +1,37 @@
+# cricket/management/commands/generate_league.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cricket import synthetic
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates a seeded synthetic league: teams of players and a double round-robin of ball-by-ball "
+        "matches per season, loaded through the scorecard importer. The same arguments always give the "
+        "same league, and re-running adds nothing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teams', type=int, default=8, help='Number of teams (default 8).')
+        parser.add_argument('--seasons', type=int, default=1, help='Number of seasons (default 1).')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default 0).')
+        parser.add_argument('--overs', type=int, default=20, help='Overs per innings (default 20).')
+        parser.add_argument('--players', type=int, default=11, help='Players per team (default 11).')
+
+    def handle(self, *args, **options):
+        if options['teams'] < 2 or options['players'] < 2 or options['overs'] < 1 or options['seasons'] < 1:
+            raise CommandError("A league needs at least two teams of two players, one over and one season.")
+
+        def progress(stats):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"  {stats.matches} matches, {stats.balls} balls")
+
+        stats = synthetic.generate_league(
+            teams=options['teams'], seasons=options['seasons'], seed=options['seed'],
+            overs=options['overs'], players=options['players'], progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {stats.matches} match(es) and {stats.balls} balls in {stats.seconds:.1f}s; "
+            f"skipped {stats.skipped} already there."
+        ))
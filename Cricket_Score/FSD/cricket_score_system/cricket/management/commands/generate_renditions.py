@@ -0,0 +1,19 @@
+# cricket/management/commands/generate_renditions.py
+
+from django.core.management.base import BaseCommand
+
+from cricket import renditions
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes the thumbnail and WebP renditions of team logos and player images "
+        "that don't have up-to-date ones yet (all of them with --force)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Re-render every image.')
+
+    def handle(self, *args, **options):
+        count = renditions.generate_renditions(force=options['force'])
+        self.stdout.write(self.style.SUCCESS(f"Rendered images of {count} team(s) and player(s)."))
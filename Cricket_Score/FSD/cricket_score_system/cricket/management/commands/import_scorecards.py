@@ -0,0 +1,41 @@
+# cricket/management/commands/import_scorecards.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cricket import ingest
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports historical ball-by-ball scorecards from Cricsheet JSON files or delivery-per-row CSV "
+        "files (or directories of them). Matches already imported are skipped, so an interrupted run "
+        "can be repeated."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Files or directories to import.')
+        parser.add_argument('--chunk-size', type=int, default=50, help='Matches per transaction (default 50).')
+        parser.add_argument('--replace', action='store_true', help='Re-import matches that already exist.')
+
+    def handle(self, *args, **options):
+        def progress(stats):
+            if options['verbosity'] > 1:
+                self.stdout.write(
+                    f"  {stats.matches} matches, {stats.balls} balls, {stats.rows_per_second:,.0f} rows/s"
+                )
+
+        try:
+            stats = ingest.import_scorecards(
+                ingest.read_scorecards(options['paths']),
+                chunk_size=options['chunk_size'],
+                replace=options['replace'],
+                progress=progress,
+            )
+        except (ingest.ScorecardError, OSError) as error:
+            # Chunks committed before the error stay; re-running resumes after them
+            raise CommandError(str(error))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats.matches} match(es) and {stats.balls} balls in {stats.seconds:.1f}s "
+            f"({stats.rows_per_second:,.0f} rows/s); skipped {stats.skipped} already imported."
+        ))
@@ -0,0 +1,16 @@
+# cricket/management/commands/rebuild_career_stats.py
+
+from django.core.management.base import BaseCommand
+
+from cricket import career
+
+
+class Command(BaseCommand):
+    help = "Recomputes PlayerCareerStats from PlayerMatchPerformance (all players, or the given player ids)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('player_ids', nargs='*', type=int, help='Only rebuild these players.')
+
+    def handle(self, *args, **options):
+        count = career.rebuild_career_stats(options['player_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt career stats for {count} player(s)."))
@@ -0,0 +1,28 @@
+# cricket/management/commands/rebuild_innings.py
+
+from django.core.management.base import BaseCommand
+
+from cricket import innings
+from cricket.models import Match
+
+
+class Command(BaseCommand):
+    help = "Recomputes the precomputed innings totals from Ball data (all matches, or the given match ids)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('match_ids', nargs='*', type=int, help='Only rebuild these matches.')
+
+    def handle(self, *args, **options):
+        matches = Match.objects.order_by('id')
+        if options['match_ids']:
+            matches = matches.filter(pk__in=options['match_ids'])
+
+        count = 0
+        for match_id in matches.values_list('id', flat=True).iterator():
+            states = innings.rebuild_match(match_id)
+            count += 1
+            if options['verbosity'] > 1:
+                scores = ', '.join(str(state) for state in states) or 'no balls'
+                self.stdout.write(f"Match {match_id}: {scores}")
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt innings totals for {count} match(es)."))
@@ -0,0 +1,18 @@
+# cricket/management/commands/rebuild_leaderboards.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cricket import leaderboards
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds every leaderboard (overall, team, season and venue) from "
+        "PlayerMatchPerformance into the configured leaderboard backend."
+    )
+
+    def handle(self, *args, **options):
+        count = leaderboards.rebuild_leaderboards()
+        if count is None:
+            raise CommandError("Another process is rebuilding the leaderboards; try again when it has finished.")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} leaderboard(s)."))
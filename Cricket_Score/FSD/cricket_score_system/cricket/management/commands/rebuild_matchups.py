@@ -0,0 +1,19 @@
+# cricket/management/commands/rebuild_matchups.py
+
+from django.core.management.base import BaseCommand
+
+from cricket import matchups
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the batsman-v-bowler and team-v-team matchup index from Ball "
+        "(everything, or only the matchups of the given player ids)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('player_ids', nargs='*', type=int, help='Only rebuild these players\' matchups.')
+
+    def handle(self, *args, **options):
+        count = matchups.rebuild_matchups(options['player_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} matchup row(s)."))
@@ -0,0 +1,14 @@
+# cricket/management/commands/rebuild_search_index.py
+
+from django.core.management.base import BaseCommand
+
+from cricket import search
+
+
+class Command(BaseCommand):
+    help = "Re-indexes every ball's commentary, players and venue for the full-text search."
+
+    def handle(self, *args, **options):
+        count = search.rebuild_index()
+        backend = search.get_backend()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} ball(s) with the {backend.name} backend."))
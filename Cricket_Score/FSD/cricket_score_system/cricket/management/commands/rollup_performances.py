@@ -0,0 +1,33 @@
+# cricket/management/commands/rollup_performances.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from cricket import rollup
+
+
+class Command(BaseCommand):
+    help = (
+        "Derives PlayerMatchPerformance rows from Ball data for all matches (or the given match ids), "
+        "processing matches in chunks to keep memory bounded."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('match_ids', nargs='*', type=int, help='Only roll up these matches.')
+        parser.add_argument('--chunk-size', type=int, default=100, help='Matches per transaction (default 100).')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        def progress(done, total):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"  {done}/{total} matches")
+
+        count = rollup.backfill(
+            chunk_size=options['chunk_size'],
+            match_ids=options['match_ids'] or None,
+            progress=progress,
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {count} match(es) in {elapsed:.1f}s."))
@@ -0,0 +1,102 @@
+# cricket/management/commands/run_benchmarks.py
+
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+from cricket import benchmarks, leaderboards, search, synthetic
+
+# Nothing the benchmarks do may reach a shared cache or leaderboard store
+ISOLATED_SETTINGS = {
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmarks'}},
+    'CRICKET_LEADERBOARD_BACKEND': 'cricket.leaderboards.LocalBackend',
+    'CRICKET_LEADERBOARD_BACKEND_OPTIONS': {},
+    'CRICKET_LIVE_BACKEND': 'cricket.live.LocalBackend',
+    'CRICKET_LIVE_BACKEND_OPTIONS': {},
+    'CRICKET_RENDITION_WORKERS': 0,
+    # Traced runs are slow on purpose; don't log every page as a slow request
+    'CRICKET_SLOW_REQUEST_MS': float('inf'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the main pages, admin changelists, bulk loading and aggregation against a seeded "
+        "synthetic league in a throwaway test database, and compares the results with the stored "
+        "baseline (benchmarks/baseline.json)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teams', type=int, default=8, help='Teams in the league (default 8).')
+        parser.add_argument('--seasons', type=int, default=1, help='Seasons in the league (default 1).')
+        parser.add_argument('--seed', type=int, default=0, help='League seed (default 0).')
+        parser.add_argument('--iterations', type=int, help="Timed runs per scenario (default: each scenario's own).")
+        parser.add_argument('--only', action='append', help='Run scenarios whose name contains this; repeatable.')
+        parser.add_argument('--baseline', help='Baseline file (default settings.CRICKET_BENCHMARK_BASELINE).')
+        parser.add_argument('--save-baseline', action='store_true', help='Write the results as the new baseline.')
+        parser.add_argument(
+            '--tolerance', type=float, default=benchmarks.DEFAULT_TOLERANCE,
+            help='Allowed growth of p95 latency and peak memory before it counts as a regression (default 0.25).',
+        )
+        parser.add_argument('--fail-on-regression', action='store_true', help='Exit with an error on any regression.')
+
+    def handle(self, *args, **options):
+        league = {'teams': options['teams'], 'seasons': options['seasons'], 'seed': options['seed']}
+        with override_settings(**ISOLATED_SETTINGS):
+            results, size = self.run(league, options)
+
+        baseline = benchmarks.load_baseline(options['baseline'])
+        if options['save_baseline']:
+            path = benchmarks.save_baseline(
+                results, options['baseline'], league=league, data=size,
+                created=datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            )
+            self.stdout.write(self.style.SUCCESS(f"Saved the baseline to {path}."))
+            return
+        if baseline is None:
+            self.stdout.write("No baseline to compare with; run with --save-baseline to record one.")
+            return
+        if baseline.get('league') != league:
+            self.stdout.write(self.style.WARNING(
+                f"The baseline was recorded with league {baseline.get('league')}; the comparison may not be fair."
+            ))
+
+        regressions = benchmarks.compare(results, baseline, options['tolerance'])
+        for line in regressions:
+            self.stdout.write(self.style.ERROR(f"Regression: {line}"))
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+        elif options['fail_on_regression']:
+            raise CommandError(f"{len(regressions)} regression(s) against the baseline.")
+
+    def run(self, league, options):
+        verbosity = options['verbosity']
+        setup_test_environment()
+        databases = setup_databases(verbosity=max(verbosity - 1, 0), interactive=False, aliases={'default'})
+        leaderboards.reset_backend()
+        search.reset_backend()
+        try:
+            stats = synthetic.generate_league(**league)
+            size = benchmarks.data_size()
+            self.stdout.write(
+                f"League of {league['teams']} teams: {stats.matches} matches, {stats.balls} balls "
+                f"generated in {stats.seconds:.1f}s."
+            )
+            self.stdout.write(f"{'scenario':<34}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'peak KiB':>10}")
+
+            def progress(name, result):
+                self.stdout.write(
+                    f"{name:<34}{result.p50_ms:>9.1f}{result.p95_ms:>9.1f}{result.p99_ms:>9.1f}"
+                    f"{result.queries:>9}{result.peak_kib:>10}"
+                )
+
+            results = benchmarks.run_suite(options['only'], options['iterations'], league['seed'], progress)
+        finally:
+            teardown_databases(databases, verbosity=max(verbosity - 1, 0))
+            teardown_test_environment()
+            leaderboards.reset_backend()
+            search.reset_backend()
+        return results, size
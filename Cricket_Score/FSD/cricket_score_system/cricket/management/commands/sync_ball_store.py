@@ -0,0 +1,32 @@
+# cricket/management/commands/sync_ball_store.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from cricket import ballstore
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports Ball rows into the columnar, memory-mapped store used for analytics "
+        "(settings.CRICKET_BALL_STORE). Appends balls recorded since the last sync; "
+        "the store is rebuilt when exported balls were edited or deleted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild the whole store.')
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Also compare checksums of every exported column, to catch changes made outside the ORM (a full scan).',
+        )
+        parser.add_argument('--path', help='Store directory (defaults to settings.CRICKET_BALL_STORE).')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        result = ballstore.sync_ball_store(options['path'], full=options['full'], verify=options['verify'])
+        elapsed = time.monotonic() - started
+        action = "Rebuilt" if result.rebuilt else "Synced"
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} ball store: {result.added} ball(s) written, {result.rows} in total ({elapsed:.1f}s)."
+        ))
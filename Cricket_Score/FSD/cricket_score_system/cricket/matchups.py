@@ -0,0 +1,187 @@
+# cricket/matchups.py
+
+"""
+Maintains the matchup index: running totals per (batsman, bowler) and per
+(batting team, bowling team).
+
+Like career stats, every new, edited or deleted Ball is turned into a delta
+and applied with UPDATE ... SET x = x + n, so recording a delivery costs two
+single-row updates and reading a matchup is one unique-index lookup, however
+much history there is. Bulk loads skip the signals and call
+rebuild_matchups() for the players they touched.
+"""
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import Ball, BatsmanBowlerMatchup, TeamMatchup
+
+MATCHUP_FIELDS = ('balls', 'runs', 'dismissals', 'dots', 'fours', 'sixes')
+# How many opponents a player or team page lists
+TOP_MATCHUPS = 10
+
+
+def contribution(ball):
+    """
+    What a single delivery adds to its batsman-bowler and team matchups.
+    """
+    faced = not ball.is_wide
+    return {
+        'balls': int(faced),
+        'runs': ball.runs,
+        'dismissals': int(ball.is_wicket),
+        'dots': int(faced and not ball.is_no_ball and ball.runs == 0),
+        'fours': int(ball.runs == 4),
+        'sixes': int(ball.runs == 6),
+    }
+
+
+def matchup_keys(ball):
+    """
+    (model, lookup) of each index row a delivery counts towards.
+    """
+    return [
+        (BatsmanBowlerMatchup, {'batsman_id': ball.batsman_id, 'bowler_id': ball.bowler_id}),
+        (TeamMatchup, {'batting_team_id': ball.batsman.team_id, 'bowling_team_id': ball.bowler.team_id}),
+    ]
+
+
+def apply_delta(model, lookup, delta, sign=1):
+    """
+    Adds (sign=1) or removes (sign=-1) a contribution from one matchup row.
+    """
+    changes = {field: F(field) + sign * delta[field] for field in MATCHUP_FIELDS if delta[field]}
+    if not changes:
+        return
+    if not model.objects.filter(**lookup).update(**changes) and sign > 0:
+        # First ball between these two: create the row, then apply the delta.
+        # A removal with no row left (a cascade deleted it first) has nothing to undo.
+        model.objects.get_or_create(**lookup)
+        model.objects.filter(**lookup).update(**changes)
+
+
+def ball_changed(old, new):
+    """
+    Applies a create (old is None), update or delete (new is None) of a ball.
+    """
+    if old is not None:
+        for model, lookup in matchup_keys(old):
+            apply_delta(model, lookup, contribution(old), sign=-1)
+    if new is not None:
+        for model, lookup in matchup_keys(new):
+            apply_delta(model, lookup, contribution(new))
+
+
+def _totals(balls, group_by):
+    # Aggregates can't reuse a field name (runs) that the filters still refer to
+    rows = balls.values(*group_by).annotate(
+        total_balls=Count('id', filter=Q(is_wide=False)),
+        total_runs=Sum('runs'),
+        total_dismissals=Count('id', filter=Q(is_wicket=True)),
+        total_dots=Count('id', filter=Q(is_wide=False, is_no_ball=False, runs=0)),
+        total_fours=Count('id', filter=Q(runs=4)),
+        total_sixes=Count('id', filter=Q(runs=6)),
+    )
+    for row in rows.iterator():
+        yield [row[column] for column in group_by], {field: row[f'total_{field}'] for field in MATCHUP_FIELDS}
+
+
+def rebuild_matchups(player_ids=None):
+    """
+    Recomputes the index from Ball with two grouped queries. Pass player_ids
+    to limit the rebuild to those players' matchups and their teams' rows.
+    Returns the number of rows written.
+    """
+    balls = Ball.objects.order_by()
+    pairs = BatsmanBowlerMatchup.objects.all()
+    teams = TeamMatchup.objects.all()
+    if player_ids is not None:
+        involved = Q(batsman_id__in=player_ids) | Q(bowler_id__in=player_ids)
+        pairs = pairs.filter(involved)
+        team_ids = set(
+            Ball.objects.filter(involved).order_by()
+            .values_list('batsman__team_id', 'bowler__team_id').distinct().iterator()
+        )
+        team_ids = {team_id for pair in team_ids for team_id in pair}
+        teams = teams.filter(Q(batting_team_id__in=team_ids) | Q(bowling_team_id__in=team_ids))
+        player_balls = balls.filter(involved)
+        team_balls = balls.filter(Q(batsman__team_id__in=team_ids) | Q(bowler__team_id__in=team_ids))
+    else:
+        player_balls = team_balls = balls
+
+    pair_rows = [
+        BatsmanBowlerMatchup(batsman_id=batsman_id, bowler_id=bowler_id, **totals)
+        for (batsman_id, bowler_id), totals in _totals(player_balls, ('batsman_id', 'bowler_id'))
+    ]
+    team_rows = [
+        TeamMatchup(batting_team_id=batting, bowling_team_id=bowling, **totals)
+        for (batting, bowling), totals in _totals(team_balls, ('batsman__team_id', 'bowler__team_id'))
+    ]
+    with transaction.atomic():
+        pairs.delete()
+        teams.delete()
+        BatsmanBowlerMatchup.objects.bulk_create(pair_rows, batch_size=500)
+        TeamMatchup.objects.bulk_create(team_rows, batch_size=500)
+    return len(pair_rows) + len(team_rows)
+
+
+def player_matchup(batsman_id, bowler_id):
+    """
+    The matchup row for a batsman against a bowler; an empty one if they have never met.
+    """
+    return (
+        BatsmanBowlerMatchup.objects.filter(batsman_id=batsman_id, bowler_id=bowler_id).first()
+        or BatsmanBowlerMatchup(batsman_id=batsman_id, bowler_id=bowler_id)
+    )
+
+
+def head_to_head(team_id, other_team_id):
+    """
+    Both directions of a team pairing: (team batting v other, other batting v team).
+    """
+    rows = {
+        (row.batting_team_id, row.bowling_team_id): row
+        for row in TeamMatchup.objects.filter(
+            Q(batting_team_id=team_id, bowling_team_id=other_team_id)
+            | Q(batting_team_id=other_team_id, bowling_team_id=team_id)
+        )
+    }
+    return tuple(
+        rows.get((batting, bowling)) or TeamMatchup(batting_team_id=batting, bowling_team_id=bowling)
+        for batting, bowling in ((team_id, other_team_id), (other_team_id, team_id))
+    )
+
+
+def player_matchups(player_id, limit=TOP_MATCHUPS):
+    """
+    A player's most-faced bowlers and most-bowled-to batsmen, by balls:
+    {'batting': [...], 'bowling': [...]}.
+    """
+    rows = BatsmanBowlerMatchup.objects.with_players().order_by('-balls', '-runs')
+    return {
+        'batting': list(rows.filter(batsman_id=player_id)[:limit]),
+        'bowling': list(rows.filter(bowler_id=player_id)[:limit]),
+    }
+
+
+def team_matchups(team_id):
+    """
+    Every opponent a team has played balls against, with both directions:
+    [{'opponent', 'batting', 'bowling'}], most balls first. `batting` is the
+    team batting against the opponent; either may be an empty row.
+    """
+    by_opponent = {}
+    rows = TeamMatchup.objects.with_teams().filter(Q(batting_team_id=team_id) | Q(bowling_team_id=team_id))
+    for row in rows:
+        if row.batting_team_id == team_id:
+            opponent, side = row.bowling_team, 'batting'
+        else:
+            opponent, side = row.batting_team, 'bowling'
+        by_opponent.setdefault(opponent.pk, {'opponent': opponent})[side] = row
+    pairings = []
+    for entry in by_opponent.values():
+        opponent = entry['opponent']
+        entry.setdefault('batting', TeamMatchup(batting_team_id=team_id, bowling_team=opponent))
+        entry.setdefault('bowling', TeamMatchup(batting_team=opponent, bowling_team_id=team_id))
+        pairings.append(entry)
+    return sorted(pairings, key=lambda entry: entry['batting'].balls + entry['bowling'].balls, reverse=True)
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cricket', '0003_player_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InningsScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('runs', models.PositiveIntegerField(default=0)),
+                ('wickets', models.PositiveIntegerField(default=0)),
+                ('legal_balls', models.PositiveIntegerField(default=0)),
+                ('wides', models.PositiveIntegerField(default=0)),
+                ('no_balls', models.PositiveIntegerField(default=0)),
+                ('over_runs', models.JSONField(default=list)),
+                ('over_wickets', models.JSONField(default=list)),
+                ('last_ball_id', models.BigIntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('batting_team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='innings_scores', to='cricket.team')),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='innings_scores', to='cricket.match')),
+            ],
+            options={
+                'unique_together': {('match', 'batting_team')},
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_career_stats(apps, schema_editor):
+    """
+    Seed career totals from the performances that already exist.
+    """
+    PlayerMatchPerformance = apps.get_model('cricket', 'PlayerMatchPerformance')
+    PlayerCareerStats = apps.get_model('cricket', 'PlayerCareerStats')
+
+    totals = {}
+    for perf in PlayerMatchPerformance.objects.order_by().iterator():
+        row = totals.setdefault(perf.player_id, PlayerCareerStats(player_id=perf.player_id))
+        whole = int(perf.overs_bowled)
+        row.matches += 1
+        row.runs += perf.runs_scored
+        row.wickets += perf.wickets_taken
+        row.balls_faced += perf.balls_faced
+        row.balls_bowled += whole * 6 + round((perf.overs_bowled - whole) * 10)
+    PlayerCareerStats.objects.bulk_create(totals.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cricket', '0004_innings_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playermatchperformance',
+            name='is_out',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='playermatchperformance',
+            name='runs_conceded',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='PlayerCareerStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('matches', models.PositiveIntegerField(default=0)),
+                ('runs', models.IntegerField(default=0)),
+                ('wickets', models.IntegerField(default=0)),
+                ('balls_faced', models.IntegerField(default=0)),
+                ('balls_bowled', models.IntegerField(default=0)),
+                ('runs_conceded', models.IntegerField(default=0)),
+                ('dismissals', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('player', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='career_stats', to='cricket.player')),
+            ],
+            options={
+                'verbose_name_plural': 'player career stats',
+            },
+        ),
+        migrations.RunPython(build_career_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:05
+
+from django.db import migrations, models
+
+
+def copy_match_dates(apps, schema_editor):
+    PlayerMatchPerformance = apps.get_model('cricket', 'PlayerMatchPerformance')
+    Match = apps.get_model('cricket', 'Match')
+    PlayerMatchPerformance.objects.update(
+        match_date=models.Subquery(Match.objects.filter(pk=models.OuterRef('match_id')).values('date')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cricket', '0006_match_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playermatchperformance',
+            name='match_date',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(copy_match_dates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='playermatchperformance',
+            name='match_date',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AlterModelOptions(
+            name='playermatchperformance',
+            options={'ordering': ['-match_date']},
+        ),
+        migrations.AddIndex(
+            model_name='playermatchperformance',
+            index=models.Index(fields=['player', 'match_date', 'match'], name='perf_player_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ball',
+            index=models.Index(fields=['match', 'over', 'id'], name='ball_match_over_idx'),
+        ),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:10
+
+from django.db import migrations, models
+
+
+def number_deliveries(apps, schema_editor):
+    """
+    Splits each float `over` into over_number and ball_in_over, numbers the
+    innings by the order the sides first batted in, and gives every ball its
+    place in the match: innings first, then over, then recording order.
+    """
+    Ball = apps.get_model('cricket', 'Ball')
+    match_ids = Ball.objects.order_by().values_list('match_id', flat=True).distinct()
+    for match_id in match_ids.iterator():
+        balls = list(
+            Ball.objects.filter(match_id=match_id)
+            .select_related('batsman')
+            .only('id', 'over', 'batsman__team_id')
+            .order_by('id')
+        )
+        innings_by_team = {}
+        for ball in balls:
+            ball.innings = innings_by_team.setdefault(ball.batsman.team_id, len(innings_by_team) + 1)
+            ball.over_number = int(ball.over)
+            ball.ball_in_over = round((ball.over - ball.over_number) * 10)
+        balls.sort(key=lambda ball: (ball.innings, ball.over, ball.pk))
+        for sequence, ball in enumerate(balls, start=1):
+            ball.sequence = sequence
+        Ball.objects.bulk_update(balls, ['innings', 'over_number', 'ball_in_over', 'sequence'], batch_size=500)
+
+
+def restore_overs(apps, schema_editor):
+    Ball = apps.get_model('cricket', 'Ball')
+    Ball.objects.update(over=models.F('over_number') + models.F('ball_in_over') / 10.0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cricket', '0008_match_external_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ball',
+            name='innings',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ball',
+            name='over_number',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='ball',
+            name='ball_in_over',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='ball',
+            name='sequence',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        # Nullable so that unapplying this migration can add the column back before refilling it
+        migrations.AlterField(
+            model_name='ball',
+            name='over',
+            field=models.FloatField(null=True),
+        ),
+        migrations.RunPython(number_deliveries, restore_overs),
+        migrations.AlterField(
+            model_name='ball',
+            name='innings',
+            field=models.PositiveSmallIntegerField(blank=True),
+        ),
+        migrations.AlterField(
+            model_name='ball',
+            name='over_number',
+            field=models.PositiveSmallIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='ball',
+            name='ball_in_over',
+            field=models.PositiveSmallIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='ball',
+            name='sequence',
+            field=models.PositiveIntegerField(blank=True, editable=False),
+        ),
+        migrations.RemoveIndex(
+            model_name='ball',
+            name='ball_match_over_idx',
+        ),
+        migrations.RemoveField(
+            model_name='ball',
+            name='over',
+        ),
+        migrations.AddConstraint(
+            model_name='ball',
+            constraint=models.UniqueConstraint(fields=('match', 'sequence'), name='ball_match_sequence_uniq'),
+        ),
+    ]
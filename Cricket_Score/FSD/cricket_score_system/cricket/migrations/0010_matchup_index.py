@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def build_matchups(apps, schema_editor):
+    """
+    Seed both indexes from the balls that already exist.
+    """
+    Ball = apps.get_model('cricket', 'Ball')
+    fields = ('balls', 'runs', 'dismissals', 'dots', 'fours', 'sixes')
+    totals = dict(
+        total_balls=Count('id', filter=Q(is_wide=False)),
+        total_runs=Sum('runs'),
+        total_dismissals=Count('id', filter=Q(is_wicket=True)),
+        total_dots=Count('id', filter=Q(is_wide=False, is_no_ball=False, runs=0)),
+        total_fours=Count('id', filter=Q(runs=4)),
+        total_sixes=Count('id', filter=Q(runs=6)),
+    )
+    for model_name, group_by, keys in (
+        ('BatsmanBowlerMatchup', ('batsman_id', 'bowler_id'), ('batsman_id', 'bowler_id')),
+        ('TeamMatchup', ('batsman__team_id', 'bowler__team_id'), ('batting_team_id', 'bowling_team_id')),
+    ):
+        model = apps.get_model('cricket', model_name)
+        rows = [
+            model(
+                **{key: row[column] for key, column in zip(keys, group_by)},
+                **{field: row[f'total_{field}'] for field in fields},
+            )
+            for row in Ball.objects.order_by().values(*group_by).annotate(**totals).iterator()
+        ]
+        model.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cricket', '0009_ball_delivery_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BatsmanBowlerMatchup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balls', models.PositiveIntegerField(default=0)),
+                ('runs', models.PositiveIntegerField(default=0)),
+                ('dismissals', models.PositiveIntegerField(default=0)),
+                ('dots', models.PositiveIntegerField(default=0)),
+                ('fours', models.PositiveIntegerField(default=0)),
+                ('sixes', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('batsman', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matchups_batting', to='cricket.player')),
+                ('bowler', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matchups_bowling', to='cricket.player')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bowler', 'batsman'], name='matchup_bowler_batsman_idx')],
+                'constraints': [models.UniqueConstraint(fields=('batsman', 'bowler'), name='matchup_batsman_bowler_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TeamMatchup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balls', models.PositiveIntegerField(default=0)),
+                ('runs', models.PositiveIntegerField(default=0)),
+                ('dismissals', models.PositiveIntegerField(default=0)),
+                ('dots', models.PositiveIntegerField(default=0)),
+                ('fours', models.PositiveIntegerField(default=0)),
+                ('sixes', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('batting_team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matchups_batting', to='cricket.team')),
+                ('bowling_team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matchups_bowling', to='cricket.team')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bowling_team', 'batting_team'], name='matchup_bowling_batting_idx')],
+                'constraints': [models.UniqueConstraint(fields=('batting_team', 'bowling_team'), name='matchup_team_pair_uniq')],
+            },
+        ),
+        migrations.RunPython(build_matchups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:20
+
+from django.db import migrations
+
+# Kept here rather than imported from cricket.search, so the migration keeps
+# working whatever that module becomes
+DOCUMENT_FROM = """
+    FROM cricket_ball b
+    JOIN cricket_player bat ON bat.id = b.batsman_id
+    JOIN cricket_player bowl ON bowl.id = b.bowler_id
+    JOIN cricket_match m ON m.id = b.match_id
+"""
+
+
+def create_search_index(apps, schema_editor):
+    """
+    The full-text index cricket/search.py uses: FTS5 on SQLite (when compiled
+    in), a GIN-indexed tsvector table on PostgreSQL. Other databases, and
+    SQLite without FTS5, get nothing and use the in-process index.
+    """
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if not cursor.fetchone()[0]:
+                return
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE cricket_ball_fts USING fts5(commentary, players, venue, tokenize='porter unicode61')"
+        )
+        schema_editor.execute(
+            "INSERT INTO cricket_ball_fts (rowid, commentary, players, venue) "
+            f"SELECT b.id, COALESCE(b.commentary, ''), bat.name || ' ' || bowl.name, m.venue {DOCUMENT_FROM}"
+        )
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE TABLE cricket_ball_search ("
+            "ball_id bigint PRIMARY KEY REFERENCES cricket_ball (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute("CREATE INDEX cricket_ball_search_document_idx ON cricket_ball_search USING GIN (document)")
+        schema_editor.execute(
+            "INSERT INTO cricket_ball_search (ball_id, document) SELECT b.id, "
+            "setweight(to_tsvector('english', bat.name || ' ' || bowl.name), 'A') "
+            "|| setweight(to_tsvector('english', COALESCE(b.commentary, '')), 'B') "
+            f"|| setweight(to_tsvector('english', m.venue), 'C') {DOCUMENT_FROM}"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS cricket_ball_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP TABLE IF EXISTS cricket_ball_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cricket', '0010_matchup_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
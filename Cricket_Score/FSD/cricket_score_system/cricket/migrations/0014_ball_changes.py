@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cricket', '0013_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BallChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ball_id', models.BigIntegerField(null=True)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -2,6 +2,73 @@
 
 from django.db import models
 
+
+# Reusable query shapes. Views and admin classes build on these so that every
+# template attribute they touch (team names, player names, ...) is fetched in
+# the same query instead of one extra query per row.
+
+class PlayerQuerySet(models.QuerySet):
+    def with_team(self):
+        # Player.__str__ and the player cards show the team name
+        return self.select_related('team')
+
+    def with_career(self):
+        return self.select_related('team', 'career_stats')
+
+
+class MatchQuerySet(models.QuerySet):
+    def with_teams(self):
+        # Match cards show both team names and the winner
+        return self.select_related('team1', 'team2', 'winner')
+
+    def filtered(self, status=None, team_id=None, venue=None, date_from=None, date_to=None):
+        """
+        The match list filters. Each one lines up with an index in Match.Meta.indexes,
+        so a filtered page is still a single index range scan.
+        """
+        matches = self
+        if status:
+            matches = matches.filter(status=status)
+        if team_id:
+            matches = matches.filter(models.Q(team1_id=team_id) | models.Q(team2_id=team_id))
+        if venue:
+            matches = matches.filter(venue=venue)
+        if date_from:
+            matches = matches.filter(date__gte=date_from)
+        if date_to:
+            matches = matches.filter(date__lt=date_to)
+        return matches
+
+
+class PerformanceQuerySet(models.QuerySet):
+    def with_match(self):
+        return self.select_related('match__team1', 'match__team2', 'match__winner')
+
+    def with_player_and_match(self):
+        return self.select_related('player__team', 'match__team1', 'match__team2', 'match__winner')
+
+
+class BallQuerySet(models.QuerySet):
+    def with_players(self):
+        # The commentary list shows both player names
+        return self.select_related('batsman', 'bowler')
+
+    def with_related(self):
+        # Ball.__str__ (admin, shell) chases the match and both players' teams
+        return self.select_related('match__team1', 'match__team2', 'batsman__team', 'bowler__team')
+
+    def in_delivery_order(self):
+        return self.order_by('sequence')
+
+
+class MatchupQuerySet(models.QuerySet):
+    def with_players(self):
+        return self.select_related('batsman__team', 'bowler__team')
+
+    def with_teams(self):
+        return self.select_related('batting_team', 'bowling_team')
+
+
 class Team(models.Model):
     """
     Represents a cricket team.
@@ -9,6 +76,8 @@ class Team(models.Model):
     name = models.CharField(max_length=100, unique=True) # Ensure team names are unique
     country = models.CharField(max_length=100, blank=True, null=True) # Added country back for context
     logo = models.ImageField(upload_to='team_logos/', blank=True, null=True)
+    # Sized WebP/fallback copies of the logo, written by cricket/renditions.py
+    logo_renditions = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True) # Records when the team was added
 
     def __str__(self):
@@ -35,7 +104,9 @@ class Player(models.Model):
     date_of_birth = models.DateField(null=True, blank=True) # Added date_of_birth for player detail
     # NEW FIELD: Player profile image
     image = models.ImageField(upload_to='player_images/', blank=True, null=True)
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False) # See cricket/renditions.py
 
+    objects = PlayerQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.name} ({self.team.name})"
@@ -60,6 +131,20 @@ class Match(models.Model):
         default='Upcoming' # Sensible default status
     )
     winner = models.ForeignKey(Team, on_delete=models.SET_NULL, null=True, blank=True, related_name='won_matches')
+    # Id of the match in an imported data source (see cricket/ingest.py); makes re-imports skip it
+    external_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
+
+    objects = MatchQuerySet.as_manager()
+
+    class Meta:
+        # Match lists are paged newest first on (date, id); see cricket/pagination.py
+        indexes = [
+            models.Index(fields=['date', 'id'], name='match_date_id_idx'),
+            models.Index(fields=['status', 'date', 'id'], name='match_status_date_idx'),
+            models.Index(fields=['venue', 'date', 'id'], name='match_venue_date_idx'),
+            models.Index(fields=['team1', 'date', 'id'], name='match_team1_date_idx'),
+            models.Index(fields=['team2', 'date', 'id'], name='match_team2_date_idx'),
+        ]
 
     def __str__(self):
         # Using the name if available, otherwise defaulting to teams and date
@@ -78,24 +163,171 @@ class PlayerMatchPerformance(models.Model):
     wickets_taken = models.IntegerField(default=0)
     balls_faced = models.IntegerField(default=0) # Added for more detail
     overs_bowled = models.FloatField(default=0.0) # Added for more detail
+    runs_conceded = models.IntegerField(default=0) # Runs given away while bowling, for economy
+    is_out = models.BooleanField(default=False) # Whether the player was dismissed, for batting average
+    # Copy of match.date so history lists sort and page without joining Match.
+    # Filled in on save and kept in step when a match is rescheduled (see cricket/signals.py).
+    match_date = models.DateTimeField(editable=False)
     # Add other performance metrics like catches, stumpings, run_outs etc.
 
+    objects = PerformanceQuerySet.as_manager()
+
     class Meta:
         # Ensures that a player has only one performance record per match
         unique_together = ('player', 'match')
         # Default ordering for querying performances, e.g., by most recent match
-        ordering = ['-match__date']
+        ordering = ['-match_date']
+        indexes = [
+            # A player's history, newest first, paged on (match_date, match)
+            models.Index(fields=['player', 'match_date', 'match'], name='perf_player_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.player.name}'s performance in {self.match.name or str(self.match)}"
 
 
+def overs_to_balls(overs):
+    """
+    Converts cricket over notation (3.4 = 3 overs and 4 balls) to a ball count.
+    """
+    whole = int(overs)
+    return whole * 6 + round((overs - whole) * 10)
+
+
+def balls_to_overs(balls):
+    """
+    Converts a ball count back to cricket over notation, e.g. 22 -> 3.4.
+    """
+    return balls // 6 + (balls % 6) / 10
+
+
+class PlayerCareerStats(models.Model):
+    """
+    Career totals for a player, kept up to date as PlayerMatchPerformance rows
+    are created, changed or deleted (see cricket/career.py).
+    Lists and player pages read this one row instead of summing performances.
+    """
+    player = models.OneToOneField(Player, on_delete=models.CASCADE, related_name='career_stats')
+    matches = models.PositiveIntegerField(default=0)
+    runs = models.IntegerField(default=0)
+    wickets = models.IntegerField(default=0)
+    balls_faced = models.IntegerField(default=0)
+    balls_bowled = models.IntegerField(default=0) # Stored as balls so totals add up exactly
+    runs_conceded = models.IntegerField(default=0)
+    dismissals = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'player career stats'
+
+    @property
+    def overs_bowled(self):
+        return balls_to_overs(self.balls_bowled)
+
+    @property
+    def strike_rate(self):
+        # Runs per 100 balls faced
+        return round(self.runs * 100 / self.balls_faced, 2) if self.balls_faced else None
+
+    @property
+    def economy(self):
+        # Runs conceded per over
+        return round(self.runs_conceded * 6 / self.balls_bowled, 2) if self.balls_bowled else None
+
+    @property
+    def batting_average(self):
+        return round(self.runs / self.dismissals, 2) if self.dismissals else None
+
+    @property
+    def bowling_average(self):
+        return round(self.runs_conceded / self.wickets, 2) if self.wickets else None
+
+    def __str__(self):
+        return f"{self.player.name}: {self.runs} runs, {self.wickets} wickets in {self.matches} matches"
+
+
+class MatchupStats(models.Model):
+    """
+    Running totals of every ball one side has faced from the other
+    (see cricket/matchups.py). Runs are off the bat; wides are not faced.
+    """
+    balls = models.PositiveIntegerField(default=0)
+    runs = models.PositiveIntegerField(default=0)
+    dismissals = models.PositiveIntegerField(default=0)
+    dots = models.PositiveIntegerField(default=0)
+    fours = models.PositiveIntegerField(default=0)
+    sixes = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def boundaries(self):
+        return self.fours + self.sixes
+
+    @property
+    def strike_rate(self):
+        return round(self.runs * 100 / self.balls, 2) if self.balls else None
+
+    @property
+    def average(self):
+        return round(self.runs / self.dismissals, 2) if self.dismissals else None
+
+    @property
+    def dot_percentage(self):
+        return round(self.dots * 100 / self.balls, 1) if self.balls else None
+
+
+class BatsmanBowlerMatchup(MatchupStats):
+    batsman = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='matchups_batting')
+    bowler = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='matchups_bowling')
+
+    objects = MatchupQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['batsman', 'bowler'], name='matchup_batsman_bowler_uniq'),
+        ]
+        indexes = [
+            # A bowler's page lists the batsmen they have bowled to
+            models.Index(fields=['bowler', 'batsman'], name='matchup_bowler_batsman_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.batsman.name} v {self.bowler.name}: {self.runs} off {self.balls}, {self.dismissals} out"
+
+
+class TeamMatchup(MatchupStats):
+    batting_team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='matchups_batting')
+    bowling_team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='matchups_bowling')
+
+    objects = MatchupQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['batting_team', 'bowling_team'], name='matchup_team_pair_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['bowling_team', 'batting_team'], name='matchup_bowling_batting_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.batting_team.name} batting v {self.bowling_team.name}: {self.runs} off {self.balls}"
+
+
 class Ball(models.Model):
     """
     Represents a single ball bowled in a match, storing granular details.
+    `sequence` numbers a match's deliveries 1, 2, 3, ... in the order they were
+    recorded (see innings.number_delivery), across both innings and including
+    wides and no-balls; it is what deliveries are ordered and paged by.
     """
     match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='balls')
-    over = models.FloatField() # e.g., 1.1 for 1st ball of 2nd over
+    innings = models.PositiveSmallIntegerField(blank=True) # 1 or 2; worked out from the batting side when left empty
+    over_number = models.PositiveSmallIntegerField() # 0 for the first over
+    ball_in_over = models.PositiveSmallIntegerField() # 1-6; a wide or no-ball shares the number of the ball that follows it
+    sequence = models.PositiveIntegerField(blank=True, editable=False)
     batsman = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='batsman_balls')
     bowler = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='bowler_balls')
     runs = models.IntegerField(default=0) # Runs scored on this specific ball (excluding extras)
@@ -104,5 +336,104 @@ class Ball(models.Model):
     is_no_ball = models.BooleanField(default=False)
     commentary = models.TextField(blank=True) # Text commentary for the ball
 
+    objects = BallQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Also the index behind delivery order: commentary, delta polling,
+            # innings rebuilds and rollups are range scans on it
+            models.UniqueConstraint(fields=['match', 'sequence'], name='ball_match_sequence_uniq'),
+        ]
+
+    @property
+    def over(self):
+        """
+        Scorecard notation, e.g. 1.1 for the first ball of the second over.
+        Display only; setting it fills over_number and ball_in_over.
+        """
+        if self.over_number is None or self.ball_in_over is None:
+            return None
+        return self.over_number + self.ball_in_over / 10
+
+    @over.setter
+    def over(self, value):
+        self.over_number = int(value)
+        self.ball_in_over = round((value - self.over_number) * 10)
+
     def __str__(self):
         return f"Match: {self.match.name}, Over: {self.over}, Batsman: {self.batsman.name}, Bowler: {self.bowler.name}"
+
+
+class InningsScore(models.Model):
+    """
+    Running totals for one team's innings in a match.
+    Each new Ball is folded into this row as it is recorded (see cricket/innings.py),
+    so score pages read one precomputed snapshot instead of re-aggregating every delivery.
+    """
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='innings_scores')
+    batting_team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='innings_scores')
+    runs = models.PositiveIntegerField(default=0) # Total runs including extras
+    wickets = models.PositiveIntegerField(default=0)
+    legal_balls = models.PositiveIntegerField(default=0) # Wides and no-balls are not counted
+    wides = models.PositiveIntegerField(default=0)
+    no_balls = models.PositiveIntegerField(default=0)
+    over_runs = models.JSONField(default=list) # Runs per over, indexed by over number
+    over_wickets = models.JSONField(default=list) # Wickets per over, indexed by over number
+    last_ball_id = models.BigIntegerField(null=True, blank=True) # Highest Ball id folded into this innings
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # One running total per batting side per match
+        unique_together = ('match', 'batting_team')
+
+    @property
+    def extras(self):
+        return self.wides + self.no_balls
+
+    @property
+    def overs(self):
+        # Cricket notation: 5.3 means 5 completed overs and 3 legal balls
+        return f"{self.legal_balls // 6}.{self.legal_balls % 6}"
+
+    def __str__(self):
+        return f"{self.runs}/{self.wickets} ({self.overs} ov)"
+
+
+class IdempotencyKey(models.Model):
+    """
+    A scorer API request already applied to a match, kept with its response
+    so a client retrying with the same Idempotency-Key header gets the same
+    answer instead of recording the deliveries twice (see cricket/scoring.py).
+    """
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64) # SHA-256 of the request body, to catch a key reused for other data
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['match', 'key'], name='idempotency_match_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['match', 'created_at'], name='idempotency_match_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.match_id})"
+
+
+class BallChange(models.Model):
+    """
+    An edit or delete of an existing Ball, logged by the Ball signals so
+    sync_ball_store can tell whether balls it already exported changed
+    without scanning them (see cricket/ballstore.py). New balls aren't
+    logged: the sync appends them. ball_id is None for a change to many
+    balls at once, e.g. a transfer moving a player's balls to another team.
+    """
+    ball_id = models.BigIntegerField(null=True) # Not a foreign key: deleted balls are logged too
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Ball {self.ball_id or 'all'} changed at {self.changed_at}"
@@ -0,0 +1,168 @@
+# cricket/pagination.py
+
+"""
+Keyset (seek) pagination for lists ordered newest first by (date, id).
+
+Instead of OFFSET, each page remembers the (date, id) of its last row and the
+next page asks for rows strictly before it. With an index on the filter
+columns plus (date, id), page 500 costs the same single index range scan as
+page 1, and rows inserted meanwhile never shift or duplicate entries.
+"""
+
+import base64
+import json
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(direction, date, pk):
+    raw = json.dumps([direction, date.isoformat(), pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Returns (direction, date, pk) for a token made by encode_cursor.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, date, pk = json.loads(raw)
+        date = parse_datetime(date)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Malformed cursor.")
+    if direction not in ('next', 'prev') or date is None or not isinstance(pk, int):
+        raise InvalidCursor("Malformed cursor.")
+    return direction, date, pk
+
+
+def _resolve(obj, path):
+    for name in path.split('__'):
+        obj = getattr(obj, name)
+    return obj
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Pages `queryset` newest first by `date_field`, with `id_field` as the tie-breaker.
+    Both may span relations (e.g. 'match__date'), though only the model's own
+    columns can be served from a single index. (date, id) must be unique
+    within the queryset.
+    """
+
+    def __init__(self, queryset, date_field='date', id_field='id', per_page=DEFAULT_PAGE_SIZE):
+        self.queryset = queryset
+        self.date_field = date_field
+        self.id_field = id_field
+        self.per_page = per_page
+
+    def _keys(self, obj):
+        return _resolve(obj, self.date_field), _resolve(obj, self.id_field)
+
+    def page(self, cursor=None):
+        """
+        The page after (or before) the row a cursor points at; the first page when cursor is empty.
+        """
+        date, pk = self.date_field, self.id_field
+        queryset = self.queryset
+        direction = 'next'
+        if cursor:
+            direction, seek_date, seek_pk = decode_cursor(cursor)
+            if direction == 'next':
+                queryset = queryset.filter(Q(**{f'{date}__lt': seek_date}) | Q(**{date: seek_date, f'{pk}__lt': seek_pk}))
+            else:
+                queryset = queryset.filter(Q(**{f'{date}__gt': seek_date}) | Q(**{date: seek_date, f'{pk}__gt': seek_pk}))
+
+        if direction == 'next':
+            rows = list(queryset.order_by(f'-{date}', f'-{pk}')[:self.per_page + 1])
+            more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_next, has_previous = more, bool(cursor)
+        else:
+            # Walk forwards from the cursor, then flip back to newest first
+            rows = list(queryset.order_by(date, pk)[:self.per_page + 1])
+            more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            rows.reverse()
+            has_next, has_previous = True, more
+
+        next_cursor = encode_cursor('next', *self._keys(rows[-1])) if has_next and rows else None
+        previous_cursor = encode_cursor('prev', *self._keys(rows[0])) if has_previous and rows else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+def page_size(params, default=DEFAULT_PAGE_SIZE):
+    """
+    Reads ?page_size= from a QueryDict, clamped to 1..MAX_PAGE_SIZE.
+    """
+    try:
+        return min(max(int(params.get('page_size', default)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return default
+
+
+MATCH_STATUSES = ('Upcoming', 'Live', 'Completed')
+
+
+def _day_start(value, name):
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(f"'{name}' must be a date (YYYY-MM-DD).")
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def match_filters(params):
+    """
+    Cleans the match list's query parameters (status, team, venue, from, to)
+    into keyword arguments for MatchQuerySet.filtered().
+    Raises ValueError with a user-facing message for bad values.
+    """
+    filters = {}
+    status = params.get('status')
+    if status:
+        if status not in MATCH_STATUSES:
+            raise ValueError(f"'status' must be one of {', '.join(MATCH_STATUSES)}.")
+        filters['status'] = status
+    team = params.get('team')
+    if team:
+        if not team.isdigit():
+            raise ValueError("'team' must be a team id.")
+        filters['team_id'] = int(team)
+    if params.get('venue'):
+        filters['venue'] = params['venue']
+    if params.get('from'):
+        filters['date_from'] = _day_start(params['from'], 'from')
+    if params.get('to'):
+        # Inclusive end date: everything before the following midnight
+        filters['date_to'] = _day_start(params['to'], 'to') + timedelta(days=1)
+    return filters
@@ -0,0 +1,259 @@
+# cricket/prediction.py
+
+"""
+Projected score and win probability for a 20-over match.
+
+The model is a set of lookup tables indexed by innings state, fitted offline
+from the first innings of completed matches (manage.py fit_prediction_model):
+
+  remaining_mean[balls, wickets]       runs still to come after `balls` legal
+                                       deliveries with `wickets` down
+  remaining_std[balls, wickets]        spread of those runs
+  chase[balls, wickets, need]          chance of scoring at least `need` more
+
+Sparse cells are blended with a simple run-rate/wicket-resource prior, so the
+model is usable with little or no history (the prior alone is used until a
+model file exists). At runtime a prediction is a handful of array lookups.
+
+The fitted tables are saved as one .npz file (settings.CRICKET_PREDICTION_MODEL)
+and loaded on first use; a refit file is picked up on the next call.
+"""
+
+import math
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from .models import Ball
+
+INNINGS_BALLS = 120 # 20 overs
+MAX_WICKETS = 10
+MAX_NEED = 400 # Targets beyond this are treated as unreachable
+
+# Prior: a side scores PRIOR_RUN_RATE runs a ball, scaled down as wickets fall
+PRIOR_RUN_RATE = 1.3
+PRIOR_WICKET_RESOURCE = np.sqrt(1 - np.arange(MAX_WICKETS + 1) / MAX_WICKETS)
+# Observations needed before a cell's own data outweighs the prior
+PRIOR_WEIGHT = 20
+
+
+def _normal_survival(z):
+    # P(Z >= z) for a standard normal, elementwise
+    return 0.5 * np.vectorize(math.erfc)(np.asarray(z, dtype=float) / math.sqrt(2))
+
+
+def _prior_tables():
+    balls_left = INNINGS_BALLS - np.arange(INNINGS_BALLS + 1)
+    mean = PRIOR_RUN_RATE * np.outer(balls_left, PRIOR_WICKET_RESOURCE)
+    std = 1.9 * np.outer(np.sqrt(balls_left), PRIOR_WICKET_RESOURCE)
+    return mean, std
+
+
+class PredictionModel:
+    """
+    Lookup tables plus the evaluation functions. Array arguments broadcast,
+    so whole batches of states can be evaluated at once.
+    """
+
+    def __init__(self, remaining_mean, remaining_std, samples, chase=None):
+        # All out or overs done: nothing more to come
+        remaining_mean[INNINGS_BALLS, :] = remaining_mean[:, MAX_WICKETS] = 0
+        remaining_std[INNINGS_BALLS, :] = remaining_std[:, MAX_WICKETS] = 0
+        self.remaining_mean = remaining_mean
+        self.remaining_std = remaining_std
+        self.samples = samples
+        self.chase = self._chase_table() if chase is None else chase
+
+    def _chase_table(self):
+        need = np.arange(MAX_NEED + 1)
+        mean = self.remaining_mean[:, :, None]
+        std = self.remaining_std[:, :, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Continuity correction: scoring `need` means beating need - 0.5
+            z = (need - 0.5 - mean) / std
+        table = np.where(std > 0, _normal_survival(np.where(std > 0, z, 0)), (mean >= need).astype(float))
+        table[:, :, 0] = 1.0
+        return table
+
+    @classmethod
+    def prior(cls):
+        mean, std = _prior_tables()
+        return cls(mean, std, np.zeros(mean.shape, dtype=np.int64))
+
+    @classmethod
+    def fit(cls, innings):
+        """
+        Fits the tables from completed innings, each a sequence of
+        (runs off the ball including extras, is_wicket, is_legal) tuples.
+        """
+        shape = (INNINGS_BALLS + 1, MAX_WICKETS + 1)
+        count = np.zeros(shape, dtype=np.int64)
+        total = np.zeros(shape)
+        squares = np.zeros(shape)
+        for deliveries in innings:
+            if not deliveries:
+                continue
+            runs, wickets, legal = (np.asarray(column) for column in zip(*deliveries))
+            # State before each delivery, plus the state at the start of the innings
+            balls_before = np.minimum(np.concatenate(([0], np.cumsum(legal)[:-1])), INNINGS_BALLS)
+            wickets_before = np.minimum(np.concatenate(([0], np.cumsum(wickets)[:-1])), MAX_WICKETS)
+            runs_before = np.concatenate(([0], np.cumsum(runs)[:-1]))
+            # Only the first delivery from each state counts, so wides don't weigh a state twice
+            first = np.ones(len(runs), dtype=bool)
+            first[1:] = (balls_before[1:] != balls_before[:-1]) | (wickets_before[1:] != wickets_before[:-1])
+            remaining = runs.sum() - runs_before[first]
+            cells = (balls_before[first], wickets_before[first])
+            np.add.at(count, cells, 1)
+            np.add.at(total, cells, remaining)
+            np.add.at(squares, cells, remaining ** 2)
+
+        prior_mean, prior_std = _prior_tables()
+        weight = count + PRIOR_WEIGHT
+        mean = (total + PRIOR_WEIGHT * prior_mean) / weight
+        second_moment = (squares + PRIOR_WEIGHT * (prior_std ** 2 + prior_mean ** 2)) / weight
+        std = np.sqrt(np.maximum(second_moment - mean ** 2, 0))
+        return cls(mean, std, count)
+
+    def save(self, path):
+        tmp = f"{path}.tmp"
+        with open(tmp, 'wb') as handle:
+            np.savez_compressed(
+                handle, remaining_mean=self.remaining_mean, remaining_std=self.remaining_std,
+                samples=self.samples, chase=self.chase,
+            )
+        os.replace(tmp, path) # Readers never see a half-written file
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['remaining_mean'], data['remaining_std'], data['samples'], data['chase'])
+
+    def _cells(self, balls, wickets):
+        return np.clip(balls, 0, INNINGS_BALLS), np.clip(wickets, 0, MAX_WICKETS)
+
+    def projected_total(self, runs, balls, wickets):
+        """
+        Expected final total of an innings at the given state.
+        """
+        return runs + self.remaining_mean[self._cells(balls, wickets)]
+
+    def chase_probability(self, need, balls, wickets):
+        """
+        Chance that a side needing `need` more runs gets there.
+        """
+        need = np.clip(need, 0, MAX_NEED)
+        return self.chase[self._cells(balls, wickets) + (need,)]
+
+    def evaluate(self, first, second=None):
+        """
+        Predictions from the current innings states, each (runs, legal balls,
+        wickets) or None. Returns (projected total of the side batting now,
+        probability that the side batting first wins).
+        """
+        if first is None:
+            return None, None
+        runs, balls, wickets = first
+        if second is None:
+            projected = float(self.projected_total(runs, balls, wickets))
+            # Second side starts from scratch against the projected target
+            target = int(round(projected)) + 1
+            return projected, 1.0 - float(self.chase_probability(target, 0, 0))
+        chased_runs, chased_balls, chased_wickets = second
+        need = runs + 1 - chased_runs
+        projected = float(self.projected_total(chased_runs, chased_balls, chased_wickets))
+        return projected, 1.0 - float(self.chase_probability(need, chased_balls, chased_wickets))
+
+
+def first_innings_from_balls(match_ids=None):
+    """
+    Streams the first innings of completed matches (or the given ones) as
+    fit() input, one list of deliveries per match.
+    """
+    balls = (
+        Ball.objects.filter(match__status='Completed', innings=1)
+        .order_by('match_id', 'sequence')
+        .values_list('match_id', 'runs', 'is_wicket', 'is_wide', 'is_no_ball')
+    )
+    if match_ids:
+        balls = balls.filter(match_id__in=match_ids)
+
+    current_match = None
+    deliveries = []
+    for match_id, runs, is_wicket, is_wide, is_no_ball in balls.iterator(chunk_size=5000):
+        if match_id != current_match:
+            if deliveries:
+                yield deliveries
+            current_match, deliveries = match_id, []
+        extras = int(is_wide) + int(is_no_ball)
+        legal = not (is_wide or is_no_ball)
+        deliveries.append((runs + extras, int(is_wicket), int(legal)))
+    if deliveries:
+        yield deliveries
+
+
+def model_path():
+    return getattr(settings, 'CRICKET_PREDICTION_MODEL', settings.BASE_DIR / 'prediction_model.npz')
+
+
+_model = None
+_model_mtime = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """
+    The fitted model from disk, loaded lazily and reloaded when the file changes;
+    the prior-only model when nothing has been fitted yet.
+    """
+    global _model, _model_mtime
+    try:
+        mtime = os.stat(model_path()).st_mtime
+    except OSError:
+        mtime = None
+    if _model is None or mtime != _model_mtime:
+        with _model_lock:
+            if _model is None or mtime != _model_mtime:
+                _model = PredictionModel.load(model_path()) if mtime is not None else PredictionModel.prior()
+                _model_mtime = mtime
+    return _model
+
+
+def reset_model():
+    global _model, _model_mtime
+    with _model_lock:
+        _model = _model_mtime = None
+
+
+def innings_order(snapshot):
+    """
+    (first, second) InningsScore rows of a match snapshot; either may be None.
+    The first innings is the one whose latest ball came earlier.
+    """
+    states = sorted(snapshot['innings'].values(), key=lambda state: state.last_ball_id or 0)
+    if not states:
+        return None, None
+    return states[0], (states[1] if len(states) > 1 else None)
+
+
+def match_prediction(match, snapshot):
+    """
+    Win probabilities (percentages) and the batting side's projected total for a
+    match snapshot, in the keys the match page and live updates use.
+    All None before the first ball and once the match is completed.
+    """
+    empty = {'team1_win_prob': None, 'team2_win_prob': None, 'predicted_score': None}
+    first, second = innings_order(snapshot)
+    if first is None or match.status == 'Completed':
+        return empty
+
+    state = lambda innings: (innings.runs, innings.legal_balls, innings.wickets) if innings else None
+    projected, first_wins = get_model().evaluate(state(first), state(second))
+    first_is_team1 = first.batting_team_id == match.team1_id
+    team1_wins = first_wins if first_is_team1 else 1 - first_wins
+    return {
+        'team1_win_prob': round(team1_wins * 100, 2),
+        'team2_win_prob': round((1 - team1_wins) * 100, 2),
+        'predicted_score': round(projected),
+    }
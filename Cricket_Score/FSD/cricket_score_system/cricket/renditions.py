@@ -0,0 +1,217 @@
+# cricket/renditions.py
+
+"""
+Sized copies ("renditions") of team logos and player images.
+
+Cards show logos at 96-128px and player photos about 400px wide, but the
+uploads are full-size originals. After an upload commits, a background
+worker pool writes each image at RENDITION_WIDTHS, once as WebP and once as
+a JPEG (PNG if it has transparency) fallback, under MEDIA_ROOT/renditions/.
+
+Rendition filenames carry a hash of their content
+(team_logos/hurricanes.192w.3f9a1c0b2d4e.webp), so a URL never changes
+meaning and can be served with a far-future, immutable Cache-Control. The
+names are recorded on the model (Team.logo_renditions,
+Player.image_renditions) together with the original they were made from;
+the {% picture %} tag turns that record into <picture>/srcset markup and
+falls back to the original until the renditions exist.
+
+`manage.py generate_renditions` creates any that are missing, e.g. for images
+uploaded before this existed.
+"""
+
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models import Q
+from PIL import Image, ImageOps
+
+from .cache import bump_model_version
+from .models import Player, Team
+
+logger = logging.getLogger(__name__)
+
+# 1x and 2x of the sizes the cards show images at
+RENDITION_WIDTHS = (96, 192, 384, 768)
+RENDITION_DIR = 'renditions'
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+HASH_LENGTH = 12
+
+# model -> (image field, renditions field, cache version label)
+IMAGE_FIELDS = {
+    Team: ('logo', 'logo_renditions', 'team'),
+    Player: ('image', 'image_renditions', 'player'),
+}
+
+
+def _encode(image, format):
+    buffer = io.BytesIO()
+    if format == 'WEBP':
+        image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+    elif format == 'PNG':
+        image.save(buffer, 'PNG', optimize=True)
+    else:
+        image.convert('RGB').save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def rendition_name(source_name, width, data, extension):
+    """
+    Storage name of one rendition: the source's path under RENDITION_DIR, with
+    the width and a hash of the encoded bytes before the extension.
+    """
+    source = PurePosixPath(source_name)
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+    return str(PurePosixPath(RENDITION_DIR, source.parent, f"{source.stem}.{width}w.{digest}.{extension}"))
+
+
+def _store(name, data):
+    # The name is derived from the content, so an existing file is the same file
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(data))
+    return name
+
+
+def make_renditions(field_file):
+    """
+    Writes the renditions of one stored image and returns the record kept on
+    the model: {'source', 'width', 'height', 'fallback_type', 'webp': [[width,
+    name], ...], 'fallback': [[width, name], ...]}, smallest first.
+    """
+    with field_file.open('rb') as handle:
+        original = ImageOps.exif_transpose(Image.open(handle))
+        original.load()
+    has_alpha = original.mode in ('RGBA', 'LA', 'PA') or 'transparency' in original.info
+    original = original.convert('RGBA' if has_alpha else 'RGB')
+    fallback_format, fallback_extension = ('PNG', 'png') if has_alpha else ('JPEG', 'jpg')
+
+    # Never upscale; an image narrower than the smallest width gets one rendition at its own size
+    widths = [width for width in RENDITION_WIDTHS if width < original.width] or [original.width]
+    record = {
+        'source': field_file.name,
+        'width': original.width,
+        'height': original.height,
+        'fallback_type': f"image/{fallback_format.lower()}",
+        'webp': [],
+        'fallback': [],
+    }
+    for width in widths:
+        height = max(1, round(original.height * width / original.width))
+        resized = original if width == original.width else original.resize((width, height), Image.Resampling.LANCZOS)
+        for key, format, extension in (('webp', 'WEBP', 'webp'), ('fallback', fallback_format, fallback_extension)):
+            data = _encode(resized, format)
+            record[key].append([width, _store(rendition_name(field_file.name, width, data, extension), data)])
+    return record
+
+
+def _names(record):
+    return {name for key in ('webp', 'fallback') for _, name in record.get(key, ())}
+
+
+def render(model, pk):
+    """
+    Brings one object's renditions up to date with its current image.
+    Returns the new record ({} when the object has no image).
+    """
+    image_field, renditions_field, label = IMAGE_FIELDS[model]
+    instance = model.objects.filter(pk=pk).only(image_field, renditions_field).first()
+    if instance is None:
+        return {}
+    field_file = getattr(instance, image_field)
+    previous = getattr(instance, renditions_field) or {}
+    record = make_renditions(field_file) if field_file else {}
+
+    # Only record them if the image wasn't replaced meanwhile; its own job will follow
+    if field_file:
+        unchanged = Q(**{image_field: field_file.name})
+    else:
+        unchanged = Q(**{image_field: ''}) | Q(**{f"{image_field}__isnull": True})
+    updated = model.objects.filter(unchanged, pk=pk).update(**{renditions_field: record})
+    if updated:
+        for name in _names(previous) - _names(record):
+            default_storage.delete(name)
+        bump_model_version(label) # Cached pages embed the image URLs
+    return record
+
+
+def is_stale(instance):
+    """
+    Whether an object's renditions were made from some other image than its current one.
+    """
+    image_field, renditions_field, _ = IMAGE_FIELDS[type(instance)]
+    record = getattr(instance, renditions_field) or {}
+    return (getattr(instance, image_field).name or None) != record.get('source')
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    The process's rendition worker pool (settings.CRICKET_RENDITION_WORKERS threads).
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'CRICKET_RENDITION_WORKERS', 2), thread_name_prefix='renditions'
+                )
+    return _executor
+
+
+def _render_in_worker(model, pk, reraise=False):
+    try:
+        return render(model, pk)
+    except Exception:
+        if reraise:
+            raise
+        logger.exception("Could not render images of %s %s", model.__name__, pk)
+    finally:
+        connections.close_all() # Only this worker thread's connections
+
+
+def schedule_render(instance):
+    """
+    Renders an object's images once the current transaction commits: on the
+    worker pool, or in line when CRICKET_RENDITION_WORKERS is 0.
+    """
+    model, pk = type(instance), instance.pk
+
+    def submit():
+        if getattr(settings, 'CRICKET_RENDITION_WORKERS', 2) == 0:
+            render(model, pk)
+        else:
+            get_executor().submit(_render_in_worker, model, pk)
+
+    transaction.on_commit(submit, robust=True)
+
+
+def generate_renditions(force=False):
+    """
+    Renders every team logo and player image whose renditions are missing or
+    stale (all of them with force=True) on the worker pool, and waits for
+    them. Returns the number of objects rendered.
+    """
+    jobs = []
+    for model, (image_field, renditions_field, _) in IMAGE_FIELDS.items():
+        objects = model.objects.only(image_field, renditions_field).order_by('pk')
+        jobs += [(model, instance.pk) for instance in objects.iterator() if force or is_stale(instance)]
+    if getattr(settings, 'CRICKET_RENDITION_WORKERS', 2) == 0:
+        for model, pk in jobs:
+            render(model, pk)
+    else:
+        futures = [get_executor().submit(_render_in_worker, model, pk, reraise=True) for model, pk in jobs]
+        for future in futures:
+            future.result() # Re-raises a failed render
+    return len(jobs)
@@ -0,0 +1,180 @@
+# cricket/rollup.py
+
+"""
+Derives PlayerMatchPerformance rows from Ball data.
+
+A match's balls are streamed once in delivery order and folded into per-player
+batting and bowling figures in memory; the results are then written with
+bulk_create/bulk_update in a single transaction. This replaces hand-entered
+performances and avoids a get_or_create round trip per player per ball.
+"""
+
+from collections import defaultdict
+from itertools import groupby
+
+from django.db import transaction
+
+from . import career, leaderboards
+from .innings import ball_extras, is_legal_delivery
+from .models import Ball, Match, PlayerMatchPerformance, balls_to_overs
+
+BALL_FIELDS = ('match_id', 'batsman_id', 'bowler_id', 'runs', 'is_wicket', 'is_wide', 'is_no_ball')
+PERFORMANCE_FIELDS = ('runs_scored', 'wickets_taken', 'balls_faced', 'overs_bowled', 'runs_conceded', 'is_out', 'match_date')
+
+
+class _Figures:
+    """
+    Running batting and bowling figures for one player in one match.
+    """
+    __slots__ = ('runs_scored', 'balls_faced', 'is_out', 'wickets_taken', 'balls_bowled', 'runs_conceded')
+
+    def __init__(self):
+        self.runs_scored = self.balls_faced = 0
+        self.wickets_taken = self.balls_bowled = self.runs_conceded = 0
+        self.is_out = False
+
+    def as_fields(self):
+        return {
+            'runs_scored': self.runs_scored,
+            'wickets_taken': self.wickets_taken,
+            'balls_faced': self.balls_faced,
+            'overs_bowled': balls_to_overs(self.balls_bowled),
+            'runs_conceded': self.runs_conceded,
+            'is_out': self.is_out,
+        }
+
+
+class _BallRow:
+    # Lightweight stand-in for Ball so the innings helpers work on values() rows
+    __slots__ = BALL_FIELDS
+
+    def __init__(self, values):
+        for field, value in zip(BALL_FIELDS, values):
+            setattr(self, field, value)
+
+
+def fold_match(balls):
+    """
+    Folds one match's balls (in delivery order) into {player_id: _Figures}.
+    """
+    figures = defaultdict(_Figures)
+    for ball in balls:
+        batting = figures[ball.batsman_id]
+        bowling = figures[ball.bowler_id]
+
+        batting.runs_scored += ball.runs
+        if not ball.is_wide: # The batsman faces no-balls, but not wides
+            batting.balls_faced += 1
+        if ball.is_wicket:
+            batting.is_out = True
+            bowling.wickets_taken += 1
+
+        bowling.runs_conceded += ball.runs + ball_extras(ball)
+        if is_legal_delivery(ball):
+            bowling.balls_bowled += 1
+    return figures
+
+
+def _stream_balls(match_ids):
+    rows = (
+        Ball.objects.filter(match_id__in=match_ids)
+        .order_by('match_id', 'sequence')
+        .values_list(*BALL_FIELDS)
+    )
+    for values in rows.iterator(chunk_size=2000):
+        yield _BallRow(values)
+
+
+def _write_match(match_id, match_date, figures, existing):
+    """
+    Turns folded figures into row writes for one match.
+    Returns (to_create, to_update, stale_ids).
+    """
+    to_create, to_update = [], []
+    for player_id, player_figures in figures.items():
+        fields = player_figures.as_fields()
+        fields['match_date'] = match_date # Bulk writes skip the signal that fills it in
+        performance = existing.pop(player_id, None)
+        if performance is None:
+            to_create.append(PlayerMatchPerformance(player_id=player_id, match_id=match_id, **fields))
+        elif any(getattr(performance, name) != value for name, value in fields.items()):
+            for name, value in fields.items():
+                setattr(performance, name, value)
+            to_update.append(performance)
+    # Anyone left didn't face or bowl a ball in this match
+    stale_ids = [performance.pk for performance in existing.values()]
+    return to_create, to_update, stale_ids
+
+
+def rollup_matches(match_ids):
+    """
+    Recomputes PlayerMatchPerformance for the given matches from their balls,
+    in one transaction. Matches without any balls are left untouched, so
+    hand-entered scorecards for them survive.
+    Returns the set of player ids whose performances changed.
+    """
+    match_ids = list(match_ids)
+    dates = dict(Match.objects.filter(pk__in=match_ids).values_list('id', 'date'))
+    existing = {}
+    for performance in PlayerMatchPerformance.objects.filter(match_id__in=match_ids).order_by():
+        existing.setdefault(performance.match_id, {})[performance.player_id] = performance
+
+    to_create, to_update, stale_ids = [], [], []
+    for match_id, balls in groupby(_stream_balls(match_ids), key=lambda ball: ball.match_id):
+        created, updated, stale = _write_match(
+            match_id, dates[match_id], fold_match(balls), existing.get(match_id, {})
+        )
+        to_create += created
+        to_update += updated
+        stale_ids += stale
+
+    with transaction.atomic():
+        PlayerMatchPerformance.objects.filter(pk__in=stale_ids).delete()
+        PlayerMatchPerformance.objects.bulk_create(to_create, batch_size=500)
+        PlayerMatchPerformance.objects.bulk_update(to_update, PERFORMANCE_FIELDS, batch_size=500)
+
+    changed = {performance.player_id for performance in to_create + to_update}
+    stale_ids = set(stale_ids)
+    changed.update(
+        performance.player_id
+        for performances in existing.values() for performance in performances.values()
+        if performance.pk in stale_ids
+    )
+    return changed
+
+
+def rollup_match(match_id):
+    """
+    Rolls up a single match and refreshes the affected players' career totals
+    and leaderboard entries
+    (bulk writes don't fire the signals that normally maintain them).
+    """
+    changed = rollup_matches([match_id])
+    if changed:
+        career.rebuild_career_stats(changed)
+        leaderboards.refresh_players(changed)
+    return changed
+
+
+def backfill(chunk_size=100, match_ids=None, progress=None):
+    """
+    Rolls up every match (or the given ones) in chunks of `chunk_size` matches,
+    so memory stays bounded by one chunk's performance rows. Career totals are rebuilt
+    once at the end. `progress(done, total)` is called after each chunk.
+    Returns the number of matches processed.
+    """
+    matches = Match.objects.order_by('id')
+    if match_ids:
+        matches = matches.filter(pk__in=match_ids)
+    ids = list(matches.values_list('id', flat=True))
+
+    changed = set()
+    for start in range(0, len(ids), chunk_size):
+        changed |= rollup_matches(ids[start:start + chunk_size])
+        if progress:
+            progress(min(start + chunk_size, len(ids)), len(ids))
+
+    if changed:
+        career.rebuild_career_stats(None if not match_ids else changed)
+        leaderboards.refresh_players(changed)
+    return len(ids)
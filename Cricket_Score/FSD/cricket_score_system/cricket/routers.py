@@ -0,0 +1,110 @@
+# cricket/routers.py
+
+"""
+Read/write splitting between the primary database ('default') and read
+replicas (settings.CRICKET_READ_REPLICAS, empty unless one is configured).
+
+Reads go to a replica, so the match pages, lists and leaderboards don't
+compete with scorers for the primary. Everything else stays on the primary:
+  - every write;
+  - reads inside a transaction on the primary (select_for_update, or
+    reading back what the transaction wrote);
+  - the rest of a request once it has written, and every unsafe
+    (POST, PUT, PATCH, DELETE) request from the start (outside a request,
+    in commands and background work, only transactions and use_primary()
+    keep reads on the primary);
+  - requests from a client that wrote in the last
+    CRICKET_REPLICA_PIN_SECONDS, marked with a cookie, so a scorer sees their
+    own deliveries even if the replica lags a little;
+  - code wrapped in use_primary().
+
+Replicas must be kept in sync by the database (PostgreSQL streaming
+replication, or a replicated SQLite file); they are never migrated. Tests
+mirror them onto the test database (TEST MIRROR).
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'cricket_primary'
+UNSAFE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+_pinned = ContextVar('cricket_pinned_to_primary', default=False)
+# None outside a request; PrimaryPinMiddleware starts each request at False
+_wrote = ContextVar('cricket_wrote_to_primary', default=None)
+
+
+def replicas():
+    return getattr(settings, 'CRICKET_READ_REPLICAS', [])
+
+
+@contextmanager
+def use_primary():
+    """
+    Sends every read in the block to the primary.
+    """
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def _in_transaction(alias):
+    # The test case's own wrapping transaction doesn't count
+    return any(not block._from_testcase for block in connections[alias].atomic_blocks)
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        available = replicas()
+        if not available or _pinned.get() or _wrote.get() or _in_transaction(DEFAULT_DB_ALIAS):
+            return DEFAULT_DB_ALIAS
+        return random.choice(available) if len(available) > 1 else available[0]
+
+    def db_for_write(self, model, **hints):
+        # Later reads in this request must see the write. Only inside a request:
+        # a command or thread would otherwise stay on the primary for good.
+        if _wrote.get() is False:
+            _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replicas()
+
+
+class PrimaryPinMiddleware:
+    """
+    Scopes the primary pinning to one request, pins unsafe requests and
+    clients that wrote recently, and sets the cookie after a write.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pin_seconds = getattr(settings, 'CRICKET_REPLICA_PIN_SECONDS', 5)
+
+    def __call__(self, request):
+        if not replicas():
+            return self.get_response(request)
+        pinned = _pinned.set(request.method in UNSAFE_METHODS or PIN_COOKIE in request.COOKIES)
+        wrote = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            written = _wrote.get()
+        finally:
+            _pinned.reset(pinned)
+            _wrote.reset(wrote)
+        if written and self.pin_seconds:
+            response.set_cookie(PIN_COOKIE, '1', max_age=self.pin_seconds, httponly=True, samesite='Lax')
+        return response
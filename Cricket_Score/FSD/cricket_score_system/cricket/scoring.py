@@ -0,0 +1,266 @@
+# cricket/scoring.py
+
+"""
+Recording deliveries from a scorer's device.
+
+A request carries one or many deliveries for a match. They are checked
+against the match's current innings state and written in one transaction
+with the match row locked, so concurrent requests for the same match queue
+up while other matches carry on. A batch costs a fixed number of queries
+whatever its size: one bulk insert for the balls, one write per innings
+total, one update per matchup row touched and one for the search index,
+instead of the per-ball signal work (numbering, innings fold, matchups,
+search) that Ball.save() does.
+
+Requests may carry an Idempotency-Key. The key and the response are stored
+in the same transaction as the balls, so a retry after a lost response gets
+the stored response back and nothing is written twice.
+"""
+
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db.models import Max
+from django.utils import timezone
+
+from . import matchups, search
+from .cache import bump_match_version
+from .innings import fold_ball, is_legal_delivery
+from .models import Ball, IdempotencyKey, InningsScore, Player
+from .prediction import INNINGS_BALLS
+
+MAX_DELIVERIES = 120 # Per request: a full T20 innings
+MAX_RUNS = 7 # Off the bat, overthrows included
+MAX_COMMENTARY = 2000
+MAX_INNINGS = 2
+ALL_OUT = 10
+BALLS_PER_OVER = 6
+MAX_OVERS = INNINGS_BALLS // BALLS_PER_OVER
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# How long a key is remembered; retries come within minutes, not days
+IDEMPOTENCY_TTL = timedelta(hours=24)
+
+BOOLEAN_FIELDS = ('is_wicket', 'is_wide', 'is_no_ball')
+
+
+class ScoringError(ValueError):
+    """
+    A request that can't be applied. `index` is the offending delivery's
+    position in the request, if any; `status` the HTTP status to answer with.
+    """
+
+    def __init__(self, message, index=None, status=400):
+        super().__init__(message)
+        self.index = index
+        self.status = status
+
+
+def request_hash(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+def delivery_list(payload):
+    """
+    The deliveries of a request body: {"deliveries": [...]}, a list, or a single delivery.
+    """
+    if isinstance(payload, dict):
+        deliveries = payload['deliveries'] if 'deliveries' in payload else [payload]
+    else:
+        deliveries = payload
+    if not isinstance(deliveries, list) or not deliveries:
+        raise ScoringError("Send a delivery, a list of deliveries or {\"deliveries\": [...]}.")
+    if len(deliveries) > MAX_DELIVERIES:
+        raise ScoringError(f"At most {MAX_DELIVERIES} deliveries per request.")
+    return deliveries
+
+
+def _integer(data, name, index, required=True, default=None):
+    value = data.get(name, default)
+    if value is None and not required:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ScoringError(f"'{name}' must be a whole number.", index)
+    return value
+
+
+def parse_delivery(data, index):
+    """
+    Checks the shape of one delivery and returns its fields:
+    batsman_id, bowler_id, runs, is_wicket, is_wide, is_no_ball, commentary
+    and over (None to take the next ball).
+    """
+    if not isinstance(data, dict):
+        raise ScoringError("Each delivery must be an object.", index)
+    fields = {
+        'batsman_id': _integer(data, 'batsman_id', index),
+        'bowler_id': _integer(data, 'bowler_id', index),
+        'runs': _integer(data, 'runs', index, default=0),
+        'commentary': data.get('commentary') or '',
+        'over': data.get('over'),
+    }
+    for name in BOOLEAN_FIELDS:
+        fields[name] = data.get(name, False)
+        if not isinstance(fields[name], bool):
+            raise ScoringError(f"'{name}' must be true or false.", index)
+    if not 0 <= fields['runs'] <= MAX_RUNS:
+        raise ScoringError(f"'runs' must be between 0 and {MAX_RUNS}.", index)
+    if fields['is_wide'] and fields['is_no_ball']:
+        raise ScoringError("A delivery can't be both a wide and a no-ball.", index)
+    if not isinstance(fields['commentary'], str) or len(fields['commentary']) > MAX_COMMENTARY:
+        raise ScoringError(f"'commentary' must be text of at most {MAX_COMMENTARY} characters.", index)
+    if fields['over'] is not None and (isinstance(fields['over'], bool) or not isinstance(fields['over'], (int, float))):
+        raise ScoringError("'over' must be in scorecard notation, e.g. 3.2.", index)
+    if fields['over'] is not None:
+        given = Ball(over=fields['over'])
+        if not (0 <= given.over_number < MAX_OVERS and 1 <= given.ball_in_over <= BALLS_PER_OVER):
+            raise ScoringError(f"'over' must be between 0.1 and {MAX_OVERS - 1}.{BALLS_PER_OVER}.", index)
+    return fields
+
+
+@dataclass
+class InningsState:
+    """
+    Where a batting side's innings stands while a request is validated.
+    """
+    number: int
+    score: InningsScore # Unsaved for an innings the request starts
+
+
+def load_innings(match):
+    """
+    The match's innings states by batting team id and its last delivery
+    sequence. Locks the innings totals for the rest of the transaction.
+    """
+    scores = {score.batting_team_id: score for score in InningsScore.objects.select_for_update().filter(match=match)}
+    rows = (
+        Ball.objects.filter(match=match).order_by()
+        .values('batsman__team_id').annotate(innings=Max('innings'), last_sequence=Max('sequence'))
+    )
+    states, last_sequence = {}, 0
+    for row in rows:
+        team_id = row['batsman__team_id']
+        last_sequence = max(last_sequence, row['last_sequence'])
+        score = scores.get(team_id) or InningsScore(match=match, batting_team_id=team_id, over_runs=[], over_wickets=[])
+        states[team_id] = InningsState(row['innings'], score)
+    return states, last_sequence
+
+
+def build_balls(match, deliveries, players, states, last_sequence):
+    """
+    Validates parsed deliveries in order against the innings states and
+    returns unsaved Balls, numbered after last_sequence. Updates `states`
+    with any innings the deliveries start.
+    """
+    balls, legal_balls, wickets = [], {}, {}
+    current = max(states.values(), key=lambda state: state.number, default=None)
+    for index, fields in enumerate(deliveries):
+        batsman, bowler = players.get(fields['batsman_id']), players.get(fields['bowler_id'])
+        if batsman is None or bowler is None:
+            raise ScoringError("Unknown batsman or bowler.", index)
+        if batsman.team_id not in (match.team1_id, match.team2_id):
+            raise ScoringError(f"{batsman.name} doesn't play for either side.", index)
+        if bowler.team_id == batsman.team_id or bowler.team_id not in (match.team1_id, match.team2_id):
+            raise ScoringError(f"{bowler.name} isn't on the fielding side.", index)
+
+        state = states.get(batsman.team_id)
+        if state is None:
+            # The first ball of a new innings
+            number = (current.number if current else 0) + 1
+            if number > MAX_INNINGS:
+                raise ScoringError("Both innings have been played.", index, status=409)
+            state = states[batsman.team_id] = InningsState(number, InningsScore(
+                match=match, batting_team_id=batsman.team_id, over_runs=[], over_wickets=[],
+            ))
+            current = state
+        elif state is not current:
+            raise ScoringError(f"{batsman.name}'s side has finished batting.", index, status=409)
+
+        team_legal = legal_balls.setdefault(batsman.team_id, state.score.legal_balls)
+        team_wickets = wickets.setdefault(batsman.team_id, state.score.wickets)
+        if team_wickets >= ALL_OUT:
+            raise ScoringError("The batting side is all out.", index, status=409)
+        if team_legal >= INNINGS_BALLS:
+            raise ScoringError(f"All {MAX_OVERS} overs of the innings have been bowled.", index)
+        # Wides and no-balls share their number with the legal ball after them
+        expected = (team_legal // BALLS_PER_OVER, team_legal % BALLS_PER_OVER + 1)
+        ball = Ball(
+            match=match, innings=state.number, sequence=last_sequence + len(balls) + 1,
+            over_number=expected[0], ball_in_over=expected[1], batsman=batsman, bowler=bowler,
+            runs=fields['runs'], commentary=fields['commentary'],
+            **{name: fields[name] for name in ('is_wicket', 'is_wide', 'is_no_ball')},
+        )
+        if fields['over'] is not None:
+            # Scorers may send the over to have it checked, e.g. after a reconnect
+            given = Ball(over=fields['over'])
+            if (given.over_number, given.ball_in_over) != expected:
+                raise ScoringError(f"Expected over {expected[0]}.{expected[1]}, got {fields['over']}.", index, status=409)
+        legal_balls[batsman.team_id] = team_legal + int(is_legal_delivery(ball))
+        wickets[batsman.team_id] = team_wickets + int(ball.is_wicket)
+        balls.append(ball)
+    return balls
+
+
+def _apply_matchups(balls):
+    # One UPDATE per matchup row the batch touched, not two per ball
+    deltas = {}
+    for ball in balls:
+        contribution = matchups.contribution(ball)
+        for model, lookup in matchups.matchup_keys(ball):
+            total = deltas.setdefault((model, tuple(sorted(lookup.items()))), dict.fromkeys(matchups.MATCHUP_FIELDS, 0))
+            for field in matchups.MATCHUP_FIELDS:
+                total[field] += contribution[field]
+    for (model, lookup), delta in deltas.items():
+        matchups.apply_delta(model, dict(lookup), delta)
+
+
+def record_deliveries(match, payload):
+    """
+    Validates and writes a request's deliveries. Must run inside a
+    transaction holding the match row (select_for_update). Returns the saved
+    balls and the innings totals they touched; raises ScoringError before
+    writing anything if a delivery doesn't fit.
+    """
+    if match.status == 'Completed':
+        raise ScoringError("The match is over.", status=409)
+    deliveries = [parse_delivery(data, index) for index, data in enumerate(delivery_list(payload))]
+    player_ids = {fields[name] for fields in deliveries for name in ('batsman_id', 'bowler_id')}
+    players = Player.objects.only('name', 'team_id').in_bulk(player_ids)
+    states, last_sequence = load_innings(match)
+    balls = build_balls(match, deliveries, players, states, last_sequence)
+
+    Ball.objects.bulk_create(balls)
+    touched = {}
+    for ball in balls:
+        state = touched[ball.batsman.team_id] = states[ball.batsman.team_id]
+        fold_ball(state.score, ball)
+    # At most two rows: a plain save is cheaper than bulk_update's CASE expressions
+    for state in touched.values():
+        state.score.save()
+    scores = [state.score for state in touched.values()]
+    _apply_matchups(balls)
+    search.index_balls([ball.pk for ball in balls])
+    bump_match_version(match.pk)
+    return balls, scores
+
+
+def stored_response(match, key, body_hash):
+    """
+    The stored response of an earlier request with this key, or None.
+    Raises ScoringError if the key was used for a different request.
+    """
+    previous = IdempotencyKey.objects.filter(
+        match=match, key=key, created_at__gte=timezone.now() - IDEMPOTENCY_TTL,
+    ).first()
+    if previous is not None and previous.request_hash != body_hash:
+        raise ScoringError("This Idempotency-Key was already used for a different request.", status=422)
+    return previous
+
+
+def store_response(match, key, body_hash, status_code, response):
+    # Expired keys of this match go first, so the key can be reused after the TTL
+    IdempotencyKey.objects.filter(match=match, created_at__lt=timezone.now() - IDEMPOTENCY_TTL).delete()
+    return IdempotencyKey.objects.create(
+        match=match, key=key, request_hash=body_hash, status_code=status_code, response=response,
+    )
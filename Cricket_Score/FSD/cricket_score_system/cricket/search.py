@@ -0,0 +1,403 @@
+# cricket/search.py
+
+"""
+Full-text search over deliveries: "sixes by Pandey", "caught behind at
+Arena Oval".
+
+Each ball is indexed as a small document of its commentary, the batsman's and
+bowler's names and the venue. The index lives wherever it can be ranked
+next to the data:
+  - SQLite: an FTS5 table, cricket_ball_fts, with the porter stemmer, ranked
+    by bm25() (player names weigh double).
+  - PostgreSQL: cricket_ball_search, a weighted tsvector per ball under a GIN
+    index, ranked by ts_rank_cd().
+  - Anything else, or SQLite built without FTS5: an in-process inverted index
+    ranked with BM25, filled from the database on first search.
+The tables are created by migration 0011. Signals index balls as they are
+saved, edited and deleted, and re-index them when a player is renamed or a
+match moves venue; bulk loads call index_matches(), and `manage.py
+rebuild_search_index` redoes everything. On the database backends a search
+is a single query that matches, ranks, pages and joins the match and players.
+"""
+
+import abc
+import math
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Ball, Match, Player
+
+FTS_TABLE = 'cricket_ball_fts'
+PG_TABLE = 'cricket_ball_search'
+SEARCH_PAGE_SIZE = 20
+MAX_QUERY_TERMS = 8
+IN_CHUNK = 500 # Ids per IN (...) when indexing by id
+
+WORD_RE = re.compile(r"\w+")
+# Words that carry no meaning in a search like "all sixes by Pandey at Arena Oval"
+STOPWORDS = frozenset("""
+    a all an and any are as at be by every for from had has have in is it its of on or that the
+    their them these this those to was were what when which who with
+""".split())
+
+# Joins a ball (as `b`) to what its document is made of
+DOCUMENT_FROM = f"""
+    FROM {Ball._meta.db_table} b
+    JOIN {Player._meta.db_table} bat ON bat.id = b.batsman_id
+    JOIN {Player._meta.db_table} bowl ON bowl.id = b.bowler_id
+    JOIN {Match._meta.db_table} m ON m.id = b.match_id
+"""
+COMMENTARY_SQL = "COALESCE(b.commentary, '')"
+PLAYERS_SQL = "bat.name || ' ' || bowl.name"
+
+
+def query_terms(text):
+    """
+    The words of a search that are worth matching, lower-cased.
+    """
+    return [word for word in WORD_RE.findall(text.lower()) if word not in STOPWORDS][:MAX_QUERY_TERMS]
+
+
+def _in(column, values):
+    return f"{column} IN ({', '.join(['%s'] * len(values))})", list(values)
+
+
+def _chunks(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), IN_CHUNK):
+        yield ids[start:start + IN_CHUNK]
+
+
+class DatabaseIndex(abc.ABC):
+    """
+    Shared by the FTS5 and tsvector backends. Documents are written with one
+    INSERT ... SELECT per batch inside the caller's transaction, so the index
+    commits or rolls back with the balls.
+    """
+    table = None
+    key = None
+    insert_sql = None
+
+    def index(self, where, params):
+        """
+        (Re-)indexes the balls matching a condition on `b`, the ball table.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE {self.key} IN (SELECT b.id FROM {Ball._meta.db_table} b WHERE {where})",
+                params,
+            )
+            cursor.execute(f"{self.insert_sql} {DOCUMENT_FROM} WHERE {where}", params)
+
+    def remove(self, ball_ids):
+        with connection.cursor() as cursor:
+            for chunk in _chunks(ball_ids):
+                cursor.execute(*_delete_sql(self.table, self.key, chunk))
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+
+    @abc.abstractmethod
+    def filter(self, queryset, terms, ranked=False):
+        """
+        Narrows a ball queryset to matches for every term, best first if ranked.
+        """
+
+    def search(self, terms, offset, limit):
+        return list(self.filter(Ball.objects.with_related(), terms, ranked=True)[offset:offset + limit])
+
+
+def _delete_sql(table, key, ids):
+    condition, params = _in(key, ids)
+    return f"DELETE FROM {table} WHERE {condition}", params
+
+
+class SqliteFtsBackend(DatabaseIndex):
+    name = 'fts5'
+    table = FTS_TABLE
+    key = 'rowid'
+    insert_sql = f"INSERT INTO {FTS_TABLE} (rowid, commentary, players, venue) SELECT b.id, {COMMENTARY_SQL}, {PLAYERS_SQL}, m.venue"
+
+    def filter(self, queryset, terms, ranked=False):
+        ball_table = Ball._meta.db_table
+        options = {
+            'tables': [FTS_TABLE],
+            'where': [f"{FTS_TABLE}.rowid = {ball_table}.id", f"{FTS_TABLE} MATCH %s"],
+            # Quoted terms can't be read as FTS5 operators; together they must all match
+            'params': [' '.join(f'"{term}"' for term in terms)],
+        }
+        if ranked:
+            options['select'] = {'search_rank': f"bm25({FTS_TABLE}, 1.0, 2.0, 1.0)"}
+            options['order_by'] = ['search_rank', f'-{ball_table}.id']
+        return queryset.extra(**options)
+
+
+class PostgresBackend(DatabaseIndex):
+    name = 'tsvector'
+    table = PG_TABLE
+    key = 'ball_id'
+    insert_sql = (
+        f"INSERT INTO {PG_TABLE} (ball_id, document) SELECT b.id, "
+        f"setweight(to_tsvector('english', {PLAYERS_SQL}), 'A') "
+        f"|| setweight(to_tsvector('english', {COMMENTARY_SQL}), 'B') "
+        f"|| setweight(to_tsvector('english', m.venue), 'C')"
+    )
+
+    def filter(self, queryset, terms, ranked=False):
+        ball_table = Ball._meta.db_table
+        tsquery = ' & '.join(terms)
+        options = {
+            'tables': [PG_TABLE],
+            'where': [f"{PG_TABLE}.ball_id = {ball_table}.id", f"{PG_TABLE}.document @@ to_tsquery('english', %s)"],
+            'params': [tsquery],
+        }
+        if ranked:
+            options['select'] = {'search_rank': f"ts_rank_cd({PG_TABLE}.document, to_tsquery('english', %s))"}
+            options['select_params'] = [tsquery]
+            options['order_by'] = ['-search_rank', f'-{ball_table}.id']
+        return queryset.extra(**options)
+
+
+def stem(word):
+    """
+    A light English suffix stripper, so "sixes" finds "six" and "pulled"
+    finds "pulls" in the Python index. The database backends stem their own way.
+    """
+    for suffix, replacement in (('ies', 'y'), ('sses', 'ss'), ('xes', 'x'), ('ches', 'ch'), ('shes', 'sh')):
+        if word.endswith(suffix) and len(word) > len(suffix) + 1:
+            return word[:-len(suffix)] + replacement
+    for suffix in ('ing', 'ed'):
+        if word.endswith(suffix) and len(word) > len(suffix) + 2:
+            return word[:-len(suffix)]
+    if word.endswith('s') and not word.endswith(('ss', 'us', 'is')) and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def _tokens(*texts):
+    return [stem(word) for text in texts for word in WORD_RE.findall(text.lower())]
+
+
+class PythonBackend:
+    """
+    In-process inverted index: term -> {ball id: occurrences}, ranked with
+    BM25. Player names count twice, as in the FTS5 weighting. Writes are
+    applied once the transaction commits, since the index can't roll back.
+    """
+    name = 'python'
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self._postings = {}
+        self._documents = {} # ball id -> Counter of its terms
+        self._lengths = {}
+        self._total_length = 0
+        self._built = False
+        self._lock = threading.RLock()
+
+    def _load(self, where, params):
+        # Names are selected apart: not every database concatenates with ||
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT b.id, {COMMENTARY_SQL}, bat.name, bowl.name, m.venue {DOCUMENT_FROM} WHERE {where}", params)
+            return [
+                (ball_id, Counter(_tokens(commentary, batsman, batsman, bowler, bowler, venue)))
+                for ball_id, commentary, batsman, bowler, venue in cursor.fetchall()
+            ]
+
+    def _discard(self, ball_id):
+        terms = self._documents.pop(ball_id, None)
+        if terms is None:
+            return
+        self._total_length -= self._lengths.pop(ball_id)
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(ball_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def _add(self, ball_id, terms):
+        self._discard(ball_id)
+        self._documents[ball_id] = terms
+        self._lengths[ball_id] = sum(terms.values())
+        self._total_length += self._lengths[ball_id]
+        for term, count in terms.items():
+            self._postings.setdefault(term, {})[ball_id] = count
+
+    def _ensure_built(self):
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    for ball_id, terms in self._load('1 = 1', []):
+                        self._add(ball_id, terms)
+                    self._built = True
+
+    def index(self, where, params):
+        def apply():
+            if self._built: # Otherwise the first search loads everything anyway
+                documents = self._load(where, params)
+                with self._lock:
+                    for ball_id, terms in documents:
+                        self._add(ball_id, terms)
+
+        transaction.on_commit(apply, robust=True)
+
+    def remove(self, ball_ids):
+        ball_ids = list(ball_ids)
+
+        def apply():
+            with self._lock:
+                for ball_id in ball_ids:
+                    self._discard(ball_id)
+
+        transaction.on_commit(apply, robust=True)
+
+    def clear(self):
+        with self._lock:
+            self._postings, self._documents, self._lengths, self._total_length = {}, {}, {}, 0
+            self._built = False
+
+    def ranked_ids(self, terms):
+        """
+        Ids of the balls containing every term, best match first.
+        """
+        self._ensure_built()
+        terms = [stem(term) for term in terms]
+        with self._lock:
+            postings = [self._postings.get(term, {}) for term in terms]
+            if not postings or not all(postings):
+                return []
+            matches = set.intersection(*(set(posting) for posting in postings))
+            count = len(self._documents)
+            average = self._total_length / count
+            scores = {}
+            for posting in postings:
+                idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+                for ball_id in matches:
+                    frequency = posting[ball_id]
+                    norm = frequency + self.K1 * (1 - self.B + self.B * self._lengths[ball_id] / average)
+                    scores[ball_id] = scores.get(ball_id, 0.0) + idf * frequency * (self.K1 + 1) / norm
+        return sorted(scores, key=lambda ball_id: (-scores[ball_id], -ball_id))
+
+    def filter(self, queryset, terms, ranked=False):
+        return queryset.filter(pk__in=self.ranked_ids(terms))
+
+    def search(self, terms, offset, limit):
+        ranked = self.ranked_ids(terms)
+        scores = {ball_id: position for position, ball_id in enumerate(ranked)}
+        page = ranked[offset:offset + limit]
+        balls = Ball.objects.with_related().in_bulk(page)
+        for ball in balls.values():
+            ball.search_rank = scores[ball.pk]
+        return [balls[ball_id] for ball_id in page if ball_id in balls]
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    The index backend for this process: the database's own full-text index
+    when migration 0011 could create one, else the Python index.
+    settings.CRICKET_SEARCH_BACKEND = 'python' forces the latter.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                tables = set(connection.introspection.table_names())
+                if getattr(settings, 'CRICKET_SEARCH_BACKEND', 'auto') == 'python':
+                    _backend = PythonBackend()
+                elif connection.vendor == 'sqlite' and FTS_TABLE in tables:
+                    _backend = SqliteFtsBackend()
+                elif connection.vendor == 'postgresql' and PG_TABLE in tables:
+                    _backend = PostgresBackend()
+                else:
+                    _backend = PythonBackend()
+    return _backend
+
+
+def reset_backend():
+    """
+    Drops the current backend so the next use picks up changed settings (tests).
+    """
+    global _backend
+    with _backend_lock:
+        _backend = None
+
+
+def index_balls(ball_ids):
+    for chunk in _chunks(ball_ids):
+        get_backend().index(*_in('b.id', chunk))
+
+
+def index_matches(match_ids):
+    for chunk in _chunks(match_ids):
+        get_backend().index(*_in('b.match_id', chunk))
+
+
+def index_player(player_id):
+    get_backend().index('b.batsman_id = %s OR b.bowler_id = %s', [player_id, player_id])
+
+
+def remove_balls(ball_ids):
+    get_backend().remove(ball_ids)
+
+
+def rebuild_index():
+    """
+    Re-indexes every ball. Returns the number of balls indexed.
+    """
+    backend = get_backend()
+    with transaction.atomic():
+        backend.clear()
+        backend.index('1 = 1', [])
+    return Ball.objects.count()
+
+
+def filter_balls(queryset, text):
+    """
+    Narrows a Ball queryset to the deliveries matching a search, unranked
+    (e.g. for the admin's commentary search).
+    """
+    terms = query_terms(text)
+    return get_backend().filter(queryset, terms) if terms else queryset.none()
+
+
+@dataclass
+class SearchResults:
+    query: str
+    terms: list
+    balls: list
+    page: int
+    has_next: bool
+
+
+def page_number(params):
+    """
+    Reads ?page= from a QueryDict; ValueError if it isn't a positive number.
+    """
+    page = int(params.get('page') or 1)
+    if page < 1:
+        raise ValueError("page must be 1 or more.")
+    return page
+
+
+def search(text, page=1, per_page=SEARCH_PAGE_SIZE):
+    """
+    The page-th page of deliveries matching every meaningful word of `text`,
+    most relevant first, with their match and players loaded.
+    """
+    terms = query_terms(text)
+    if not terms:
+        return SearchResults(text, terms, [], page, False)
+    balls = get_backend().search(terms, (page - 1) * per_page, per_page + 1)
+    return SearchResults(text, terms, balls[:per_page], page, len(balls) > per_page)
@@ -0,0 +1,236 @@
+# cricket/signals.py
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import ballstore, career, innings, leaderboards, matchups, renditions, rollup, search
+from .api import ball_event
+from .cache import bump_match_version, bump_model_version
+from .live import get_broadcaster
+from .models import Ball, Match, Player, PlayerMatchPerformance, Team
+
+
+def publish_on_commit(match_id, build_event):
+    """
+    Pushes an event to the match's live viewers once the data is committed.
+    A failing push backend is logged by Django and never fails the save.
+    """
+    def publish():
+        get_broadcaster().publish(match_id, build_event())
+
+    transaction.on_commit(publish, robust=True)
+
+
+@receiver(pre_save, sender=Ball)
+def number_new_delivery(sender, instance, raw=False, **kwargs):
+    # bulk_create skips signals; the scorecard importer numbers its balls itself
+    if not raw and instance.sequence is None:
+        innings.number_delivery(instance)
+
+
+@receiver(post_save, sender=Ball)
+def fold_ball_into_innings(sender, instance, created, raw=False, **kwargs):
+    """
+    New deliveries are folded into the running innings totals.
+    Edits to an existing ball (e.g. in BallAdmin) can change any earlier total,
+    so the whole match is rebuilt instead.
+    """
+    if raw: # Skip fixture loading; run the rebuild_innings command afterwards
+        return
+    if created:
+        innings.record_ball(instance)
+        publish_on_commit(instance.match_id, lambda: ball_event(instance))
+    else:
+        innings.schedule_rebuild(instance.match_id)
+        # Viewers re-fetch through the update API after an edit
+        publish_on_commit(instance.match_id, lambda: {'type': 'refresh', 'match_id': instance.match_id})
+
+
+@receiver(post_delete, sender=Ball)
+def rebuild_innings_on_ball_delete(sender, instance, **kwargs):
+    innings.schedule_rebuild(instance.match_id)
+    publish_on_commit(instance.match_id, lambda: {'type': 'refresh', 'match_id': instance.match_id})
+
+
+@receiver(pre_save, sender=Ball)
+def remember_previous_ball(sender, instance, raw=False, **kwargs):
+    # Edits move the ball's contribution out of the old matchups and into the new ones
+    instance._previous_ball = None
+    if not raw and instance.pk is not None:
+        instance._previous_ball = sender.objects.filter(pk=instance.pk).select_related('batsman', 'bowler').first()
+
+
+@receiver(post_save, sender=Ball)
+def update_matchups_on_save(sender, instance, raw=False, **kwargs):
+    if raw: # Run the rebuild_matchups command after loading fixtures
+        return
+    matchups.ball_changed(getattr(instance, '_previous_ball', None), instance)
+
+
+@receiver(post_delete, sender=Ball)
+def update_matchups_on_delete(sender, instance, **kwargs):
+    matchups.ball_changed(instance, None)
+
+
+@receiver(post_save, sender=Ball)
+def index_ball_on_save(sender, instance, raw=False, **kwargs):
+    if not raw: # Run the rebuild_search_index command after loading fixtures
+        search.index_balls([instance.pk])
+
+
+@receiver(post_delete, sender=Ball)
+def remove_ball_from_index(sender, instance, **kwargs):
+    search.remove_balls([instance.pk])
+
+
+@receiver(post_save, sender=Ball)
+def log_ball_store_edit(sender, instance, created, raw=False, **kwargs):
+    # New balls are appended by the next sync; edits make it rebuild
+    if not raw and not created:
+        ballstore.record_change(instance.pk)
+
+
+@receiver(post_delete, sender=Ball)
+def log_ball_store_delete(sender, instance, **kwargs):
+    ballstore.record_change(instance.pk)
+
+
+@receiver(pre_save, sender=Match)
+def remember_previous_state(sender, instance, raw=False, **kwargs):
+    instance._previous_status = instance._previous_date = instance._previous_venue = None
+    if not raw and instance.pk is not None:
+        previous = sender.objects.filter(pk=instance.pk).values_list('status', 'date', 'venue').first()
+        if previous:
+            instance._previous_status, instance._previous_date, instance._previous_venue = previous
+
+
+@receiver(post_save, sender=Match)
+def sync_performance_dates(sender, instance, created, raw=False, **kwargs):
+    # PlayerMatchPerformance.match_date mirrors the match date
+    if not raw and not created and getattr(instance, '_previous_date', None) != instance.date:
+        PlayerMatchPerformance.objects.filter(match_id=instance.pk).update(match_date=instance.date)
+
+
+@receiver(post_save, sender=Match)
+def move_leaderboard_entries(sender, instance, created, raw=False, **kwargs):
+    # Season and venue boards follow the match's date and venue
+    if raw or created:
+        return
+    if (instance._previous_date, instance._previous_venue) != (instance.date, instance.venue):
+        leaderboards.schedule_refresh(
+            PlayerMatchPerformance.objects.filter(match_id=instance.pk).values_list('player_id', flat=True)
+        )
+
+
+@receiver(post_save, sender=Match)
+def reindex_balls_on_venue_change(sender, instance, created, raw=False, **kwargs):
+    # The venue is part of every ball's search document
+    if not raw and not created and instance._previous_venue != instance.venue:
+        search.index_matches([instance.pk])
+
+
+@receiver(post_save, sender=Match)
+def rollup_performances_on_completion(sender, instance, raw=False, **kwargs):
+    """
+    When a match is marked Completed, derive its player performances from the balls.
+    """
+    if raw or instance.status != 'Completed':
+        return
+    if getattr(instance, '_previous_status', None) != 'Completed':
+        transaction.on_commit(lambda: rollup.rollup_match(instance.pk))
+
+
+@receiver(post_save, sender=Match)
+def bump_version_on_match_save(sender, instance, raw=False, **kwargs):
+    # Status and winner are part of the live payload
+    if not raw:
+        bump_match_version(instance.pk)
+        publish_on_commit(instance.pk, lambda: {
+            'type': 'status', 'match_id': instance.pk,
+            'status': instance.status, 'winner_id': instance.winner_id,
+        })
+
+
+@receiver(pre_save, sender=PlayerMatchPerformance)
+def remember_previous_performance(sender, instance, raw=False, **kwargs):
+    # Keep the stored row so post_save can apply only the difference
+    instance._previous_performance = None
+    if not raw and instance.pk is not None:
+        instance._previous_performance = sender.objects.filter(pk=instance.pk).order_by().first()
+    previous = instance._previous_performance
+    if instance.match_date is None or (previous is not None and previous.match_id != instance.match_id):
+        instance.match_date = instance.match.date
+
+
+@receiver(post_save, sender=PlayerMatchPerformance)
+def update_career_stats_on_save(sender, instance, raw=False, **kwargs):
+    if raw: # Run the rebuild_career_stats command after loading fixtures
+        return
+    career.performance_changed(getattr(instance, '_previous_performance', None), instance)
+
+
+@receiver(post_delete, sender=PlayerMatchPerformance)
+def update_career_stats_on_delete(sender, instance, **kwargs):
+    career.performance_changed(instance, None)
+
+
+@receiver(post_save, sender=PlayerMatchPerformance)
+@receiver(post_delete, sender=PlayerMatchPerformance)
+def refresh_leaderboards_on_performance_change(sender, instance, raw=False, **kwargs):
+    if raw: # Run the rebuild_leaderboards command after loading fixtures
+        return
+    previous = getattr(instance, '_previous_performance', None)
+    leaderboards.schedule_refresh({instance.player_id, previous.player_id if previous else instance.player_id})
+
+
+@receiver(pre_save, sender=Player)
+def remember_previous_player(sender, instance, raw=False, **kwargs):
+    instance._previous_name = instance._previous_team_id = None
+    if not raw and instance.pk is not None:
+        previous = sender.objects.filter(pk=instance.pk).values_list('name', 'team_id').first()
+        if previous:
+            instance._previous_name, instance._previous_team_id = previous
+
+
+@receiver(post_save, sender=Player)
+def reindex_balls_on_rename(sender, instance, created, raw=False, **kwargs):
+    # Names are part of the search documents of every ball the player faced or bowled
+    if not raw and not created and instance._previous_name != instance.name:
+        search.index_player(instance.pk)
+
+
+@receiver(post_save, sender=Player)
+def log_ball_store_transfer(sender, instance, created, raw=False, **kwargs):
+    # The store keeps each ball's batting team
+    if raw or created or instance._previous_team_id == instance.team_id:
+        return
+    if instance.batsman_balls.exists():
+        ballstore.record_change()
+
+
+@receiver(post_save, sender=Player)
+def refresh_leaderboards_on_player_save(sender, instance, created, raw=False, **kwargs):
+    # A transfer moves the player between team boards
+    if not raw and not created:
+        leaderboards.schedule_refresh([instance.pk])
+
+
+@receiver(post_save, sender=Team)
+@receiver(post_save, sender=Player)
+def render_uploaded_images(sender, instance, raw=False, **kwargs):
+    # A new, replaced or cleared logo or photo gets its sized copies off the request thread
+    if not raw and renditions.is_stale(instance):
+        renditions.schedule_render(instance)
+
+
+# Cached pages and fragments are keyed on these models' versions (cricket/cache.py)
+VERSIONED_MODELS = {Match: 'match', Team: 'team', Player: 'player'}
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_cached_page_versions(sender, **kwargs):
+    label = VERSIONED_MODELS.get(sender)
+    if label:
+        bump_model_version(label)
@@ -0,0 +1,309 @@
+# cricket/simulation.py
+
+"""
+Monte Carlo simulation of the rest of a match.
+
+Every delivery's outcome is drawn from a distribution over nine outcomes (dot,
+1, 2, 3, 4, 6, wicket, wide, no-ball) built from the batsman's and the
+bowling side's history in Ball. A batch of innings is simulated as one
+(simulations x deliveries) matrix: outcomes come from a table lookup on
+random integers, running totals from cumulative sums, and each simulation's
+end of innings from the first column where balls, wickets or the target run
+out. There is no Python loop per delivery. Large runs are split across a
+process pool.
+
+Results are cached per (match, latest ball, simulations), so every viewer of
+the same delivery shares one run. Requested counts are rounded up to one of
+SIMULATION_COUNTS, so a client can't skip the cache by varying the count.
+"""
+
+import math
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from .cache import match_version
+from .models import Ball, Player
+from .prediction import INNINGS_BALLS, MAX_WICKETS, innings_order
+
+OUTCOMES = ('0', '1', '2', '3', '4', '6', 'W', 'WD', 'NB')
+OUTCOME_RUNS = np.array([0, 1, 2, 3, 4, 6, 0, 1, 1])
+OUTCOME_LEGAL = np.array([1, 1, 1, 1, 1, 1, 1, 0, 0])
+OUTCOME_WICKET = np.array([0, 0, 0, 0, 0, 0, 1, 0, 0])
+# Runs, legal balls and wickets packed into one integer per outcome
+# (bits 0-11, 12-19 and 20-27), so one cumulative sum tracks all three
+LEGAL_SHIFT, WICKET_SHIFT = 12, 20
+OUTCOME_PACKED = (OUTCOME_RUNS | OUTCOME_LEGAL << LEGAL_SHIFT | OUTCOME_WICKET << WICKET_SHIFT).astype(np.int32)
+# League-average fallback (about 8 an over), as pseudo-counts per 100 balls
+PRIOR_COUNTS = np.array([35, 35, 8, 1, 12, 5, 5, 3, 1], dtype=float)
+# How many of a player's own deliveries it takes to outweigh the prior
+PRIOR_WEIGHT = 30
+# Deliveries simulated beyond the legal balls left, to allow for extras
+EXTRA_COLUMNS = 40
+# Outcome lookup resolution: draws are 16-bit integers
+DRAW_LEVELS = 1 << 16
+# Simulations per matrix, to bound memory
+BLOCK_SIZE = 10_000
+
+DEFAULT_SIMULATIONS = 50_000
+MAX_SIMULATIONS = 200_000
+# The only counts that are run (and cached)
+SIMULATION_COUNTS = (1_000, 5_000, 20_000, DEFAULT_SIMULATIONS, MAX_SIMULATIONS)
+SIMULATION_CACHE_TTL = 600
+# Runs smaller than this stay in the calling process
+MIN_PARALLEL_SIMULATIONS = 10_000
+
+
+def outcome_index(runs, is_wicket, is_wide, is_no_ball):
+    if is_wide:
+        return 7
+    if is_no_ball:
+        return 8
+    if is_wicket:
+        return 6
+    return {0: 0, 1: 1, 2: 2, 3: 3, 4: 4, 5: 4}.get(runs, 5) # Fives are rare; count them as fours
+
+
+def _smoothed(counts):
+    counts = np.asarray(counts, dtype=float)
+    prior = PRIOR_COUNTS / PRIOR_COUNTS.sum()
+    return (counts + PRIOR_WEIGHT * prior) / (counts.sum() + PRIOR_WEIGHT)
+
+
+def outcome_counts(field, ids):
+    """
+    {player id: outcome counts} over the Ball history of the given batsmen
+    (field='batsman') or bowlers (field='bowler'), in one grouped query.
+    """
+    counts = {player_id: np.zeros(len(OUTCOMES)) for player_id in ids}
+    rows = (
+        Ball.objects.filter(**{f'{field}_id__in': ids}).order_by()
+        .values_list(f'{field}_id', 'runs', 'is_wicket', 'is_wide', 'is_no_ball')
+        .annotate(n=Count('id'))
+    )
+    for player_id, runs, is_wicket, is_wide, is_no_ball, n in rows:
+        counts[player_id][outcome_index(runs, is_wicket, is_wide, is_no_ball)] += n
+    return counts
+
+
+def team_distribution(counts):
+    # Side-level distribution: every player's deliveries pooled
+    return _smoothed(sum(counts.values(), np.zeros(len(OUTCOMES))))
+
+
+def matchup_cdf(batting, bowling):
+    """
+    Cumulative outcome probabilities for a batting distribution against a bowling one.
+    """
+    combined = (batting + bowling) / 2
+    return np.cumsum(combined / combined.sum())
+
+
+def outcome_table(cdf):
+    # Packed outcome for every possible 16-bit draw
+    table = np.searchsorted(cdf, (np.arange(DRAW_LEVELS) + 0.5) / DRAW_LEVELS, side='right')
+    return OUTCOME_PACKED[table.clip(0, len(OUTCOMES) - 1)]
+
+
+def simulate_innings(rng, n, start, current_cdf, side_cdf, target=None):
+    """
+    Plays out `n` copies of an innings from start=(runs, legal balls, wickets).
+    Until the first simulated wicket the current batsman's matchup (current_cdf)
+    is used, after that the batting side's (side_cdf). Stops at 120 legal
+    balls, 10 wickets or reaching `target` (a number or one per copy).
+    Returns the final runs per copy.
+    """
+    runs, balls, wickets = start
+    balls_left, wickets_left = INNINGS_BALLS - balls, MAX_WICKETS - wickets
+    if balls_left <= 0 or wickets_left <= 0:
+        return np.full(n, runs, dtype=np.int64)
+    columns = balls_left + EXTRA_COLUMNS
+    need = np.broadcast_to(np.inf if target is None else np.asarray(target) - runs, (n,))
+    current_table, side_table = outcome_table(current_cdf), outcome_table(side_cdf)
+
+    totals = np.empty(n, dtype=np.int64)
+    for block in range(0, n, BLOCK_SIZE):
+        size = min(BLOCK_SIZE, n - block)
+        draws = rng.integers(0, DRAW_LEVELS, size=(size, columns), dtype=np.uint16)
+        outcomes = current_table[draws]
+        # The same draw maps through the side's table once the current batsman is out
+        out = outcomes >= 1 << WICKET_SHIFT
+        first_wicket = np.where(out.any(axis=1), out.argmax(axis=1), columns)
+        after = np.arange(columns) > first_wicket[:, None]
+        outcomes = np.where(after, side_table[draws], outcomes)
+
+        progress = np.cumsum(outcomes, axis=1)
+        scored = progress & (1 << LEGAL_SHIFT) - 1
+        finished = (
+            ((progress >> LEGAL_SHIFT & 0xFF) >= balls_left)
+            | ((progress >> WICKET_SHIFT) >= wickets_left)
+            | (scored >= need[block:block + size, None])
+        )
+        # Innings ends on the first finishing delivery (or the last column, if extras ran on)
+        last = np.where(finished.any(axis=1), finished.argmax(axis=1), columns - 1)
+        totals[block:block + size] = runs + scored[np.arange(size), last]
+    # Copies whose target was already reached don't bat on
+    return np.where(need <= 0, runs, totals)
+
+
+def run_batch(plan, n, seed):
+    """
+    Simulates `n` finishes of a match described by `plan` (see build_plan).
+    Top-level so a process pool can run it. Returns (first totals, second totals).
+    """
+    rng = np.random.default_rng(seed)
+    first = plan['first']
+    if plan['second'] is None:
+        first_totals = simulate_innings(rng, n, first, plan['first_current_cdf'], plan['first_side_cdf'])
+        second_start = (0, 0, 0)
+        second_current = plan['second_side_cdf']
+    else:
+        first_totals = np.full(n, first[0], dtype=np.int64)
+        second_start = plan['second']
+        second_current = plan['second_current_cdf']
+    second_totals = simulate_innings(
+        rng, n, second_start, second_current, plan['second_side_cdf'], target=first_totals + 1
+    )
+    return first_totals, second_totals
+
+
+def build_plan(match, snapshot):
+    """
+    The current state of a match and the outcome distributions needed to play it out.
+    """
+    first, second = innings_order(snapshot)
+    if first is None:
+        first_team = match.team1_id # Toss unknown until the first ball
+    else:
+        first_team = first.batting_team_id
+    second_team = match.team2_id if first_team == match.team1_id else match.team1_id
+
+    squads = {}
+    for player_id, team_id in Player.objects.filter(team_id__in=[first_team, second_team]).values_list('id', 'team_id'):
+        squads.setdefault(team_id, []).append(player_id)
+    batting = outcome_counts('batsman', squads.get(first_team, []) + squads.get(second_team, []))
+    bowling = outcome_counts('bowler', squads.get(first_team, []) + squads.get(second_team, []))
+
+    def side(team_id, counts):
+        return team_distribution({pid: counts[pid] for pid in squads.get(team_id, [])})
+
+    last_ball = match.balls.order_by('-sequence').values_list('batsman_id', flat=True).first()
+    current = _smoothed(batting[last_ball]) if last_ball in batting else None
+
+    first_bat, second_bat = side(first_team, batting), side(second_team, batting)
+    first_bowl, second_bowl = side(second_team, bowling), side(first_team, bowling)
+    state = lambda innings: (innings.runs, innings.legal_balls, innings.wickets)
+    return {
+        'first_team': first_team,
+        'second_team': second_team,
+        'first': state(first) if first else (0, 0, 0),
+        'second': state(second) if second else None,
+        'first_current_cdf': matchup_cdf(current if current is not None and not second else first_bat, first_bowl),
+        'first_side_cdf': matchup_cdf(first_bat, first_bowl),
+        'second_current_cdf': matchup_cdf(current if current is not None and second else second_bat, second_bowl),
+        'second_side_cdf': matchup_cdf(second_bat, second_bowl),
+    }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _workers():
+    return getattr(settings, 'CRICKET_SIMULATION_WORKERS', os.cpu_count() or 1)
+
+
+def get_pool():
+    """
+    The process-wide worker pool, started on first use.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=_workers())
+    return _pool
+
+
+def run_simulations(plan, n, seed=None):
+    """
+    Runs `n` simulations, split across the pool when it is worth it.
+    """
+    seeds = np.random.SeedSequence(seed)
+    workers = _workers()
+    if workers <= 1 or n < MIN_PARALLEL_SIMULATIONS:
+        return run_batch(plan, n, seeds)
+    sizes = [n // workers + (1 if index < n % workers else 0) for index in range(workers)]
+    futures = [
+        get_pool().submit(run_batch, plan, size, child)
+        for size, child in zip(sizes, seeds.spawn(workers)) if size
+    ]
+    results = [future.result() for future in futures]
+    return np.concatenate([first for first, _ in results]), np.concatenate([second for _, second in results])
+
+
+def _wilson_interval(successes, n, z=1.96):
+    # 95% confidence band for a simulated probability
+    if not n:
+        return None
+    p = successes / n
+    centre = (p + z * z / (2 * n)) / (1 + z * z / n)
+    margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return [round(max(centre - margin, 0) * 100, 2), round(min(centre + margin, 1) * 100, 2)]
+
+
+def _distribution(totals):
+    percentiles = np.percentile(totals, [5, 25, 50, 75, 95])
+    return {
+        'mean': round(float(totals.mean()), 1),
+        'percentiles': dict(zip(('p5', 'p25', 'p50', 'p75', 'p95'), (int(value) for value in percentiles))),
+    }
+
+
+def summarize(match, plan, first_totals, second_totals):
+    n = len(first_totals)
+    second_wins = int((second_totals > first_totals).sum())
+    ties = int((second_totals == first_totals).sum())
+    first_wins = n - second_wins - ties
+    wins = {plan['first_team']: first_wins, plan['second_team']: second_wins}
+    return {
+        'success': True,
+        'match_id': match.pk,
+        'simulations': n,
+        'team1_win_prob': round(wins[match.team1_id] * 100 / n, 2),
+        'team2_win_prob': round(wins[match.team2_id] * 100 / n, 2),
+        'tie_prob': round(ties * 100 / n, 2),
+        'team1_win_interval': _wilson_interval(wins[match.team1_id], n),
+        'team2_win_interval': _wilson_interval(wins[match.team2_id], n),
+        'first_innings': {'batting_team_id': plan['first_team'], **_distribution(first_totals)},
+        'second_innings': {'batting_team_id': plan['second_team'], **_distribution(second_totals)},
+    }
+
+
+def simulation_count(requested):
+    """
+    The smallest of SIMULATION_COUNTS that is at least `requested`, capped at MAX_SIMULATIONS.
+    """
+    return next((count for count in SIMULATION_COUNTS if count >= requested), MAX_SIMULATIONS)
+
+
+def simulate_match(match, snapshot, n=DEFAULT_SIMULATIONS):
+    """
+    Simulation summary for a match, cached per (match, latest ball, n); the
+    match version is part of the key so edits to earlier balls start afresh.
+    Returns None for a completed match.
+    """
+    if match.status == 'Completed':
+        return None
+    cache_key = f"cricket:simulation:{match.pk}:{snapshot['last_ball_id']}:{match_version(match.pk)}:{n}"
+    result = cache.get(cache_key)
+    if result is None:
+        plan = build_plan(match, snapshot)
+        result = summarize(match, plan, *run_simulations(plan, n))
+        cache.set(cache_key, result, SIMULATION_CACHE_TTL)
+    return result
@@ -0,0 +1,17 @@
+// cricket/static/cricket/js/admin_filters.js
+
+// Autocomplete list filters (cricket/admin.py): reload the changelist with
+// the picked object, or without the filter when it is cleared.
+'use strict';
+window.addEventListener('load', function () {
+    django.jQuery('.cricket-autocomplete-filter select').on('change', function () {
+        const url = new URL(window.location.href);
+        url.searchParams.delete('p'); // Back to the first page
+        if (this.value) {
+            url.searchParams.set(this.name, this.value);
+        } else {
+            url.searchParams.delete(this.name);
+        }
+        window.location.href = url.toString();
+    });
+});
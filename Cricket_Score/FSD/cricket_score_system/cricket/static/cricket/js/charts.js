@@ -13,6 +13,56 @@ function getThemeColor(lightColor, darkColor) {
     return htmlElement.classList.contains('dark') ? darkColor : lightColor;
 }
 
+/**
+ * Turns a dataset from the graph API ({label, team_id, data}) into a Chart.js dataset.
+ * @param {object} dataset - One innings' series.
+ * @returns {object} The styled Chart.js dataset.
+ */
+function chartDataset(dataset) {
+    return {
+        label: dataset.label,
+        teamId: dataset.team_id, // Lets live tails find the innings they extend
+        data: dataset.data,
+        // Apply theme-aware colors
+        borderColor: dataset.borderColor || getThemeColor('#3b82f6', '#60a5fa'), // blue-600 / blue-400
+        backgroundColor: dataset.backgroundColor || getThemeColor('rgba(59, 130, 246, 0.2)', 'rgba(96, 165, 250, 0.2)'),
+        tension: 0.3, // Smoother lines
+        fill: true,
+        pointBackgroundColor: dataset.pointBackgroundColor || getThemeColor('#1d4ed8', '#93c5fd'), // blue-800 / blue-300
+        pointBorderColor: getThemeColor('#fff', '#374151'), // white / gray-700
+        pointHoverRadius: 6,
+        pointHoverBackgroundColor: getThemeColor('#fff', '#374151'),
+        pointHoverBorderColor: dataset.borderColor || getThemeColor('#3b82f6', '#60a5fa'),
+    };
+}
+
+/**
+ * Splices a graph tail from a live update into the chart: every over from
+ * tail.from_over onwards is replaced, earlier overs are kept as drawn.
+ * @param {object} tail - {from_over, innings: [{team_id, label, run_rate: [...], ...}]}
+ * @param {string} series - Which series the chart shows (default 'run_rate').
+ * @returns {boolean} False when there is no chart to append to.
+ */
+function appendRunRateChartTail(tail, series = 'run_rate') {
+    if (!runRateChartInstance || !tail) {
+        return false;
+    }
+    const chart = runRateChartInstance;
+    tail.innings.forEach(innings => {
+        let dataset = chart.data.datasets.find(existing => existing.teamId === innings.team_id);
+        if (!dataset) {
+            // An innings that started since the chart was drawn
+            dataset = chartDataset({ label: innings.label, team_id: innings.team_id, data: [] });
+            chart.data.datasets.push(dataset);
+        }
+        dataset.data.splice(tail.from_over, Infinity, ...innings[series]);
+    });
+    const longest = Math.max(0, ...chart.data.datasets.map(dataset => dataset.data.length));
+    chart.data.labels = Array.from({ length: longest }, (_, over) => String(over + 1));
+    chart.update();
+    return true;
+}
+
 /**
  * Initializes or updates the run rate chart.
  * @param {object|string} graphData - The data for the chart, typically containing labels and datasets.
@@ -53,20 +103,7 @@ function initializeOrUpdateRunRateChart(graphData) {
         type: 'line', // Line chart for run rate
         data: {
             labels: parsedGraphData.labels,
-            datasets: parsedGraphData.datasets.map(dataset => ({
-                label: dataset.label,
-                data: dataset.data,
-                // Apply theme-aware colors
-                borderColor: dataset.borderColor || getThemeColor('#3b82f6', '#60a5fa'), // blue-600 / blue-400
-                backgroundColor: dataset.backgroundColor || getThemeColor('rgba(59, 130, 246, 0.2)', 'rgba(96, 165, 250, 0.2)'),
-                tension: 0.3, // Smoother lines
-                fill: true,
-                pointBackgroundColor: dataset.pointBackgroundColor || getThemeColor('#1d4ed8', '#93c5fd'), // blue-800 / blue-300
-                pointBorderColor: getThemeColor('#fff', '#374151'), // white / gray-700
-                pointHoverRadius: 6,
-                pointHoverBackgroundColor: getThemeColor('#fff', '#374151'),
-                pointHoverBorderColor: dataset.borderColor || getThemeColor('#3b82f6', '#60a5fa'),
-            }))
+            datasets: parsedGraphData.datasets.map(chartDataset)
         },
         options: {
             responsive: true,
@@ -86,7 +123,7 @@ function initializeOrUpdateRunRateChart(graphData) {
                 tooltip: {
                     callbacks: {
                         label: function(context) {
-                            return `${context.dataset.label}: ${context.raw} runs`;
+                            return `${context.dataset.label}: ${context.raw} runs/over`;
                         }
                     },
                     backgroundColor: getThemeColor('rgba(0,0,0,0.8)', 'rgba(255,255,255,0.8)'), // Dark/Light background for tooltip
@@ -147,6 +184,11 @@ window.updateChart = function(newGraphData) {
     initializeOrUpdateRunRateChart(newGraphData);
 };
 
+// Live updates that only carry the latest overs extend the chart in place
+window.appendChartTail = function(tail) {
+    return appendRunRateChartTail(tail);
+};
+
 // Initialize chart when the DOM content is fully loaded
 document.addEventListener('DOMContentLoaded', () => {
     const chartCanvas = document.getElementById('runRateChart');
@@ -1,26 +1,58 @@
-document.addEventListener('DOMContentLoaded', function () {
-    // Simulate live score updates
-    const liveButtons = document.querySelectorAll('.live-update-btn');
-    liveButtons.forEach(button => {
-        button.addEventListener('click', function () {
-            const matchId = button.dataset.matchId;
-            const scoreDisplay = document.querySelector(`#score-${matchId}`);
-            if (scoreDisplay) {
-                // Simulate score update (replace with WebSocket in production)
-                const currentScore = parseInt(scoreDisplay.textContent) || 0;
-                scoreDisplay.textContent = currentScore + Math.floor(Math.random() * 6);
-                scoreDisplay.classList.add('score-updated');
-                setTimeout(() => scoreDisplay.classList.remove('score-updated'), 500);
+// cricket/static/cricket/js/interactive.js
+
+/**
+ * Live score push over Server-Sent Events.
+ * One EventSource per match page; the server fans each recorded ball out to
+ * every connected viewer, so pages no longer need to poll.
+ */
+window.CricketLive = {
+    /**
+     * Subscribes to a match's live events.
+     * @param {string|number} matchId - Match to follow.
+     * @param {function(object)} onEvent - Called with each parsed event ({type: 'ball'|'refresh'|'status', ...}).
+     * @returns {EventSource|null} The open stream, or null if the browser can't stream.
+     */
+    subscribe(matchId, onEvent) {
+        if (!window.EventSource) {
+            return null;
+        }
+        const source = new EventSource(`/api/matches/${matchId}/stream/`);
+        let opened = false;
+
+        source.addEventListener('open', () => {
+            if (opened) {
+                // Reconnected: we may have missed events, so ask the page to catch up
+                onEvent({ type: 'refresh', match_id: matchId });
             }
+            opened = true;
         });
-    });
+        source.addEventListener('message', message => {
+            try {
+                onEvent(JSON.parse(message.data));
+            } catch (error) {
+                console.error('Bad live event:', error);
+            }
+        });
+        source.addEventListener('error', () => {
+            if (!opened) {
+                // Streaming isn't available (e.g. the WSGI dev server); stay on manual updates
+                source.close();
+            }
+        });
+        return source;
+    },
+};
 
+document.addEventListener('DOMContentLoaded', function () {
     // Smooth scroll for navigation
     document.querySelectorAll('a.nav-link').forEach(anchor => {
         anchor.addEventListener('click', function (e) {
-            e.preventDefault();
             const targetId = this.getAttribute('href');
+            if (!targetId.startsWith('#')) {
+                return; // Regular page link
+            }
+            e.preventDefault();
             document.querySelector(targetId).scrollIntoView({ behavior: 'smooth' });
         });
     });
-});
\ No newline at end of file
+});
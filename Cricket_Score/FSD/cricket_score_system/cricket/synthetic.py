@@ -0,0 +1,239 @@
+# cricket/synthetic.py
+
+"""
+Seeded synthetic leagues, for exercising the system at a realistic scale.
+
+generate_league() makes N teams of named players with batting and bowling
+skills, plays a double round-robin each season (every side hosts every
+other once) ball by ball, and loads the result through the scorecard
+importer, so it exercises the same bulk path as real data and leaves
+innings totals, performances, career stats, matchups, leaderboards and the
+search index in place.
+
+Innings run to the over limit (20 overs, so up to 240 deliveries a match
+plus extras), ten wickets or a successful chase. Each delivery is drawn from
+T20-like outcome rates, shifted by the batsman's and bowler's skill and the
+phase of the innings (powerplay, middle, death). The same seed always gives
+the same league: squads and every match have their own random stream.
+"""
+
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from . import ingest
+from .cache import bump_model_version
+from .models import Player, Team
+
+CITIES = (
+    'Arlington', 'Brookfield', 'Castlemaine', 'Dunmore', 'Eastbourne', 'Fairhaven', 'Glenrock', 'Harbourview',
+    'Ironbridge', 'Jasper', 'Kingsport', 'Lakeside', 'Millbrook', 'Northgate', 'Oakridge', 'Portsea',
+)
+MASCOTS = ('Strikers', 'Chargers', 'Titans', 'Falcons', 'Royals', 'Rangers', 'Warriors', 'Knights')
+FIRST_NAMES = (
+    'Aarav', 'Ben', 'Chris', 'Dev', 'Ethan', 'Faisal', 'Glenn', 'Hamish', 'Imran', 'Jos', 'Kane', 'Liam',
+    'Mitchell', 'Nathan', 'Omar', 'Pat', 'Quinton', 'Rashid', 'Sam', 'Tom', 'Usman', 'Virat', 'Wade', 'Yash',
+)
+LAST_NAMES = (
+    'Ahmed', 'Bairstow', 'Carey', 'Dhawan', 'Evans', 'Finch', 'Gill', 'Hussain', 'Iyer', 'Jordan', 'Khan',
+    'Lynn', 'Marsh', 'Nortje', 'Oram', 'Pandya', 'Rabada', 'Smith', 'Taylor', 'Umar', 'Vince', 'Warner',
+    'Young', 'Zampa',
+)
+# Batting order: five batsmen, a wicketkeeper, two all-rounders, three bowlers
+SQUAD_ROLES = ('Batsman',) * 5 + ('Wicketkeeper', 'All-Rounder', 'All-Rounder') + ('Bowler',) * 3
+BOWLERS_PER_SIDE = 5
+
+# Per legal delivery for an average batsman against an average bowler
+OUTCOME_RATES = {0: 0.34, 1: 0.37, 2: 0.08, 3: 0.005, 4: 0.11, 6: 0.045, 'wicket': 0.05}
+WIDE_RATE = 0.03
+NO_BALL_RATE = 0.005
+# (boundary, wicket) multipliers by phase
+PHASES = ((6, 1.15, 0.9), (15, 0.9, 1.0), (None, 1.35, 1.25))
+
+COMMENTARY = {
+    0: ("Dot ball.", "Defended back to {bowler}.", "Beaten outside off!"),
+    1: ("{batsman} works it for a single.", "Pushed into the gap for one."),
+    2: ("Two runs, well run.", "{batsman} pushes hard for the second."),
+    3: ("Three, the fielder cuts it off at the rope.",),
+    4: ("FOUR! {batsman} drives through the covers.", "FOUR! Pulled away off {bowler}."),
+    6: ("SIX! {batsman} launches {bowler} over long on.", "SIX! Into the stands at {venue}."),
+    'wicket': (
+        "WICKET! {batsman} is bowled by {bowler}.", "WICKET! {batsman} caught behind off {bowler}.",
+        "WICKET! {batsman} is caught in the deep.", "WICKET! {batsman} trapped lbw by {bowler}.",
+    ),
+    'wide': ("Wide, down the leg side.",),
+    'no_ball': ("No-ball, overstepped.",),
+}
+
+
+@dataclass
+class SquadPlayer:
+    name: str
+    role: str
+    batting: float # Skill multipliers around 1.0
+    bowling: float
+
+
+@dataclass
+class Squad:
+    name: str
+    venue: str
+    players: list = field(default_factory=list)
+
+    @property
+    def bowlers(self):
+        # The best bowlers, one over each in turn
+        return sorted(self.players, key=lambda player: -player.bowling)[:BOWLERS_PER_SIDE]
+
+
+def league_squads(teams, seed=0, players=11):
+    """
+    `teams` squads of `players` named players, best batsmen first.
+    """
+    rng = random.Random(f"{seed}:squads")
+    names = [f"{city} {mascot}" for mascot in MASCOTS for city in CITIES]
+    squads = []
+    for index in range(teams):
+        team = names[index] if index < len(names) else f"{names[index % len(names)]} {index // len(names) + 1}"
+        squad = Squad(team, f"{team.split()[0]} Stadium")
+        taken = set()
+        for position in range(players):
+            role = SQUAD_ROLES[position % len(SQUAD_ROLES)]
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            while name in taken:
+                name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            taken.add(name)
+            batting = rng.uniform(1.1, 1.4) if role in ('Batsman', 'Wicketkeeper') else rng.uniform(0.85, 1.1)
+            if role == 'Bowler':
+                batting = rng.uniform(0.5, 0.75)
+            bowling = rng.uniform(1.05, 1.35) if role in ('Bowler', 'All-Rounder') else rng.uniform(0.6, 0.8)
+            squad.players.append(SquadPlayer(name, role, batting, bowling))
+        squads.append(squad)
+    return squads
+
+
+def create_squads(squads):
+    """
+    Creates the squads' teams and players (with their roles) unless they exist.
+    """
+    created = False
+    for squad in squads:
+        team, _ = Team.objects.get_or_create(name=squad.name)
+        existing = set(team.players.values_list('name', flat=True))
+        created |= bool(Player.objects.bulk_create([
+            Player(team=team, name=player.name, role=player.role)
+            for player in squad.players if player.name not in existing
+        ]))
+    if created:
+        bump_model_version('player') # bulk_create skips the cached pages' version signal
+
+
+def _weights(batsman, bowler, over, overs):
+    for end, boundary, wicket in PHASES:
+        if end is None or over < end * overs / 20:
+            break
+    edge = batsman.batting / bowler.bowling
+    weights = dict(OUTCOME_RATES)
+    weights[4] *= boundary * edge
+    weights[6] *= boundary * edge * edge
+    weights['wicket'] *= wicket / edge
+    weights[0] = max(0.05, 1 - sum(weight for outcome, weight in weights.items() if outcome != 0))
+    return list(weights), list(weights.values())
+
+
+def play_innings(rng, batting, bowling, venue, overs, target=None):
+    """
+    Ball-by-ball deliveries of one innings, and its total.
+    """
+    deliveries, total, wickets = [], 0, 0
+    order = list(batting.players)
+    striker, non_striker, next_in = order[0], order[1], 2
+    bowlers = bowling.bowlers
+    for over in range(overs):
+        bowler = bowlers[over % len(bowlers)]
+        legal = 0
+        while legal < 6:
+            words = {'batsman': striker.name, 'bowler': bowler.name, 'venue': venue}
+            delivery = ingest.Delivery(
+                batting_team=batting.name, over=over + (legal + 1) / 10, batsman=striker.name, bowler=bowler.name,
+            )
+            extra = rng.random()
+            if extra < WIDE_RATE:
+                delivery.is_wide = True
+                delivery.commentary = rng.choice(COMMENTARY['wide']).format(**words)
+                total += 1
+            else:
+                outcomes, weights = _weights(striker, bowler, over, overs)
+                outcome = rng.choices(outcomes, weights)[0]
+                if extra < WIDE_RATE + NO_BALL_RATE:
+                    # No bowled or caught off a no-ball
+                    delivery.is_no_ball, outcome = True, 0 if outcome == 'wicket' else outcome
+                    total += 1
+                else:
+                    legal += 1
+                delivery.is_wicket = outcome == 'wicket'
+                delivery.runs = 0 if delivery.is_wicket else outcome
+                key = 'no_ball' if delivery.is_no_ball else outcome
+                delivery.commentary = rng.choice(COMMENTARY[key]).format(**words)
+                total += delivery.runs
+            deliveries.append(delivery)
+
+            if delivery.is_wicket:
+                wickets += 1
+                if wickets == len(order) - 1:
+                    return deliveries, total
+                striker, next_in = order[next_in], next_in + 1
+            elif delivery.runs % 2:
+                striker, non_striker = non_striker, striker
+            if target is not None and total >= target:
+                return deliveries, total
+        striker, non_striker = non_striker, striker
+    return deliveries, total
+
+
+def play_match(home, away, external_id, date, seed, overs=20):
+    """
+    A ScorecardMatch between two squads, the home side batting first on a coin toss.
+    """
+    rng = random.Random(f"{seed}:{external_id}")
+    first, second = (home, away) if rng.random() < 0.5 else (away, home)
+    match = ingest.ScorecardMatch(
+        external_id=external_id, date=date, venue=home.venue, team1=home.name, team2=away.name,
+        name=f"{home.name} v {away.name}",
+    )
+    deliveries, first_total = play_innings(rng, first, second, home.venue, overs)
+    chase, second_total = play_innings(rng, second, first, home.venue, overs, target=first_total + 1)
+    match.deliveries = deliveries + chase
+    if first_total != second_total:
+        match.winner = first.name if first_total > second_total else second.name
+    return match
+
+
+def league_matches(squads, seasons=1, seed=0, overs=20, start_year=2020):
+    """
+    ScorecardMatches of a double round-robin per season, one match day every
+    other day from 1 March, generated one at a time.
+    """
+    for season in range(seasons):
+        start = timezone.make_aware(datetime(start_year + season, 3, 1, 19, 30))
+        fixtures = [(home, away) for home in squads for away in squads if home is not away]
+        random.Random(f"{seed}:fixtures:{season}").shuffle(fixtures)
+        for number, (home, away) in enumerate(fixtures):
+            yield play_match(
+                home, away, f"synthetic:{seed}:{start_year + season}:{number + 1}",
+                start + timedelta(days=2 * number), seed, overs,
+            )
+
+
+def generate_league(teams=8, seasons=1, seed=0, overs=20, players=11, chunk_size=50, progress=None):
+    """
+    Creates a synthetic league and loads its matches through the scorecard
+    importer. Re-running with the same arguments adds nothing. Returns ImportStats.
+    """
+    squads = league_squads(teams, seed, players)
+    create_squads(squads)
+    return ingest.import_scorecards(
+        league_matches(squads, seasons, seed, overs), chunk_size=chunk_size, progress=progress,
+    )
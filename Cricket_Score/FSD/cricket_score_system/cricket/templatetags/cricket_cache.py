@@ -0,0 +1,52 @@
+# cricket/templatetags/cricket_cache.py
+
+from django import template
+from django.core.cache import cache
+
+from ..cache import FRAGMENT_MODELS, PAGE_CACHE_TTL, cache_metrics, model_versions, versioned_key
+
+register = template.Library()
+
+
+class CachedFragmentNode(template.Node):
+    def __init__(self, nodelist, name, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        labels = FRAGMENT_MODELS[name]
+        # Look the versions up once per page, not once per fragment
+        versions_key = ('cricket_cache.versions', labels)
+        if versions_key not in context.render_context:
+            context.render_context[versions_key] = model_versions(labels)
+        versions = context.render_context[versions_key]
+
+        key = versioned_key(
+            f"fragment:{name}", labels, *(var.resolve(context) for var in self.vary_on), versions=versions
+        )
+        content = cache.get(key)
+        cache_metrics.record(f"fragment:{name}", content is not None)
+        if content is None:
+            content = self.nodelist.render(context)
+            cache.set(key, content, PAGE_CACHE_TTL)
+        return content
+
+
+@register.tag('cached_fragment')
+def do_cached_fragment(parser, token):
+    """
+    Caches a block under the versions of the models it shows:
+
+        {% cached_fragment "match_card" match.pk %} ... {% endcached_fragment %}
+
+    The name must be listed in cricket.cache.FRAGMENT_MODELS; the remaining
+    arguments tell apart the copies of the fragment (usually an object id).
+    """
+    nodelist = parser.parse(('endcached_fragment',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' needs a fragment name.")
+    return CachedFragmentNode(nodelist, parser.compile_filter(bits[1]), [parser.compile_filter(bit) for bit in bits[2:]])
@@ -0,0 +1,35 @@
+# cricket/templatetags/cricket_images.py
+
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+register = template.Library()
+
+
+def _srcset(entries):
+    return ', '.join(f"{default_storage.url(name)} {width}w" for width, name in entries)
+
+
+@register.simple_tag
+def picture(image, renditions, sizes, **attrs):
+    """
+    An image as <picture> with WebP and fallback srcsets from its renditions
+    (cricket/renditions.py), so the browser picks the smallest file that
+    fills `sizes`:
+
+        {% picture team.logo team.logo_renditions "96px" alt=team.name class="w-full" %}
+
+    Until the renditions of the current image exist, the original is used.
+    """
+    attributes = format_html_join(' ', '{}="{}"', sorted(attrs.items()))
+    if not renditions or renditions.get('source') != image.name:
+        return format_html('<img src="{}" {} loading="lazy">', image.url, attributes)
+    fallback = renditions['fallback']
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" {} loading="lazy" decoding="async"></picture>',
+        _srcset(renditions['webp']), sizes,
+        default_storage.url(fallback[-1][1]), _srcset(fallback), sizes,
+        renditions['width'], renditions['height'], attributes,
+    )
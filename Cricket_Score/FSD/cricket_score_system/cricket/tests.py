@@ -1,3 +1,1689 @@
-from django.test import TestCase
+import asyncio
+import contextvars
+import io
+import json
+import os
+import tempfile
+import time
+from dataclasses import asdict, replace
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from cricket_score_system import databases
+from . import (
+    ballstore, benchmarks, career, graphs, ingest, innings, instrumentation, leaderboards, live, matchups, prediction,
+    renditions, rollup, routers, search, simulation, synthetic,
+)
+from .cache import cache_metrics
+from .pagination import InvalidCursor, KeysetPaginator, decode_cursor
+from .models import (
+    Team, Player, Match, Ball, InningsScore, PlayerMatchPerformance, PlayerCareerStats,
+    BatsmanBowlerMatchup, TeamMatchup, BallChange,
+)
+
+
+class CricketTestData:
+    """
+    Two teams, a batsman and a bowler each, and one live match.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.mavericks = Team.objects.create(name="Mavericks")
+        cls.hurricanes = Team.objects.create(name="Hurricanes")
+        cls.pandey = Player.objects.create(name="Pandey", team=cls.mavericks, role='Batsman')
+        cls.harshit = Player.objects.create(name="Harshit", team=cls.mavericks, role='Bowler')
+        cls.aman = Player.objects.create(name="Aman", team=cls.hurricanes, role='Batsman')
+        cls.maheesh = Player.objects.create(name="Maheesh", team=cls.hurricanes, role='Bowler')
+        cls.match = Match.objects.create(
+            name="League Cup Final", team1=cls.mavericks, team2=cls.hurricanes,
+            date=timezone.now() - timedelta(days=1), venue="Arena Oval", status='Live',
+        )
+
+    def bowl(self, over, runs=0, batsman=None, bowler=None, match=None, **flags):
+        return Ball.objects.create(
+            match=match or self.match, over=over,
+            batsman=batsman or self.pandey, bowler=bowler or self.maheesh,
+            runs=runs, **flags
+        )
+
+
+class InningsEngineTests(CricketTestData, TestCase):
+
+    def test_balls_are_folded_into_running_totals(self):
+        self.bowl(0.1, runs=4)
+        self.bowl(0.2, is_wide=True)
+        self.bowl(0.2, runs=1, is_no_ball=True)
+        self.bowl(0.3, is_wicket=True)
+        self.bowl(1.1, runs=6)
+
+        state = InningsScore.objects.get(match=self.match, batting_team=self.mavericks)
+        self.assertEqual(state.runs, 4 + 1 + 2 + 6)
+        self.assertEqual(state.wickets, 1)
+        self.assertEqual(state.legal_balls, 3)
+        self.assertEqual(state.extras, 2)
+        self.assertEqual(state.over_runs, [7, 6])
+        self.assertEqual(state.over_wickets, [1, 0])
+        self.assertEqual(str(state), "13/1 (0.3 ov)")
+
+    def test_innings_are_tracked_per_batting_side(self):
+        self.bowl(0.1, runs=2)
+        self.bowl(0.1, runs=3, batsman=self.aman, bowler=self.harshit)
+
+        snapshot = innings.match_snapshot(self.match)
+        self.assertEqual(snapshot['team1_score'], "2/0 (0.1 ov)")
+        self.assertEqual(snapshot['team2_score'], "3/0 (0.1 ov)")
+
+    def test_editing_a_ball_rebuilds_the_match(self):
+        first = self.bowl(0.1, runs=4)
+        self.bowl(0.2, runs=1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.runs = 6
+            first.save()
+        self.assertEqual(InningsScore.objects.get(match=self.match).runs, 7)
+
+    def test_deleting_balls_rebuilds_the_match_once(self):
+        self.bowl(0.1, runs=6)
+        self.bowl(0.2, runs=1)
+        self.bowl(0.3, runs=2)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Ball.objects.filter(sequence__gt=1).delete()
+        rebuilds = [callback for callback in callbacks if hasattr(callback, 'rebuild_match_id')]
+        self.assertEqual(len(rebuilds), 1)
+        state = InningsScore.objects.get(match=self.match)
+        self.assertEqual((state.runs, state.legal_balls), (6, 1))
+
+    def test_rebuild_matches_incremental_state(self):
+        for over, runs in ((0.1, 1), (0.2, 0), (0.3, 4), (1.1, 2)):
+            self.bowl(over, runs=runs)
+        incremental = InningsScore.objects.get(match=self.match)
+
+        rebuilt, = innings.rebuild_match(self.match.pk)
+        self.assertEqual(
+            (rebuilt.runs, rebuilt.legal_balls, rebuilt.over_runs),
+            (incremental.runs, incremental.legal_balls, incremental.over_runs),
+        )
+
+    def test_deliveries_are_numbered_per_match(self):
+        first = self.bowl(0.1, runs=1)
+        wide = self.bowl(0.2, is_wide=True)
+        chase = self.bowl(0.1, batsman=self.aman, bowler=self.harshit)
+        late = self.bowl(0.2, runs=2)
+
+        self.assertEqual([ball.sequence for ball in (first, wide, chase, late)], [1, 2, 3, 4])
+        self.assertEqual([ball.innings for ball in (first, wide, chase, late)], [1, 1, 2, 1])
+        self.assertEqual((wide.over_number, wide.ball_in_over, wide.over), (0, 2, 0.2))
+        other = Match.objects.create(team1=self.mavericks, team2=self.hurricanes, date=timezone.now())
+        self.assertEqual(self.bowl(0.1, match=other).sequence, 1)
+
+    def test_sequence_is_unique_per_match(self):
+        from django.db import IntegrityError
+
+        ball = self.bowl(0.1)
+        with self.assertRaises(IntegrityError):
+            Ball.objects.create(match=self.match, sequence=ball.sequence, over=0.2, batsman=self.pandey, bowler=self.maheesh)
+
+    def test_match_detail_reads_snapshot(self):
+        self.bowl(0.1, runs=4)
+        response = self.client.get(reverse('match_detail', args=[self.match.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['team1_score'], "4/0 (0.1 ov)")
+        self.assertEqual(response.context['team2_score'], "Yet to bat")
+
+
+class LiveUpdateApiTests(CricketTestData, TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def poll(self, since=0, etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        url = reverse('api_match_update', args=[self.match.pk])
+        return self.client.get(url, {'since': since}, headers=headers)
+
+    def test_returns_only_balls_after_cursor(self):
+        first = self.bowl(0.1, runs=1, commentary="Quick single.")
+        with self.captureOnCommitCallbacks(execute=True):
+            second = self.bowl(0.2, runs=4, commentary="FOUR!")
+
+        data = self.poll(since=first.sequence).json()
+        self.assertEqual([ball['id'] for ball in data['new_balls']], [second.pk])
+        self.assertEqual(data['new_balls'][0]['commentary'], "FOUR!")
+        self.assertEqual(data['cursor'], second.sequence)
+        self.assertEqual(data['team1_score'], "5/0 (0.2 ov)")
+
+    def test_unchanged_poll_is_a_304_without_queries(self):
+        self.bowl(0.1, runs=1)
+        etag = self.poll()['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.poll(etag=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_new_ball_changes_etag(self):
+        etag = self.poll()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bowl(0.1, runs=6)
+
+        response = self.poll(etag=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['new_balls']), 1)
+
+    def test_unknown_match_and_bad_cursor(self):
+        missing = self.client.get(reverse('api_match_update', args=[999]))
+        self.assertEqual(missing.status_code, 404)
+        self.assertEqual(self.poll(since='abc').status_code, 400)
+
+
+class CommentaryFeedTests(CricketTestData, TestCase):
+
+    def setUp(self):
+        # Five overs of Pandey facing Maheesh, a wide in the fourth, then Aman facing Harshit
+        for over in range(4):
+            for ball in range(1, 7):
+                self.bowl(over + ball / 10, runs=ball % 3, commentary=f"Ball {over}.{ball}")
+                if (over, ball) == (3, 2):
+                    self.bowl(3.3, is_wide=True, commentary="Wide")
+        for ball in range(1, 4):
+            self.bowl(ball / 10, batsman=self.aman, bowler=self.harshit, commentary=f"Chase 0.{ball}")
+
+    def fetch(self, **params):
+        response = self.client.get(reverse('api_match_commentary', args=[self.match.pk]), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_are_whole_overs_newest_first(self):
+        first = self.fetch()
+        self.assertEqual([ball['commentary'] for ball in first['balls']][:4], ["Chase 0.3", "Chase 0.2", "Chase 0.1", "Ball 3.6"])
+        self.assertEqual(len(first['balls']), 3 + 7) # The chase's first over and the fourth over, wide included
+        self.assertEqual(first['balls'][0]['batsman_name'], "Aman")
+
+        seen = first['balls']
+        page = first
+        while page['has_more']:
+            with self.assertNumQueries(3): # Match check, deliveries, player names
+                page = self.fetch(before=page['next_before'], overs=1)
+            seen += page['balls']
+        self.assertIsNone(page['next_before'])
+        self.assertEqual([ball['sequence'] for ball in seen], list(range(28, 0, -1)))
+
+    def test_match_detail_renders_only_the_latest_overs(self):
+        response = self.client.get(reverse('match_detail', args=[self.match.pk]))
+        self.assertContains(response, "Chase 0.1")
+        self.assertContains(response, "Ball 3.1")
+        self.assertNotContains(response, "Ball 2.6")
+        self.assertEqual(response.context['cursor'], 28)
+        self.assertContains(response, f'data-older-before="{response.context["older_before"]}"')
+        self.assertContains(response, "Load older overs")
+
+    def test_bad_requests(self):
+        url = reverse('api_match_commentary', args=[self.match.pk])
+        self.assertEqual(self.client.get(url, {'before': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_match_commentary', args=[999])).status_code, 404)
+        self.assertEqual(self.fetch(before=1), {'success': True, 'match_id': self.match.pk, 'balls': [], 'next_before': None, 'has_more': False})
+
+
+class LiveBroadcastTests(CricketTestData, TestCase):
+
+    def setUp(self):
+        live.reset_broadcaster()
+        self.addCleanup(live.reset_broadcaster)
+
+    def test_saved_ball_is_published_once_per_match(self):
+        received = []
+        backend = live.get_broadcaster().backend
+        backend.subscribe(live.channel_name(self.match.pk), received.append)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ball = self.bowl(0.1, runs=4, commentary="FOUR!")
+
+        event = json.loads(received[-1])
+        self.assertEqual(event['type'], 'ball')
+        self.assertEqual(event['new_balls'][0]['id'], ball.pk)
+        self.assertEqual(event['team1_score'], "4/0 (0.1 ov)")
+
+    def test_one_subscription_fans_out_to_every_viewer(self):
+        broadcaster = live.Broadcaster(live.LocalBackend())
+
+        async def scenario():
+            viewers = [broadcaster.listen(self.match.pk) for _ in range(3)]
+            # Start each listener so it registers its queue
+            pending = [asyncio.ensure_future(viewer.__anext__()) for viewer in viewers]
+            await asyncio.sleep(0)
+            self.assertEqual(len(broadcaster.backend._listeners[live.channel_name(self.match.pk)]), 1)
+            self.assertEqual(broadcaster.viewer_count(self.match.pk), 3)
+
+            broadcaster.publish(self.match.pk, {'type': 'ball'})
+            messages = await asyncio.gather(*pending)
+            for viewer in viewers:
+                await viewer.aclose()
+            return messages
+
+        messages = asyncio.run(scenario())
+        self.assertEqual([json.loads(message) for message in messages], [{'type': 'ball'}] * 3)
+        self.assertEqual(broadcaster.viewer_count(self.match.pk), 0)
+        self.assertEqual(broadcaster.backend._listeners, {})
+
+    def test_stream_requires_asgi(self):
+        response = self.client.get(reverse('api_match_stream', args=[self.match.pk]))
+        self.assertEqual(response.status_code, 503)
+
+
+class CareerStatsTests(CricketTestData, TestCase):
+
+    def perform(self, player, match=None, **figures):
+        return PlayerMatchPerformance.objects.create(player=player, match=match or self.match, **figures)
+
+    def career(self, player):
+        return PlayerCareerStats.objects.get(player=player)
+
+    def test_totals_follow_create_update_and_delete(self):
+        first = self.perform(self.pandey, runs_scored=30, balls_faced=20, is_out=True)
+        other_match = Match.objects.create(
+            team1=self.mavericks, team2=self.hurricanes, date=timezone.now(), venue="Coastal Stadium",
+        )
+        self.perform(self.pandey, match=other_match, runs_scored=10, balls_faced=5)
+        self.assertEqual((self.career(self.pandey).matches, self.career(self.pandey).runs), (2, 40))
+
+        first.runs_scored = 50
+        first.save()
+        career = self.career(self.pandey)
+        self.assertEqual((career.runs, career.balls_faced, career.dismissals), (60, 25, 1))
+        self.assertEqual(career.strike_rate, 240.0)
+        self.assertEqual(career.batting_average, 60.0)
+
+        first.delete()
+        career = self.career(self.pandey)
+        self.assertEqual((career.matches, career.runs, career.dismissals), (1, 10, 0))
+        self.assertIsNone(career.batting_average)
+
+    def test_deleting_players_and_teams_with_performances(self):
+        self.perform(self.pandey, runs_scored=30, balls_faced=20, is_out=True)
+        innings = self.perform(self.aman, runs_scored=12, balls_faced=9)
+        # Whichever the cascade deletes first, a performance removed after its career row leaves no row
+        PlayerCareerStats.objects.filter(player=self.aman).delete()
+        innings.delete()
+        self.assertFalse(PlayerCareerStats.objects.filter(player=self.aman).exists())
+        self.perform(self.aman, runs_scored=12, balls_faced=9)
+
+        self.pandey.delete()
+        self.assertFalse(PlayerCareerStats.objects.filter(player_id=self.pandey.pk).exists())
+        self.hurricanes.delete()
+        self.assertFalse(PlayerCareerStats.objects.exists())
+
+    def test_bowling_figures_use_balls_not_decimal_overs(self):
+        self.perform(self.maheesh, overs_bowled=3.4, runs_conceded=22, wickets_taken=2)
+        career = self.career(self.maheesh)
+        self.assertEqual(career.balls_bowled, 22)
+        self.assertEqual(career.overs_bowled, 3.4)
+        self.assertEqual(career.economy, 6.0)
+        self.assertEqual(career.bowling_average, 11.0)
+
+    def test_rebuild_matches_incremental_totals(self):
+        self.perform(self.pandey, runs_scored=12, balls_faced=8, is_out=True)
+        self.perform(self.maheesh, overs_bowled=2.0, runs_conceded=15, wickets_taken=1)
+        expected = {stats.player_id: stats for stats in PlayerCareerStats.objects.all()}
+
+        self.assertEqual(career.rebuild_career_stats(), 2)
+        for stats in PlayerCareerStats.objects.all():
+            for field in career.CAREER_FIELDS:
+                self.assertEqual(getattr(stats, field), getattr(expected[stats.player_id], field))
+
+    def test_player_changelist_reads_career_rows(self):
+        from django.contrib.auth.models import User
+
+        self.perform(self.pandey, runs_scored=12)
+        self.perform(self.aman, runs_scored=7)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        url = reverse('admin:cricket_player_changelist')
+        self.client.get(url) # Warm up session and content types
+
+        # Session, user, team filter, one count and one joined page query: none per row
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        self.assertContains(response, '<td class="field-get_total_runs">12</td>', html=True)
+
+
+class RollupTests(CricketTestData, TestCase):
+
+    def bowl_over(self):
+        self.bowl(0.1, runs=6)
+        self.bowl(0.2, is_wide=True)
+        self.bowl(0.2, runs=4, is_no_ball=True)
+        self.bowl(0.3, is_wicket=True)
+        self.bowl(0.4, runs=1, batsman=self.harshit)
+
+    def test_performances_are_derived_from_balls(self):
+        self.bowl_over()
+        rollup.rollup_match(self.match.pk)
+
+        pandey = PlayerMatchPerformance.objects.get(player=self.pandey, match=self.match)
+        self.assertEqual((pandey.runs_scored, pandey.balls_faced, pandey.is_out), (10, 3, True))
+        maheesh = PlayerMatchPerformance.objects.get(player=self.maheesh, match=self.match)
+        self.assertEqual((maheesh.wickets_taken, maheesh.runs_conceded, maheesh.overs_bowled), (1, 13, 0.3))
+        self.assertEqual(self.match.player_performances.count(), 3)
+        self.assertEqual(PlayerCareerStats.objects.get(player=self.maheesh).balls_bowled, 3)
+
+    def test_rerun_updates_in_place_and_drops_players_without_balls(self):
+        self.bowl_over()
+        rollup.rollup_match(self.match.pk)
+        Ball.objects.filter(batsman=self.harshit).delete()
+        self.bowl(0.4, runs=2)
+
+        # Match dates, existing rows, the ball stream, then savepoints around delete/create/update
+        with self.assertNumQueries(9):
+            rollup.rollup_matches([self.match.pk])
+        self.assertFalse(PlayerMatchPerformance.objects.filter(player=self.harshit).exists())
+        self.assertEqual(PlayerMatchPerformance.objects.get(player=self.pandey).runs_scored, 12)
+
+    def test_completing_a_match_rolls_it_up(self):
+        self.bowl_over()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.match.status = 'Completed'
+            self.match.save()
+        self.assertEqual(self.match.player_performances.count(), 3)
+
+    def test_backfill_processes_matches_in_chunks(self):
+        self.bowl_over()
+        other = Match.objects.create(team1=self.hurricanes, team2=self.mavericks, date=timezone.now(), venue="Arena Oval")
+        self.bowl(0.1, runs=3, batsman=self.aman, bowler=self.harshit, match=other)
+
+        chunks = []
+        self.assertEqual(rollup.backfill(chunk_size=1, progress=lambda done, total: chunks.append(done)), 2)
+        self.assertEqual(chunks, [1, 2])
+        self.assertEqual(PlayerCareerStats.objects.get(player=self.harshit).runs_conceded, 3)
+
+
+class KeysetPaginationTests(CricketTestData, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Two matches share each date, so the id tie-breaker matters
+        day = timezone.now().replace(microsecond=0)
+        for index in range(7):
+            Match.objects.create(
+                team1=cls.mavericks, team2=cls.hurricanes, venue="Eden Park" if index % 2 else "Arena Oval",
+                date=day - timedelta(days=index // 2), status='Completed',
+            )
+
+    def ids(self, page):
+        return [match.pk for match in page]
+
+    def test_pages_walk_forwards_and_back_without_gaps(self):
+        everything = list(Match.objects.order_by('-date', '-id').values_list('id', flat=True))
+        paginator = KeysetPaginator(Match.objects.all(), per_page=3)
+
+        seen, page = [], paginator.page()
+        self.assertFalse(page.has_previous)
+        pages = [page]
+        while True:
+            seen += self.ids(page)
+            if not page.has_next:
+                break
+            page = paginator.page(page.next_cursor)
+            pages.append(page)
+        self.assertEqual(seen, everything)
+
+        back = paginator.page(pages[-1].previous_cursor)
+        self.assertEqual(self.ids(back), self.ids(pages[-2]))
+        self.assertEqual(self.ids(paginator.page(back.next_cursor)), self.ids(pages[-1]))
+
+    def test_bad_cursor_is_rejected(self):
+        with self.assertRaises(InvalidCursor):
+            decode_cursor("not-a-cursor")
+        response = self.client.get(reverse('all_matches'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_json_match_list_filters_and_pages(self):
+        url = reverse('api_match_list')
+        first = self.client.get(url, {'venue': 'Eden Park', 'page_size': 2}).json()
+        second = self.client.get(url, {'venue': 'Eden Park', 'page_size': 2, 'cursor': first['next_cursor']}).json()
+        venues = {match['venue'] for match in first['results'] + second['results']}
+        self.assertEqual(venues, {'Eden Park'})
+        self.assertEqual(len(first['results'] + second['results']), 3)
+        self.assertIsNone(second['next_cursor'])
+
+        self.assertEqual(self.client.get(url, {'status': 'Abandoned'}).status_code, 400)
+        today = timezone.now().date().isoformat()
+        self.assertEqual(len(self.client.get(url, {'from': today, 'to': today}).json()['results']), 2)
+
+    def test_player_history_pages_by_match_date(self):
+        for match in Match.objects.exclude(pk=self.match.pk):
+            PlayerMatchPerformance.objects.create(player=self.pandey, match=match, runs_scored=match.pk)
+        url = reverse('api_player_matches', args=[self.pandey.pk])
+        first = self.client.get(url, {'page_size': 4}).json()
+        second = self.client.get(url, {'page_size': 4, 'cursor': first['next_cursor']}).json()
+        dates = [row['match']['date'] for row in first['results'] + second['results']]
+        self.assertEqual(len(dates), 7)
+        self.assertEqual(dates, sorted(dates, reverse=True))
+
+        response = self.client.get(reverse('player_full_match_history', args=[self.pandey.pk]), {'page_size': 4})
+        self.assertEqual(len(response.context['all_player_matches']), 4)
+        self.assertTrue(response.context['page'].has_next)
+
+
+class HotPathIndexTests(CricketTestData, TestCase):
+
+    def test_performance_copies_and_follows_the_match_date(self):
+        performance = PlayerMatchPerformance.objects.create(player=self.pandey, match=self.match, runs_scored=10)
+        self.assertEqual(performance.match_date, self.match.date)
+
+        self.match.date -= timedelta(days=3)
+        self.match.save()
+        performance.refresh_from_db()
+        self.assertEqual(performance.match_date, self.match.date)
+
+    def test_rollup_fills_in_the_match_date(self):
+        self.bowl(0.1, runs=4)
+        rollup.rollup_match(self.match.pk)
+        dates = set(PlayerMatchPerformance.objects.values_list('match_date', flat=True))
+        self.assertEqual(dates, {self.match.date})
+
+    def test_scan_detection(self):
+        from .management.commands.explain_queries import table_scans
+
+        self.assertEqual(table_scans("SCAN cricket_match", 'sqlite'), ['cricket_match'])
+        self.assertEqual(table_scans("SCAN cricket_match USING INDEX match_date_id_idx", 'sqlite'), [])
+        self.assertEqual(table_scans("SEARCH cricket_ball USING INDEX ball_match_over_idx (match_id=?)", 'sqlite'), [])
+        self.assertEqual(table_scans("Limit\n  ->  Seq Scan on cricket_match", 'postgresql'), ['cricket_match'])
+
+    def test_core_queries_use_indexes(self):
+        # Raises CommandError if any hot query falls back to a table scan
+        call_command('explain_queries', fail_on_scan=True, stdout=open(os.devnull, 'w'))
+
+
+class ScorecardImportTests(TestCase):
+
+    CSV = (
+        "match_id,date,venue,team1,team2,winner,name,batting_team,over,batsman,bowler,runs,wide,no_ball,wicket,commentary\n"
+        "m1,2024-04-01,Arena Oval,Mavericks,Hurricanes,Mavericks,,Mavericks,0.1,Pandey,Maheesh,4,,,,Four!\n"
+        "m1,2024-04-01,Arena Oval,Mavericks,Hurricanes,Mavericks,,Mavericks,0.2,Pandey,Maheesh,0,1,,,\n"
+        "m1,2024-04-01,Arena Oval,Mavericks,Hurricanes,Mavericks,,Mavericks,0.2,Pandey,Maheesh,0,,,1,Bowled\n"
+        "m1,2024-04-01,Arena Oval,Mavericks,Hurricanes,Mavericks,,Hurricanes,0.1,Aman,Harshit,2,,,,\n"
+        "m2,2024-04-08,Eden Park,Hurricanes,Mavericks,,Qualifier,Hurricanes,0.1,Aman,Harshit,6,,,,\n"
+    )
+    CRICSHEET = {
+        'info': {
+            'teams': ['Mavericks', 'Hurricanes'], 'dates': ['2024-05-01'], 'venue': 'Arena Oval',
+            'outcome': {'winner': 'Hurricanes'}, 'event': {'name': 'League Cup', 'match_number': 3},
+        },
+        'innings': [{'team': 'Hurricanes', 'overs': [{'over': 0, 'deliveries': [
+            {'batter': 'Aman', 'bowler': 'Harshit', 'runs': {'batter': 1, 'extras': 0, 'total': 1}},
+            {'batter': 'Aman', 'bowler': 'Harshit', 'runs': {'batter': 0, 'extras': 1, 'total': 1}, 'extras': {'wides': 1}},
+            {'batter': 'Aman', 'bowler': 'Harshit', 'runs': {'batter': 0, 'extras': 0, 'total': 0},
+             'wickets': [{'kind': 'bowled', 'player_out': 'Aman'}]},
+        ]}]}],
+    }
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write(content if isinstance(content, str) else json.dumps(content))
+        return path
+
+    def test_csv_import_builds_matches_innings_and_performances(self):
+        path = self.write('season.csv', self.CSV)
+        stats = ingest.import_scorecards(ingest.read_scorecards([path]), chunk_size=1)
+
+        self.assertEqual((stats.matches, stats.balls, stats.skipped), (2, 5, 0))
+        self.assertEqual(Team.objects.count(), 2)
+        self.assertEqual(Player.objects.count(), 4) # Identity map: each name created once
+        match = Match.objects.get(external_id='m1')
+        self.assertEqual((match.status, match.winner.name), ('Completed', 'Mavericks'))
+
+        imported = {state.batting_team_id: str(state) for state in match.innings_scores.all()}
+        rebuilt = {state.batting_team_id: str(state) for state in innings.rebuild_match(match.pk)}
+        self.assertEqual(imported, rebuilt)
+        self.assertEqual(PlayerCareerStats.objects.get(player__name='Aman').runs, 8)
+
+    def test_failed_chunk_leaves_no_identities_behind(self):
+        chunk = list(ingest.read_scorecards([self.write('season.csv', self.CSV)]))[:1]
+        identities = ingest.IdentityMap()
+        with mock.patch.object(ingest.rollup, 'rollup_matches', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                ingest.import_chunk(chunk, identities)
+        # The teams and players it created were rolled back, so their ids must not be reused
+        self.assertEqual((identities.teams, identities.players, Team.objects.count()), ({}, {}, 0))
+
+        self.assertEqual(ingest.import_chunk(chunk, identities)[0], 1)
+        self.assertEqual(sorted(identities.teams.values()), sorted(Team.objects.values_list('pk', flat=True)))
+        self.assertEqual(len(identities.players), Player.objects.count())
+
+    def test_reimport_skips_existing_matches(self):
+        path = self.write('season.csv', self.CSV)
+        ingest.import_scorecards(ingest.read_scorecards([path]))
+        stats = ingest.import_scorecards(ingest.read_scorecards([path]))
+        self.assertEqual((stats.matches, stats.skipped), (0, 2))
+        self.assertEqual(Ball.objects.count(), 5)
+
+        stats = ingest.import_scorecards(ingest.read_scorecards([path]), replace=True)
+        self.assertEqual(stats.matches, 2)
+        self.assertEqual(Ball.objects.count(), 5)
+        self.assertEqual(PlayerCareerStats.objects.get(player__name='Aman').runs, 8)
+
+    def test_cricsheet_json(self):
+        self.write('1234.json', self.CRICSHEET)
+        call_command('import_scorecards', self.directory.name, stdout=open(os.devnull, 'w'))
+
+        match = Match.objects.get(external_id='cricsheet:1234')
+        self.assertEqual(match.name, 'League Cup, Match 3')
+        balls = match.balls.order_by('sequence').values_list('sequence', 'over_number', 'ball_in_over', 'is_wide', 'is_wicket')
+        self.assertEqual(list(balls), [(1, 0, 1, False, False), (2, 0, 2, True, False), (3, 0, 2, False, True)])
+        self.assertEqual(str(match.innings_scores.get()), "2/1 (0.2 ov)")
+
+    def test_bad_rows_are_reported_with_their_line(self):
+        path = self.write('bad.csv', self.CSV.replace(',0.2,Pandey', ',two,Pandey', 1))
+        with self.assertRaisesMessage(ingest.ScorecardError, 'bad.csv:3'):
+            list(ingest.read_scorecards([path]))
+
+
+class PredictionTests(CricketTestData, TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.model_file = os.path.join(directory.name, 'model.npz')
+        settings = override_settings(CRICKET_PREDICTION_MODEL=self.model_file)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        prediction.reset_model()
+        self.addCleanup(prediction.reset_model)
+
+    def test_prior_model_is_sensible(self):
+        model = prediction.get_model()
+        projected, first_wins = model.evaluate((0, 0, 0))
+        self.assertAlmostEqual(projected, 156, delta=1)
+        self.assertAlmostEqual(first_wins, 0.5, delta=0.1)
+        # Chasing 160: cruising at 150/1 after 17 overs, hopeless at 100/9
+        self.assertLess(model.evaluate((159, 120, 5), (150, 102, 1))[1], 0.1)
+        self.assertGreater(model.evaluate((159, 120, 5), (100, 102, 9))[1], 0.95)
+        self.assertEqual(model.evaluate((159, 120, 5), (160, 90, 3))[1], 0.0)
+
+    def test_tables_evaluate_whole_batches(self):
+        model = prediction.get_model()
+        balls = prediction.np.arange(0, 121, 6)
+        totals = model.projected_total(50, balls, 2)
+        self.assertEqual(totals.shape, balls.shape)
+        self.assertTrue((prediction.np.diff(totals) <= 0).all()) # Fewer balls left, fewer runs to come
+
+    def test_fit_save_and_lazy_reload(self):
+        self.match.status = 'Completed'
+        self.match.save()
+        for ball in range(1, 121):
+            self.bowl(ball // 6 + (ball % 6) / 10, runs=2) # A steady 240 all run in twos
+
+        call_command('fit_prediction_model', stdout=open(os.devnull, 'w'))
+        self.assertTrue(os.path.exists(self.model_file))
+        fitted = prediction.get_model()
+        self.assertEqual(fitted.samples[0, 0], 1)
+        self.assertGreater(fitted.evaluate((0, 0, 0))[0], prediction.PredictionModel.prior().evaluate((0, 0, 0))[0])
+        self.assertIs(prediction.get_model(), fitted) # Cached until the file changes
+
+    def test_evaluation_is_fast(self):
+        model = prediction.get_model()
+        started = time.perf_counter()
+        for ball in range(1000):
+            model.evaluate((170, 120, 6), (ball % 150, ball % 120, ball % 10))
+        self.assertLess((time.perf_counter() - started) / 1000, 0.001)
+
+    def test_live_update_carries_predictions(self):
+        self.bowl(0.1, runs=4)
+        data = self.client.get(reverse('api_match_update', args=[self.match.pk])).json()
+        self.assertAlmostEqual(data['team1_win_prob'] + data['team2_win_prob'], 100, places=1)
+        self.assertGreater(data['predicted_score'], 100)
+
+
+@override_settings(CRICKET_SIMULATION_WORKERS=1)
+class SimulationTests(CricketTestData, TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def prior_cdf(self):
+        return simulation.matchup_cdf(simulation._smoothed([0] * 9), simulation._smoothed([0] * 9))
+
+    def test_innings_end_on_balls_wickets_or_target(self):
+        rng = simulation.np.random.default_rng(7)
+        cdf = self.prior_cdf()
+        totals = simulation.simulate_innings(rng, 2000, (0, 0, 0), cdf, cdf)
+        self.assertAlmostEqual(totals.mean(), 150, delta=30)
+
+        self.assertTrue((simulation.simulate_innings(rng, 100, (80, 120, 4), cdf, cdf) == 80).all())
+        chased = simulation.simulate_innings(rng, 2000, (100, 60, 2), cdf, cdf, target=110)
+        self.assertLessEqual(chased.max(), 115) # Stops on the ball that reaches the target
+        self.assertTrue((simulation.simulate_innings(rng, 10, (120, 60, 2), cdf, cdf, target=110) == 120).all())
+
+    def test_simulation_endpoint_reports_bands_and_caches(self):
+        for over in (0.1, 0.2, 0.3):
+            self.bowl(over, runs=4)
+        url = reverse('api_match_simulation', args=[self.match.pk])
+        data = self.client.get(url, {'n': 5000}).json()
+
+        self.assertEqual(data['simulations'], 5000)
+        self.assertAlmostEqual(data['team1_win_prob'] + data['team2_win_prob'] + data['tie_prob'], 100, places=1)
+        low, high = data['team1_win_interval']
+        self.assertLessEqual(low, data['team1_win_prob'])
+        self.assertGreaterEqual(high, data['team1_win_prob'])
+        self.assertGreaterEqual(data['first_innings']['percentiles']['p5'], 12)
+        self.assertEqual(data['first_innings']['batting_team_id'], self.mavericks.pk)
+
+        with self.assertNumQueries(2): # Match and innings only; the summary comes from the cache
+            self.assertEqual(self.client.get(url, {'n': 5000}).json(), data)
+
+    def test_requested_counts_share_cached_runs(self):
+        self.assertEqual(simulation.simulation_count(1), 1000)
+        self.assertEqual(simulation.simulation_count(5001), 20_000)
+        self.assertEqual(simulation.simulation_count(10 ** 9), simulation.MAX_SIMULATIONS)
+
+        self.bowl(0.1, runs=4)
+        url = reverse('api_match_simulation', args=[self.match.pk])
+        data = self.client.get(url, {'n': 3001}).json()
+        self.assertEqual(data['simulations'], 5000)
+        for n in (3002, 4999, 5000):
+            with self.assertNumQueries(2): # Match and innings only: no new run
+                self.assertEqual(self.client.get(url, {'n': n}).json(), data)
+
+    def test_hopeless_chase(self):
+        for over in (0.1, 0.2):
+            self.bowl(over, runs=6)
+        self.bowl(0.1, batsman=self.aman, bowler=self.harshit, is_wicket=True)
+        InningsScore.objects.filter(batting_team=self.hurricanes).update(wickets=9, legal_balls=119)
+        data = self.client.get(reverse('api_match_simulation', args=[self.match.pk]), {'n': 2000}).json()
+        self.assertGreater(data['team1_win_prob'], 95)
+
+    def test_completed_match_is_not_simulated(self):
+        self.match.status = 'Completed'
+        self.match.save()
+        self.assertEqual(self.client.get(reverse('api_match_simulation', args=[self.match.pk])).status_code, 409)
+
+    @override_settings(CRICKET_SIMULATION_WORKERS=2)
+    def test_pool_splits_the_work(self):
+        plan = simulation.build_plan(self.match, innings.match_snapshot(self.match))
+        first, second = simulation.run_simulations(plan, simulation.MIN_PARALLEL_SIMULATIONS + 1, seed=1)
+        self.assertEqual(len(first), simulation.MIN_PARALLEL_SIMULATIONS + 1)
+        self.assertEqual(len(second), len(first))
+
+
+class PageCacheTests(CricketTestData, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        cache_metrics.reset()
+
+    def test_pages_are_served_from_cache_until_a_model_changes(self):
+        url = reverse('team_detail', args=[self.mavericks.pk])
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertContains(response, "Pandey")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Player.objects.create(name="Rinku", team=self.mavericks)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, "Rinku")
+        self.assertEqual(cache_metrics.snapshot()['page:team_detail'], {'hits': 1, 'misses': 2})
+
+    def test_bulk_imports_move_the_versions(self):
+        self.assertEqual(self.client.get(reverse('home'))['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(reverse('home'))['X-Cache'], 'HIT')
+        scorecard = ingest.ScorecardMatch(
+            external_id='final-replay', date=timezone.now() - timedelta(days=2), venue="Eden Park",
+            team1="Mavericks", team2="Hurricanes", winner="Mavericks", name="Imported Replay",
+            deliveries=[ingest.Delivery("Mavericks", 0.1, "Pandey", "Maheesh", runs=4)],
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest.import_scorecards([scorecard])
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, "Imported Replay")
+
+        squads = synthetic.league_squads(1, players=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            team = Team.objects.create(name=squads[0].name)
+        url = reverse('team_detail', args=[team.pk])
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            synthetic.create_squads(squads) # Only players are new
+        self.assertContains(self.client.get(url), squads[0].players[0].name)
+
+    def test_missing_pages_are_not_cached(self):
+        url = reverse('team_detail', args=[999])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(cache_metrics.snapshot()['page:team_detail'], {'hits': 0, 'misses': 2})
+
+    def test_match_cards_are_cached_fragments(self):
+        self.client.get(reverse('all_matches'))
+        self.client.get(reverse('all_matches'))
+        self.assertEqual(cache_metrics.snapshot()['fragment:match_card'], {'hits': 1, 'misses': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.match.status = 'Completed'
+            self.match.winner = self.hurricanes
+            self.match.save()
+        self.assertContains(self.client.get(reverse('all_matches')), "Hurricanes won!")
+
+    def test_file_backend(self):
+        with tempfile.TemporaryDirectory() as directory:
+            backend = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory}}
+            with override_settings(CACHES=backend):
+                self.assertEqual(self.client.get(reverse('team_list'))['X-Cache'], 'MISS')
+                self.assertEqual(self.client.get(reverse('team_list'))['X-Cache'], 'HIT')
+                with self.captureOnCommitCallbacks(execute=True):
+                    Team.objects.create(name="Strikers")
+                self.assertContains(self.client.get(reverse('team_list')), "Strikers")
+
+
+class GraphSeriesTests(CricketTestData, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        cache_metrics.reset()
+
+    def bowl_two_innings(self):
+        self.bowl(0.1, runs=4)
+        self.bowl(0.2, is_wide=True)
+        self.bowl(0.2, runs=1, is_wicket=True)
+        self.bowl(1.1, runs=6)
+        self.bowl(0.1, runs=2, batsman=self.aman, bowler=self.harshit)
+
+    def test_series_for_both_innings_in_one_query(self):
+        self.bowl_two_innings()
+        with self.assertNumQueries(1):
+            series = graphs.build_series(self.match.pk)
+
+        first, second = series['innings']
+        self.assertEqual(first['team_id'], self.mavericks.pk)
+        self.assertEqual(first['manhattan'], [6, 6])
+        self.assertEqual(first['wickets'], [1, 0])
+        self.assertEqual(first['worm'], [6, 12])
+        self.assertEqual(first['run_rate'], [18.0, 24.0]) # 6 off 2 balls, then 12 off 3
+        self.assertEqual(second['worm'], [2])
+
+    def test_series_are_cached_per_match_version(self):
+        self.bowl(0.1, runs=4)
+        match = Match.objects.with_teams().get(pk=self.match.pk)
+        snapshot = innings.match_snapshot(match)
+        graphs.match_series(match, snapshot)
+        with self.assertNumQueries(0):
+            graphs.match_series(match, snapshot)
+
+        self.bowl(0.2, runs=2)
+        series = graphs.match_series(match)
+        self.assertEqual(series['innings'][0]['worm'], [6])
+        self.assertEqual(cache_metrics.snapshot()['graph_series'], {'hits': 1, 'misses': 2})
+
+    def test_live_updates_carry_only_the_latest_overs(self):
+        first = self.bowl(0.1, runs=4)
+        self.bowl(1.1, runs=1)
+        url = reverse('api_match_update', args=[self.match.pk])
+
+        self.assertEqual(self.client.get(url).json()['graph_data']['datasets'][0]['data'], [24.0, 15.0])
+        tail = self.client.get(url, {'since': first.sequence}).json()['graph_tail']
+        self.assertEqual(tail['from_over'], 1)
+        self.assertEqual(tail['innings'][0]['label'], "Mavericks")
+        self.assertEqual(tail['innings'][0]['worm'], [5])
+
+        response = self.client.get(reverse('api_match_graph', args=[self.match.pk]), {'from_over': 1})
+        self.assertEqual(response.json()['innings'][0]['manhattan'], [1])
+        self.assertEqual(response.status_code, 200)
+
+    def test_comparison_reuses_cached_series(self):
+        self.bowl_two_innings()
+        other = Match.objects.create(team1=self.hurricanes, team2=self.mavericks, date=timezone.now(), venue="Arena Oval")
+        self.bowl(0.1, runs=3, batsman=self.aman, bowler=self.harshit, match=other)
+        url = reverse('api_graph_comparison')
+        params = {'matches': f"{self.match.pk},{other.pk}", 'series': 'worm'}
+
+        data = self.client.get(url, params).json()
+        self.assertEqual([dataset['data'] for dataset in data['datasets']], [[6, 12], [2], [3]])
+        self.assertEqual(data['labels'], ['1', '2'])
+        with self.assertNumQueries(2): # Matches and innings; no balls are read again
+            self.assertEqual(self.client.get(url, params).json(), data)
+
+        self.assertEqual(self.client.get(url, {'matches': self.match.pk, 'series': 'pie'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'matches': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'matches': '999'}).status_code, 404)
+
+
+class BallStoreTests(CricketTestData, TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'balls')
+        settings = override_settings(CRICKET_BALL_STORE=self.path)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_columns_round_trip(self):
+        self.bowl(0.1, runs=4, commentary="FOUR!")
+        self.bowl(0.2, is_wide=True)
+        self.bowl(2.3, is_wicket=True, commentary="Bowled him. Über-quick.")
+        result = ballstore.sync_ball_store(self.path)
+        self.assertEqual((result.added, result.rows, result.rebuilt), (3, 3, True))
+
+        store = ballstore.BallStore(self.path)
+        self.assertIsInstance(store['runs'], np.memmap)
+        self.assertEqual(store['runs'].dtype, np.int8)
+        self.assertEqual(store['over'].tolist(), [1, 2, 23])
+        self.assertEqual(store.is_wide.tolist(), [False, True, False])
+        self.assertEqual(store.is_wicket.tolist(), [False, False, True])
+        self.assertEqual(store['batting_team_id'].tolist(), [self.mavericks.pk] * 3)
+        self.assertEqual(store.commentary([0, 1, 2]), ["FOUR!", "", "Bowled him. Über-quick."])
+
+    def test_sync_appends_new_balls_and_rebuilds_after_edits(self):
+        first = self.bowl(0.1, runs=1)
+        ballstore.sync_ball_store(self.path)
+        self.bowl(0.2, runs=6)
+        result = ballstore.sync_ball_store(self.path)
+        self.assertEqual((result.added, result.rows, result.rebuilt), (1, 2, False))
+
+        first.runs = 3
+        first.save()
+        self.assertTrue(ballstore.sync_ball_store(self.path).rebuilt)
+        self.assertEqual(ballstore.BallStore(self.path)['runs'].tolist(), [3, 6])
+
+    def test_edits_and_deletes_are_logged_for_the_next_sync(self):
+        four = self.bowl(0.1, runs=4, commentary="Cut for four")
+        six = self.bowl(0.2, runs=6)
+        ballstore.sync_ball_store(self.path)
+        self.bowl(0.3, runs=1)
+        # Nothing changed: the log and the new ball are all the sync reads
+        with self.assertNumQueries(2):
+            result = ballstore.sync_ball_store(self.path)
+        self.assertEqual((result.added, result.rebuilt), (1, False))
+
+        four.is_wicket = True
+        four.save()
+        self.assertTrue(ballstore.sync_ball_store(self.path).rebuilt)
+        self.assertEqual(ballstore.BallStore(self.path).is_wicket.tolist(), [True, False, False])
+        self.assertFalse(BallChange.objects.exists()) # Consumed
+
+        self.pandey.team = self.hurricanes
+        self.pandey.save()
+        self.assertTrue(ballstore.sync_ball_store(self.path).rebuilt)
+        self.assertEqual(ballstore.BallStore(self.path)['batting_team_id'].tolist(), [self.hurricanes.pk] * 3)
+        six.delete()
+        self.assertTrue(ballstore.sync_ball_store(self.path).rebuilt)
+        self.assertEqual(len(ballstore.BallStore(self.path)), 2)
+        self.assertFalse(ballstore.sync_ball_store(self.path).rebuilt)
+
+    def test_verify_catches_changes_outside_the_orm(self):
+        four = self.bowl(0.1, runs=4, commentary="Cut for four")
+        self.bowl(0.2, runs=6)
+        ballstore.sync_ball_store(self.path)
+
+        # Re-scoring that keeps the runs total and a same-length commentary fix, without signals
+        Ball.objects.filter(pk=four.pk).update(runs=6, commentary="Cut for FOUR")
+        Ball.objects.exclude(pk=four.pk).update(runs=4)
+        self.assertFalse(ballstore.sync_ball_store(self.path).rebuilt)
+        self.assertTrue(ballstore.sync_ball_store(self.path, verify=True).rebuilt)
+        store = ballstore.BallStore(self.path)
+        self.assertEqual((store['runs'].tolist(), store.commentary(0)), ([6, 4], ["Cut for FOUR"]))
+        self.assertFalse(ballstore.sync_ball_store(self.path, verify=True).rebuilt)
+
+    def test_partial_sync_is_ignored(self):
+        self.bowl(0.1, runs=1)
+        ballstore.sync_ball_store(self.path)
+        with open(os.path.join(self.path, 'runs.bin'), 'ab') as handle:
+            handle.write(b'\x07\x07') # An append that never reached the manifest
+        self.assertEqual(len(ballstore.BallStore(self.path)), 1)
+        self.bowl(0.2, runs=2)
+        ballstore.sync_ball_store(self.path)
+        self.assertEqual(ballstore.BallStore(self.path)['runs'].tolist(), [1, 2])
+
+    def test_player_totals_match_rollup(self):
+        self.bowl(0.1, runs=4)
+        self.bowl(0.2, is_wide=True)
+        self.bowl(0.3, is_wicket=True)
+        self.bowl(0.1, runs=2, batsman=self.aman, bowler=self.harshit)
+        call_command('sync_ball_store', path=self.path, stdout=open(os.devnull, 'w'))
+
+        totals = ballstore.player_totals(ballstore.BallStore(self.path))
+        by_player = {int(pk): index for index, pk in enumerate(totals['player_id'])}
+        pandey, maheesh = by_player[self.pandey.pk], by_player[self.maheesh.pk]
+        self.assertEqual((totals['runs_scored'][pandey], totals['balls_faced'][pandey]), (4, 2))
+        self.assertEqual((totals['wickets_taken'][maheesh], totals['runs_conceded'][maheesh]), (1, 5))
+
+    def test_missing_store(self):
+        with self.assertRaises(ballstore.BallStoreError):
+            ballstore.BallStore(self.path)
+
+
+class MatchupIndexTests(CricketTestData, TestCase):
+
+    def pair(self, batsman, bowler):
+        row = matchups.player_matchup(batsman.pk, bowler.pk)
+        return (row.balls, row.runs, row.dismissals, row.dots, row.fours, row.sixes)
+
+    def test_index_follows_create_update_and_delete(self):
+        self.bowl(0.1, runs=4)
+        self.bowl(0.2)
+        self.bowl(0.3, is_wide=True)
+        six = self.bowl(0.4, runs=6)
+        wicket = self.bowl(0.5, is_wicket=True)
+        self.assertEqual(self.pair(self.pandey, self.maheesh), (4, 10, 1, 2, 1, 1))
+
+        six.runs = 1
+        six.save()
+        wicket.delete()
+        self.assertEqual(self.pair(self.pandey, self.maheesh), (3, 5, 0, 1, 1, 0))
+        mavericks_batting, hurricanes_batting = matchups.head_to_head(self.mavericks.pk, self.hurricanes.pk)
+        self.assertEqual((mavericks_batting.balls, mavericks_batting.runs), (3, 5))
+        self.assertIsNone(hurricanes_batting.pk) # Hurricanes haven't batted
+        self.assertEqual(self.pair(self.aman, self.harshit), (0, 0, 0, 0, 0, 0))
+
+    def test_deleting_players_and_teams_with_balls(self):
+        self.bowl(0.1, runs=4)
+        self.bowl(0.2, is_wicket=True)
+        self.bowl(0.1, runs=2, batsman=self.aman, bowler=self.harshit)
+
+        # The cascade removes the player's matchup rows; their balls' deletes must not bring them back
+        self.pandey.delete()
+        self.assertFalse(BatsmanBowlerMatchup.objects.filter(batsman_id=self.pandey.pk).exists())
+        self.assertEqual(self.pair(self.aman, self.harshit), (1, 2, 0, 0, 0, 0))
+        mavericks_batting, hurricanes_batting = matchups.head_to_head(self.mavericks.pk, self.hurricanes.pk)
+        self.assertEqual((mavericks_batting.balls, mavericks_batting.runs), (0, 0))
+        self.assertEqual((hurricanes_batting.balls, hurricanes_batting.runs), (1, 2))
+
+        self.hurricanes.delete()
+        self.assertFalse(BatsmanBowlerMatchup.objects.exists())
+        self.assertFalse(TeamMatchup.objects.exists())
+
+    def test_rebuild_matches_incremental_index(self):
+        self.bowl(0.1, runs=2)
+        self.bowl(0.2, is_wicket=True, is_no_ball=True)
+        self.bowl(0.1, runs=4, batsman=self.aman, bowler=self.harshit)
+        fields = ('balls',) + matchups.MATCHUP_FIELDS[1:]
+        expected = sorted(BatsmanBowlerMatchup.objects.values_list('batsman_id', 'bowler_id', *fields))
+        expected_teams = sorted(TeamMatchup.objects.values_list('batting_team_id', 'bowling_team_id', *fields))
+
+        self.assertEqual(matchups.rebuild_matchups(), 4)
+        self.assertEqual(sorted(BatsmanBowlerMatchup.objects.values_list('batsman_id', 'bowler_id', *fields)), expected)
+        self.assertEqual(sorted(TeamMatchup.objects.values_list('batting_team_id', 'bowling_team_id', *fields)), expected_teams)
+        BatsmanBowlerMatchup.objects.filter(batsman=self.aman).update(runs=0)
+        matchups.rebuild_matchups([self.aman.pk])
+        self.assertEqual(self.pair(self.aman, self.harshit), (1, 4, 0, 0, 1, 0))
+
+    def test_pages_and_api(self):
+        self.bowl(0.1, runs=4)
+        self.bowl(0.1, runs=1, batsman=self.aman, bowler=self.harshit)
+
+        response = self.client.get(reverse('api_player_matchup', args=[self.pandey.pk, self.maheesh.pk]))
+        self.assertEqual(response.json()['runs'], 4)
+        self.assertEqual(response.json()['strike_rate'], 400.0)
+        response = self.client.get(reverse('api_team_matchup', args=[self.hurricanes.pk, self.mavericks.pk]))
+        self.assertEqual([innings['runs'] for innings in response.json()['innings']], [1, 4])
+        response = self.client.get(reverse('api_player_matchups', args=[self.maheesh.pk]))
+        self.assertEqual([row['batsman']['name'] for row in response.json()['bowling']], ['Pandey'])
+        self.assertEqual(self.client.get(reverse('api_player_matchup', args=[self.pandey.pk, 999])).status_code, 404)
+
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('player_matchups', args=[self.pandey.pk]))
+        self.assertContains(response, 'Maheesh')
+        response = self.client.get(reverse('team_head_to_head', args=[self.mavericks.pk]))
+        self.assertEqual(response.context['pairings'][0]['opponent'], self.hurricanes)
+        self.assertEqual(response.context['pairings'][0]['bowling'].runs, 1)
+
+
+class LeaderboardTests(CricketTestData, TestCase):
+
+    def setUp(self):
+        leaderboards.reset_backend()
+        self.addCleanup(leaderboards.reset_backend)
+
+    def perform(self, player, match=None, **figures):
+        with self.captureOnCommitCallbacks(execute=True):
+            return PlayerMatchPerformance.objects.create(player=player, match=match or self.match, **figures)
+
+    def test_skip_list_ranks_and_ranges(self):
+        members = leaderboards.SortedSet()
+        for member, score in [('a', 5), ('b', 1), ('c', 9), ('d', 5), ('b', 7)]:
+            members.add(member, score)
+        members.discard('c')
+        self.assertEqual(members.range(0, -1), [('a', 5), ('d', 5), ('b', 7)])
+        self.assertEqual([members.rank(member) for member in 'abd'], [0, 2, 1])
+        self.assertIsNone(members.rank('c'))
+
+        backend = leaderboards.LocalBackend()
+        backend.zadd('board', {str(n): n % 7 for n in range(200)})
+        self.assertEqual(backend.zrange('board', 0, 2, desc=True), [('97', 6), ('90', 6), ('83', 6)])
+        self.assertEqual(backend.zrank('board', '97', desc=True), 0)
+
+    def test_boards_rank_players_by_scope(self):
+        self.perform(self.pandey, runs_scored=60, balls_faced=40)
+        self.perform(self.aman, runs_scored=42, balls_faced=30, overs_bowled=10.0, runs_conceded=50, wickets_taken=1)
+        self.perform(self.maheesh, runs_scored=2, balls_faced=3, overs_bowled=10.0, runs_conceded=40, wickets_taken=3)
+
+        self.assertEqual(leaderboards.top('runs'), [(self.pandey.pk, 60), (self.aman.pk, 42), (self.maheesh.pk, 2)])
+        self.assertEqual(leaderboards.top('strike_rate'), [(self.pandey.pk, 150.0), (self.aman.pk, 140.0)])
+        self.assertEqual(leaderboards.top('economy'), [(self.maheesh.pk, 4.0), (self.aman.pk, 5.0)])
+        self.assertEqual(leaderboards.top('runs', 'team', self.hurricanes.pk), [(self.aman.pk, 42), (self.maheesh.pk, 2)])
+        self.assertEqual(leaderboards.player_rank(self.aman.pk, 'wickets'), {'rank': 2, 'score': 1, 'of': 2})
+        self.assertIsNone(leaderboards.player_rank(self.pandey.pk, 'wickets'))
+
+    def test_changes_move_players_between_boards(self):
+        first = self.perform(self.pandey, runs_scored=10, balls_faced=8)
+        self.perform(self.aman, runs_scored=20, balls_faced=10)
+        self.assertEqual(leaderboards.top('runs')[0], (self.aman.pk, 20)) # Built on first read
+
+        self.perform(self.pandey, runs_scored=15, balls_faced=12, match=Match.objects.create(
+            team1=self.mavericks, team2=self.hurricanes, date=self.match.date, venue="Coastal Stadium",
+        ))
+        self.assertEqual(leaderboards.top('runs')[0], (self.pandey.pk, 25))
+        self.assertEqual(leaderboards.top('runs', 'venue', "Coastal Stadium"), [(self.pandey.pk, 15)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+            self.pandey.team = self.hurricanes
+            self.pandey.save()
+        self.assertEqual(leaderboards.top('runs', 'venue', "Arena Oval"), [(self.aman.pk, 20)])
+        self.assertEqual(leaderboards.top('runs', 'team', self.mavericks.pk), [])
+        self.assertEqual(leaderboards.player_rank(self.pandey.pk, 'runs', 'team', self.hurricanes.pk)['rank'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.match.date = self.match.date.replace(year=2001)
+            self.match.save()
+        self.assertEqual(leaderboards.top('runs', 'season', 2001), [(self.aman.pk, 20)])
+
+    def test_rebuilds_switch_generations_under_a_lock(self):
+        self.perform(self.pandey, runs_scored=10, balls_faced=8)
+        self.assertEqual(leaderboards.top('runs'), [(self.pandey.pk, 10)])
+        backend = leaderboards.get_backend()
+        old_generation = backend.get(leaderboards.GENERATION_KEY)
+
+        # Readers keep the old boards until the new generation is complete
+        seen, zadd = [], backend.zadd
+
+        def zadd_and_read(key, mapping):
+            zadd(key, mapping)
+            seen.append(leaderboards.top('runs'))
+
+        with mock.patch.object(backend, 'zadd', zadd_and_read):
+            leaderboards.rebuild_leaderboards()
+        self.assertTrue(seen)
+        self.assertTrue(all(rows == [(self.pandey.pk, 10)] for rows in seen))
+        self.assertFalse([key for key in backend._sets if key.startswith(f"{leaderboards.KEY_PREFIX}:{old_generation}:")])
+
+        # Another process holds the lock: no second build, and refreshes made meanwhile are redone after it
+        backend.add(leaderboards.BUILD_LOCK_KEY, 'elsewhere', 60)
+        self.assertIsNone(leaderboards.rebuild_leaderboards())
+        with self.assertRaises(CommandError):
+            call_command('rebuild_leaderboards', stdout=open(os.devnull, 'w'))
+        self.perform(self.aman, runs_scored=20, balls_faced=10)
+        self.assertEqual(backend.zrange(leaderboards.REFRESHED_KEY, 0, -1), [(str(self.aman.pk), 0)])
+        backend.delete(leaderboards.BUILD_LOCK_KEY)
+        self.assertEqual(leaderboards.top('runs'), [(self.aman.pk, 20), (self.pandey.pk, 10)])
+
+    def test_page_and_api(self):
+        self.perform(self.pandey, runs_scored=30, balls_faced=20)
+        response = self.client.get(reverse('api_leaderboard', args=['runs']), {'team': self.mavericks.pk})
+        self.assertEqual(response.json()['results'], [{'rank': 1, 'player': {'id': self.pandey.pk, 'name': 'Pandey'}, 'score': 30}])
+        response = self.client.get(reverse('api_leaderboard_rank', args=['runs', self.pandey.pk]))
+        self.assertEqual((response.json()['rank'], response.json()['of']), (1, 1))
+        self.assertEqual(self.client.get(reverse('api_leaderboard_rank', args=['wickets', self.pandey.pk])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('api_leaderboard', args=['sixes'])).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_leaderboard', args=['runs']), {'team': 1, 'season': 2020}).status_code, 400)
+
+        self.assertContains(self.client.get(reverse('leaderboards')), 'Pandey')
+        call_command('rebuild_leaderboards', stdout=open(os.devnull, 'w'))
+        # Boards, teams, seasons and one query for the listed players
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('leaderboards'), {'season': self.match.date.year})
+        self.assertEqual(response.context['boards'][0]['entries'][0]['player'], self.pandey)
+
+
+class SearchTests(CricketTestData, TestCase):
+
+    def setUp(self):
+        search.reset_backend()
+        self.addCleanup(search.reset_backend)
+
+    def commentary(self, text):
+        return [ball.commentary for ball in search.search(text).balls]
+
+    def test_ranked_search_over_commentary_players_and_venue(self):
+        self.bowl(0.1, runs=6, commentary="SIX! Pandey again.")
+        self.bowl(0.2, runs=6, commentary="SIX! Over midwicket.")
+        self.bowl(0.3, is_wicket=True, batsman=self.aman, bowler=self.harshit, commentary="Caught behind, thin edge.")
+        self.assertEqual(search.get_backend().name, 'fts5')
+
+        # Stemmed ("sixes"), stopwords dropped ("all", "by"); named in the commentary too ranks first
+        self.assertEqual(self.commentary("all sixes by Pandey"), [
+            "SIX! Pandey again.", "SIX! Over midwicket.",
+        ])
+        self.assertEqual(self.commentary("caught behind at Arena Oval"), ["Caught behind, thin edge."])
+        self.assertEqual(self.commentary("caught behind at Coastal Stadium"), [])
+        self.assertEqual(search.search("by the").balls, [])
+
+    def test_index_follows_edits_deletes_renames_and_venue_moves(self):
+        ball = self.bowl(0.1, commentary="Driven through the covers")
+        ball.commentary = "Pulled for four"
+        ball.save()
+        self.assertEqual(self.commentary("covers"), [])
+        self.assertEqual(self.commentary("pulled"), ["Pulled for four"])
+
+        self.pandey.name = "Manish Pandey"
+        self.pandey.save()
+        self.assertEqual(self.commentary("manish pulled"), ["Pulled for four"])
+        self.match.venue = "Coastal Stadium"
+        self.match.save()
+        self.assertEqual(self.commentary("pulled at coastal"), ["Pulled for four"])
+
+        ball.delete()
+        self.assertEqual(self.commentary("pulled"), [])
+        self.bowl(0.2, commentary="Pulled again")
+        self.assertEqual(search.rebuild_index(), 1)
+        self.assertEqual(self.commentary("pulled"), ["Pulled again"])
+
+    @override_settings(CRICKET_SEARCH_BACKEND='python')
+    def test_python_index(self):
+        self.bowl(0.1, runs=6, commentary="SIX! Pandey again.")
+        self.bowl(0.2, runs=6, commentary="SIX!")
+        self.assertEqual(search.get_backend().name, 'python')
+        self.assertEqual(self.commentary("sixes by Pandey"), ["SIX! Pandey again.", "SIX!"])
+
+        # Once built, writes are applied on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            ball = self.bowl(0.3, commentary="Sweeping fine")
+        self.assertEqual(self.commentary("sweeps"), ["Sweeping fine"])
+        with self.captureOnCommitCallbacks(execute=True):
+            ball.delete()
+        self.assertEqual(self.commentary("sweeps"), [])
+        self.assertEqual(search.filter_balls(Ball.objects.all(), "pandey").count(), 2)
+
+    def test_page_and_api(self):
+        for over in (0.1, 0.2, 0.3):
+            self.bowl(over, runs=4, commentary="FOUR! Cut away.")
+        with self.assertNumQueries(1): # Matched, ranked and joined in one query
+            results = search.search("four", per_page=2)
+            self.assertEqual([ball.match.team1 for ball in results.balls], [self.mavericks] * 2)
+        self.assertTrue(results.has_next)
+
+        response = self.client.get(reverse('api_search'), {'q': 'four', 'page': 2, 'page_size': 2})
+        data = response.json()
+        self.assertEqual((len(data['results']), data['next_page']), (1, None))
+        self.assertEqual(data['results'][0]['match'], {'id': self.match.pk, 'name': "League Cup Final", 'venue': "Arena Oval"})
+        self.assertEqual(self.client.get(reverse('api_search')).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_search'), {'q': 'four', 'page': 0}).status_code, 400)
+
+        self.assertContains(self.client.get(reverse('search'), {'q': 'cut'}), "FOUR! Cut away.", count=3)
+
+
+class RenditionTests(CricketTestData, TestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name, CRICKET_RENDITION_WORKERS=0))
+        self.media = media.name
+
+    def upload(self, instance, field, name, size=(1000, 500), mode='RGB'):
+        from PIL import Image
+        from django.core.files.base import ContentFile
+
+        buffer = io.BytesIO()
+        Image.new(mode, size, (200, 30, 30, 128) if mode == 'RGBA' else (200, 30, 30)).save(buffer, name.rsplit('.', 1)[1].replace('jpg', 'jpeg'))
+        with self.captureOnCommitCallbacks(execute=True):
+            getattr(instance, field).save(name, ContentFile(buffer.getvalue()))
+        instance.refresh_from_db()
+        return getattr(instance, f"{field}_renditions")
+
+    def test_upload_writes_hashed_webp_and_fallback_renditions(self):
+        record = self.upload(self.mavericks, 'logo', 'mavs.jpg')
+        self.assertEqual(record['source'], self.mavericks.logo.name)
+        self.assertEqual([width for width, _ in record['webp']], [96, 192, 384, 768])
+        self.assertEqual((record['fallback_type'], record['width'], record['height']), ('image/jpeg', 1000, 500))
+        self.assertRegex(record['webp'][0][1], r"^renditions/team_logos/mavs\.96w\.[0-9a-f]{12}\.webp$")
+        for _, name in record['webp'] + record['fallback']:
+            self.assertTrue(os.path.exists(os.path.join(self.media, name)))
+
+        response = self.client.get(reverse('team_list'))
+        self.assertContains(response, '<source type="image/webp" srcset="/media/renditions/team_logos/mavs.96w.')
+        self.assertContains(response, 'sizes="96px"', count=2)
+
+        # A transparent replacement gets PNG fallbacks; the old files go
+        record = self.upload(self.mavericks, 'logo', 'new.png', size=(150, 150), mode='RGBA')
+        self.assertEqual((record['fallback_type'], [width for width, _ in record['fallback']]), ('image/png', [96]))
+        self.assertEqual(sorted(os.listdir(os.path.join(self.media, 'renditions', 'team_logos'))), sorted(
+            os.path.basename(name) for _, name in record['webp'] + record['fallback']
+        ))
+
+    def test_original_is_served_until_renditions_exist(self):
+        self.upload(self.pandey, 'image', 'pandey.jpg', size=(60, 80))
+        self.assertEqual([width for width, _ in self.pandey.image_renditions['webp']], [60]) # Never upscaled
+        Player.objects.filter(pk=self.pandey.pk).update(image_renditions={})
+        cache.clear()
+        self.assertContains(self.client.get(reverse('team_detail', args=[self.mavericks.pk])), f'src="{self.pandey.image.url}"')
+
+        call_command('generate_renditions', stdout=open(os.devnull, 'w'))
+        self.pandey.refresh_from_db()
+        self.assertEqual(self.pandey.image_renditions['source'], self.pandey.image.name)
+        self.assertEqual(renditions.generate_renditions(), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pandey.image = None
+            self.pandey.save()
+        self.pandey.refresh_from_db()
+        self.assertEqual(self.pandey.image_renditions, {})
+        self.assertEqual(os.listdir(os.path.join(self.media, 'renditions', 'player_images')), [])
+
+
+class ScorerApiTests(CricketTestData, TestCase):
+
+    def setUp(self):
+        from django.contrib.auth.models import Permission, User
+
+        live.reset_broadcaster()
+        self.addCleanup(live.reset_broadcaster)
+        scorer = User.objects.create_user('scorer')
+        scorer.user_permissions.add(Permission.objects.get(codename='add_ball'))
+        self.client.force_login(scorer)
+        self.url = reverse('api_record_deliveries', args=[self.match.pk])
+
+    def post(self, deliveries, key=None, match=None):
+        headers = {'Idempotency-Key': key} if key else {}
+        url = reverse('api_record_deliveries', args=[match.pk]) if match else self.url
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(url, json.dumps(deliveries), content_type='application/json', headers=headers)
+
+    def over(self, batsman=None, bowler=None, runs=(1, 0, 4, 0, 6, 1)):
+        batsman, bowler = batsman or self.pandey, bowler or self.maheesh
+        return [{'batsman_id': batsman.pk, 'bowler_id': bowler.pk, 'runs': run} for run in runs]
+
+    def test_batch_is_numbered_folded_and_indexed_like_single_saves(self):
+        received = []
+        live.get_broadcaster().backend.subscribe(live.channel_name(self.match.pk), received.append)
+        deliveries = self.over()
+        deliveries.insert(2, {'batsman_id': self.pandey.pk, 'bowler_id': self.maheesh.pk, 'is_wide': True, 'over': 0.3})
+        deliveries[-1].update(is_wicket=True, commentary="Caught behind!")
+
+        response = self.post({'deliveries': deliveries})
+        self.assertEqual(response.status_code, 201)
+        balls = response.json()['balls']
+        self.assertEqual([ball['over'] for ball in balls], [0.1, 0.2, 0.3, 0.3, 0.4, 0.5, 0.6])
+        self.assertEqual([ball['sequence'] for ball in balls], list(range(1, 8)))
+        self.assertEqual(response.json()['innings'][0]['runs'], 13)
+        self.assertEqual(json.loads(received[-1])['cursor'], 7)
+
+        # Same totals as the signal-driven path and the rebuilds
+        incremental = InningsScore.objects.get(match=self.match)
+        rebuilt = innings.rebuild_match(self.match.pk)[0]
+        self.assertEqual(
+            (incremental.runs, incremental.wickets, incremental.legal_balls, incremental.over_runs),
+            (rebuilt.runs, rebuilt.wickets, rebuilt.legal_balls, rebuilt.over_runs),
+        )
+        matchup = matchups.player_matchup(self.pandey.pk, self.maheesh.pk)
+        self.assertEqual((matchup.balls, matchup.runs, matchup.dismissals), (6, 12, 1))
+        self.assertEqual([ball.commentary for ball in search.search("caught behind").balls], ["Caught behind!"])
+
+        # The next request carries on from the innings state; its cost doesn't grow with its size.
+        # Session and permissions, 11 for the write, 3 to build the pushed event
+        with self.assertNumQueries(19):
+            self.assertEqual(self.post(self.over()).json()['balls'][0]['over'], 1.1)
+        with self.assertNumQueries(19):
+            self.post(self.over() * 3)
+
+    def test_retries_with_an_idempotency_key_are_not_recorded_twice(self):
+        first = self.post(self.over(), key='over-1')
+        retry = self.post(self.over(), key='over-1')
+        self.assertEqual((retry.status_code, retry.json()), (201, first.json()))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Ball.objects.filter(match=self.match).count(), 6)
+
+        self.assertEqual(self.post(self.over(runs=(6,)), key='over-1').status_code, 422)
+        self.assertEqual(self.post(self.over(runs=(6,)), key='over-2').status_code, 201)
+
+    def test_deliveries_are_checked_against_the_innings(self):
+        deliveries = self.over()
+        deliveries[3]['bowler_id'] = self.harshit.pk # Batsman's own team-mate
+        response = self.post(deliveries)
+        self.assertEqual((response.status_code, response.json()['index']), (400, 3))
+        self.assertFalse(Ball.objects.filter(match=self.match).exists()) # All or nothing
+
+        self.assertEqual(self.post([{**self.over()[0], 'over': 1.1}]).status_code, 409)
+        self.assertEqual(self.post([{**self.over()[0], 'runs': 9}]).status_code, 400)
+        self.assertEqual(self.post(self.over(runs=(0,)) * 6 + self.over(self.aman, self.harshit)).status_code, 201)
+        # The first innings can't be resumed once the second has started
+        self.assertEqual(self.post(self.over(runs=(0,))).status_code, 409)
+        self.assertEqual(Ball.objects.filter(match=self.match, innings=2).count(), 6)
+
+        Match.objects.filter(pk=self.match.pk).update(status='Completed')
+        self.assertEqual(self.post(self.over(self.aman, self.harshit)).status_code, 409)
+        self.client.logout()
+        self.assertEqual(self.post(self.over()).status_code, 403)
+
+    def test_deliveries_past_the_overs_limit_are_rejected(self):
+        for over in (20.1, 0.7, 0.0, -0.1):
+            with self.subTest(over=over):
+                response = self.post([{**self.over()[0], 'over': over}])
+                self.assertEqual((response.status_code, response.json()['index']), (400, 0))
+        self.assertEqual(self.post(self.over(runs=(0,)) * 120).status_code, 201)
+        response = self.post(self.over(runs=(0,)))
+        self.assertEqual((response.status_code, response.json()['index']), (400, 0))
+        self.assertEqual(Ball.objects.filter(match=self.match).count(), 120)
+
+
+class AdminChangelistTests(CricketTestData, TestCase):
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+
+        cache.clear()
+        self.addCleanup(cache.clear) # Don't leave a fake row estimate behind
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        self.url = reverse('admin:cricket_ball_changelist')
+
+    def test_autocomplete_filter_narrows_by_match(self):
+        other = Match.objects.create(team1=self.hurricanes, team2=self.mavericks, date=timezone.now(), venue="Coastal Stadium")
+        self.bowl(0.1)
+        self.bowl(0.1, match=other)
+
+        response = self.client.get(self.url, {'match__id__exact': other.pk})
+        self.assertEqual(list(response.context['cl'].result_list.values_list('match_id', flat=True)), [other.pk])
+        # The picked match is the only option rendered; the rest come from the autocomplete view
+        self.assertContains(response, f'<option value="{other.pk}" selected>{other}</option>', html=True)
+        self.assertNotContains(response, f'<option value="{self.match.pk}"')
+        self.assertContains(response, 'admin_filters.js')
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'term': 'League', 'app_label': 'cricket', 'model_name': 'ball', 'field_name': 'match',
+        })
+        self.assertEqual([result['id'] for result in response.json()['results']], [str(self.match.pk)])
+
+    def test_search_goes_through_names_and_the_commentary_index(self):
+        self.bowl(0.1, commentary="Driven through the covers")
+        self.bowl(0.2, batsman=self.aman, bowler=self.harshit, commentary="Edged and taken")
+
+        results = self.client.get(self.url, {'q': 'aman'}).context['cl'].result_list
+        self.assertEqual([ball.batsman_id for ball in results], [self.aman.pk])
+        response = self.client.get(self.url, {'q': 'commentary: covers'})
+        self.assertEqual([ball.commentary for ball in response.context['cl'].result_list], ["Driven through the covers"])
+        response = self.client.get(self.url, {'q': 'commentary: covers', 'match__id__exact': self.match.pk + 1})
+        self.assertEqual(response.context['cl'].result_count, 0)
+
+    def test_huge_tables_use_the_estimated_count(self):
+        from django.db import connection
+        from . import admin as cricket_admin
+
+        self.bowl(0.1)
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+        self.assertEqual(cricket_admin.estimated_row_count(Ball), 1)
+        self.assertEqual(self.client.get(self.url).context['cl'].result_count, 1) # Below the threshold
+        cache.set('cricket:row-estimate:default:cricket_ball', 2000000)
+        self.assertEqual(self.client.get(self.url).context['cl'].result_count, 2000000)
+        # Any filter needs the exact count
+        self.assertEqual(self.client.get(self.url, {'is_wicket__exact': 0}).context['cl'].result_count, 1)
+
+
+class QueryBudgetTests(CricketTestData, TestCase):
+    """
+    Fixed query budgets per page. The data set has many matches, balls and
+    performances, so any per-row query (N+1) blows the budget.
+    """
+    MATCHES = 25
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        now = timezone.now()
+        for index in range(cls.MATCHES):
+            completed = index % 2 == 0
+            match = Match.objects.create(
+                team1=cls.mavericks, team2=cls.hurricanes, venue="Arena Oval",
+                date=now + timedelta(days=index + 1) * (-1 if completed else 1),
+                status='Completed' if completed else 'Upcoming',
+                winner=cls.mavericks if completed else None,
+            )
+            for over in (0.1, 0.2, 0.3):
+                Ball.objects.create(match=match, over=over, batsman=cls.pandey, bowler=cls.maheesh, runs=1, commentary="Single.")
+                Ball.objects.create(match=match, over=over, batsman=cls.aman, bowler=cls.harshit, runs=2, commentary="Two.")
+            PlayerMatchPerformance.objects.create(player=cls.pandey, match=match, runs_scored=3, balls_faced=3)
+        cls.busy_match = match
+
+    def setUp(self):
+        cache.clear() # Measure uncached renders
+
+    def assertPageQueries(self, budget, url):
+        with self.assertNumQueries(budget):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            # Render lazily-evaluated querysets inside the budget
+            response.content
+
+    def test_public_page_budgets(self):
+        pages = [
+            (2, reverse('home')),
+            (2, reverse('all_matches')),
+            (1, reverse('team_list')),
+            (2, reverse('team_detail', args=[self.mavericks.pk])),
+            # + one pass over the balls for the graph, the latest overs and their players' names
+            (5, reverse('match_detail', args=[self.busy_match.pk])),
+            (3, reverse('player_stats', args=[self.pandey.pk])),
+            (2, reverse('player_full_match_history', args=[self.pandey.pk])),
+        ]
+        for budget, url in pages:
+            with self.subTest(url=url):
+                self.assertPageQueries(budget, url)
+
+    def test_admin_changelist_budgets(self):
+        from django.contrib.auth.models import User
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        pages = [
+            # Session, user, filter choices, two counts, the page itself (+ date_hierarchy for matches)
+            (9, reverse('admin:cricket_match_changelist')),
+            # Big tables skip the unfiltered count; ball filters are autocompletes with no choices to load
+            (5, reverse('admin:cricket_player_changelist')),
+            (5, reverse('admin:cricket_playermatchperformance_changelist')),
+            (4, reverse('admin:cricket_ball_changelist')),
+        ]
+        for _, url in pages:
+            self.client.get(url) # Warm up content types and sessions
+        for budget, url in pages:
+            with self.subTest(url=url):
+                self.assertPageQueries(budget, url)
+
+    def test_ball_and_player_str_need_no_extra_queries(self):
+        balls = list(Ball.objects.with_related()[:10])
+        players = list(Player.objects.with_team())
+        with self.assertNumQueries(0):
+            [str(ball) for ball in balls]
+            [str(player) for player in players]
+
+
+class SyntheticLeagueTests(TestCase):
+
+    def setUp(self):
+        leaderboards.reset_backend()
+        self.addCleanup(leaderboards.reset_backend)
+
+    def test_same_seed_gives_the_same_league(self):
+        first, again = (list(synthetic.league_matches(synthetic.league_squads(3, seed=7), seed=7)) for _ in range(2))
+        self.assertEqual(len(first), 6) # Everyone hosts everyone once
+        self.assertEqual(first, again)
+        self.assertNotEqual(first, list(synthetic.league_matches(synthetic.league_squads(3, seed=8), seed=8)))
+
+        for match in first:
+            for team in (match.team1, match.team2):
+                innings_balls = [ball for ball in match.deliveries if ball.batting_team == team]
+                self.assertLessEqual(sum(not (ball.is_wide or ball.is_no_ball) for ball in innings_balls), 120)
+                self.assertLessEqual(sum(ball.is_wicket for ball in innings_balls), 10)
+
+    def test_generated_league_is_loaded_once(self):
+        stats = synthetic.generate_league(teams=3, overs=2, seed=1)
+        self.assertEqual((stats.matches, Match.objects.count(), Team.objects.count()), (6, 6, 3))
+        self.assertEqual(Ball.objects.count(), stats.balls)
+        career_runs = PlayerCareerStats.objects.aggregate(total_runs=Sum('runs'))['total_runs']
+        self.assertEqual(career_runs, Ball.objects.aggregate(total_runs=Sum('runs'))['total_runs'])
+        self.assertEqual(synthetic.generate_league(teams=3, overs=2, seed=1).matches, 0)
+
+    def test_benchmarks_measure_scenarios_and_flag_regressions(self):
+        synthetic.generate_league(teams=2, overs=2, seed=1)
+        results = benchmarks.run_suite(['view: match detail', 'ingest'], iterations=1, seed=1)
+        self.assertEqual(set(results), {'view: match detail', f'ingest: {benchmarks.INGEST_MATCHES} matches'})
+        self.assertEqual(Match.objects.count(), 2) # The import was rolled back
+        result = results['view: match detail']
+        self.assertGreater(result.queries, 0)
+
+        baseline = {'results': {'view: match detail': asdict(result)}}
+        self.assertEqual(benchmarks.compare(results, baseline), [])
+        slower = replace(result, p95_ms=result.p95_ms * 2 + 10, queries=result.queries + 1)
+        self.assertEqual(len(benchmarks.compare({'view: match detail': slower}, baseline)), 2)
+
+
+class RequestMetricsTests(CricketTestData, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        cache_metrics.reset()
+        instrumentation.request_metrics.reset()
+
+    def test_requests_are_recorded_per_route_and_exported(self):
+        self.client.get(reverse('match_detail', args=[self.match.pk]))
+        self.client.get('/no-such-page/')
+        histograms = instrumentation.request_metrics.snapshot()['histograms']
+        _, queries, count = histograms['cricket_request_queries', 'match_detail']
+        self.assertEqual(count, 1)
+        self.assertGreater(queries, 0)
+        self.assertGreater(histograms['cricket_request_template_seconds', 'match_detail'][1], 0)
+        self.assertIn(('cricket_request_duration_seconds', instrumentation.UNMATCHED_ROUTE), histograms)
+
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        with override_settings(CRICKET_METRICS_TOKEN='scrape-me'):
+            self.assertEqual(self.client.get(url, headers={'Authorization': 'Bearer wrong'}).status_code, 403)
+            response = self.client.get(url, headers={'Authorization': 'Bearer scrape-me'})
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('# TYPE cricket_request_duration_seconds histogram', text)
+        self.assertIn('cricket_request_queries_count{route="match_detail"} 1', text)
+        self.assertIn('cricket_request_duration_seconds_bucket{route="match_detail",le="+Inf"} 1', text)
+        self.assertIn('cricket_responses_total{route="<unmatched>",status="404"} 1', text)
+        self.assertIn('cricket_cache_requests_total{cache="graph_series",result="miss"} 1', text)
+
+    def test_slow_requests_are_logged_with_their_sql(self):
+        with override_settings(CRICKET_SLOW_REQUEST_MS=0):
+            with self.assertLogs('cricket.slow_requests', 'WARNING') as logs:
+                self.client.get(reverse('team_detail', args=[self.mavericks.pk]))
+        self.assertIn("(team_detail)", logs.output[0])
+        self.assertIn("SELECT", logs.output[0])
+        self.assertEqual(instrumentation.request_metrics.snapshot()['slow'], {'team_detail': 1})
+
+    def test_nested_templates_count_once(self):
+        from django import forms
+        from django.template import engines
+
+        # Rendering a form renders a template per widget inside the outer one
+        form = forms.Form()
+        form.fields.update({f"field{index}": forms.CharField() for index in range(30)})
+        timing = instrumentation.RequestTiming()
+        token = instrumentation._current_timing.set(timing)
+        try:
+            started = time.perf_counter()
+            engines['django'].from_string("{{ form }}").render({'form': form})
+            elapsed = time.perf_counter() - started
+        finally:
+            instrumentation._current_timing.reset(token)
+        self.assertGreater(timing.template_seconds, 0)
+        self.assertLessEqual(timing.template_seconds, elapsed)
+
+    def test_unsampled_requests_only_record_latency(self):
+        with override_settings(CRICKET_METRICS_SAMPLE_RATE=0):
+            self.client.get(reverse('team_list'))
+        histograms = instrumentation.request_metrics.snapshot()['histograms']
+        self.assertEqual(histograms['cricket_request_duration_seconds', 'team_list'][2], 1)
+        self.assertNotIn(('cricket_request_queries', 'team_list'), histograms)
+
+
+@override_settings(CRICKET_READ_REPLICAS=['replica'])
+class ReplicaRoutingTests(CricketTestData, TestCase):
+    """
+    Routing decisions only: the test database has no separate replica.
+    """
+
+    def route(self, run):
+        # A fresh context, as each request gets from the middleware
+        return contextvars.Context().run(run)
+
+    def test_reads_go_to_the_replica_until_something_pins_the_primary(self):
+        router = routers.PrimaryReplicaRouter()
+        self.assertEqual(self.route(lambda: router.db_for_read(Match)), 'replica')
+
+        def after_write():
+            self.assertEqual(router.db_for_write(Ball), 'default')
+            return router.db_for_read(Match)
+        # A write pins the rest of a request; commands and threads keep using the replica
+        self.assertEqual(self.route(after_write), 'replica')
+        middleware = routers.PrimaryPinMiddleware(lambda request: HttpResponse(after_write()))
+        self.assertEqual(self.route(lambda: middleware(RequestFactory().get('/'))).content, b'default')
+
+        def in_transaction():
+            with transaction.atomic():
+                return router.db_for_read(Match)
+        self.assertEqual(self.route(in_transaction), 'default')
+
+        def pinned():
+            with routers.use_primary():
+                return router.db_for_read(Match)
+        self.assertEqual(self.route(pinned), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'cricket'))
+        self.assertTrue(router.allow_migrate('default', 'cricket'))
+        with override_settings(CRICKET_READ_REPLICAS=[]):
+            self.assertEqual(self.route(lambda: router.db_for_read(Match)), 'default')
+
+    def test_writing_requests_pin_the_client_to_the_primary(self):
+        router = routers.PrimaryReplicaRouter()
+        reads = []
+
+        def view(request):
+            reads.append(router.db_for_read(Match))
+            if request.method == 'POST':
+                router.db_for_write(Ball)
+            return HttpResponse()
+
+        middleware = routers.PrimaryPinMiddleware(view)
+        factory = RequestFactory()
+        self.assertNotIn(routers.PIN_COOKIE, self.route(lambda: middleware(factory.get('/'))).cookies)
+        response = self.route(lambda: middleware(factory.post('/')))
+        self.assertEqual(response.cookies[routers.PIN_COOKIE]['max-age'], 5)
+        pinned_request = factory.get('/')
+        pinned_request.COOKIES[routers.PIN_COOKIE] = '1'
+        self.route(lambda: middleware(pinned_request))
+        self.assertEqual(reads, ['replica', 'default', 'default'])
+
+    def test_sqlite_connections_are_tuned(self):
+        database = databases.from_url('sqlite:////srv/cricket.sqlite3')
+        self.assertEqual(database['NAME'], '/srv/cricket.sqlite3')
+        self.assertIn('PRAGMA journal_mode=WAL', database['OPTIONS']['init_command'])
+        self.assertEqual(database['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        pooled = databases.from_url('postgresql://cricket:s%40cret@db:5433/cricket')
+        self.assertEqual((pooled['PASSWORD'], pooled['PORT'], pooled['CONN_MAX_AGE']), ('s@cret', '5433', 0))
+        self.assertIn('pool', pooled['OPTIONS'])
+        self.assertNotIn('OPTIONS', databases.from_url('postgresql://db/cricket?pool=0'))
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1) # NORMAL
@@ -2,6 +2,8 @@
 
 from django.urls import path
 from . import views # Imports your views from the same app
+from . import api
+from . import instrumentation
 
 urlpatterns = [
     path('', views.home, name='home'),
@@ -10,5 +12,27 @@ urlpatterns = [
     path('match/<int:match_id>/', views.match_detail, name='match_detail'),
     path('player/<int:player_id>/', views.player_stats, name='player_stats'),
     path('player/<int:player_id>/matches/', views.player_full_match_history, name='player_full_match_history'),
+    path('player/<int:player_id>/matchups/', views.player_matchups, name='player_matchups'),
+    path('team/<int:team_id>/head-to-head/', views.team_head_to_head, name='team_head_to_head'),
     path('matches/', views.all_matches, name='all_matches'),
+    path('leaderboards/', views.leaderboard_page, name='leaderboards'),
+    path('search/', views.search_page, name='search'),
+    path('metrics/', instrumentation.metrics, name='metrics'),
+
+    # JSON API
+    path('api/matches/', api.match_list, name='api_match_list'),
+    path('api/players/<int:player_id>/matches/', api.player_matches, name='api_player_matches'),
+    path('api/matches/<int:match_id>/deliveries/', api.record_deliveries, name='api_record_deliveries'),
+    path('api/matches/<int:match_id>/update/', api.match_update, name='api_match_update'),
+    path('api/matches/<int:match_id>/commentary/', api.match_commentary, name='api_match_commentary'),
+    path('api/matches/<int:match_id>/stream/', api.match_stream, name='api_match_stream'),
+    path('api/matches/<int:match_id>/simulate/', api.match_simulation, name='api_match_simulation'),
+    path('api/matches/<int:match_id>/graph/', api.match_graph, name='api_match_graph'),
+    path('api/graphs/compare/', api.graph_comparison, name='api_graph_comparison'),
+    path('api/leaderboards/<str:stat>/', api.leaderboard, name='api_leaderboard'),
+    path('api/leaderboards/<str:stat>/players/<int:player_id>/', api.leaderboard_rank, name='api_leaderboard_rank'),
+    path('api/search/', api.search_balls, name='api_search'),
+    path('api/players/<int:player_id>/matchups/', api.player_matchups, name='api_player_matchups'),
+    path('api/matchups/players/<int:batsman_id>/<int:bowler_id>/', api.player_matchup, name='api_player_matchup'),
+    path('api/matchups/teams/<int:team_id>/<int:other_team_id>/', api.team_matchup, name='api_team_matchup'),
 ]
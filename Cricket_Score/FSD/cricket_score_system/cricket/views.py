@@ -1,21 +1,31 @@
 # cricket/views.py
 
+import json
+
+from django.http import HttpResponseBadRequest
 from django.shortcuts import render, get_object_or_404
-from .models import Team, Player, Match, PlayerMatchPerformance, Ball
-from django.db.models import Sum
+from .models import Team, Player, Match, PlayerMatchPerformance, Ball, PlayerCareerStats
 from django.utils import timezone
+from . import commentary, graphs, innings, leaderboards, matchups, prediction, search
+from .cache import versioned_page
+from .pagination import MATCH_STATUSES, KeysetPaginator, match_filters, page_size
+
+def _today(request):
+    # The home page splits upcoming and completed matches by date
+    return timezone.now().date().isoformat()
 
+@versioned_page('home', ('match', 'team'), vary=_today)
 def home(request):
     """
     Renders the home page of the cricket score system,
     displaying upcoming and recently completed matches.
     """
-    upcoming_matches = Match.objects.filter(
+    upcoming_matches = Match.objects.with_teams().filter(
         date__gte=timezone.now().date(),
         status__in=['Upcoming', 'Live']
     ).order_by('date')[:5]
 
-    completed_matches = Match.objects.filter(
+    completed_matches = Match.objects.with_teams().filter(
         date__lt=timezone.now().date(),
         status='Completed'
     ).order_by('-date')[:5]
@@ -26,6 +36,7 @@ def home(request):
     }
     return render(request, 'cricket/home.html', context)
 
+@versioned_page('team_list', ('team',))
 def team_list(request):
     """
     Fetches all teams from the database and displays them.
@@ -36,12 +47,13 @@ def team_list(request):
     }
     return render(request, 'cricket/team_list.html', context)
 
+@versioned_page('team_detail', ('team', 'player'))
 def team_detail(request, team_id):
     """
     Displays the details of a specific team, including its players.
     """
     team = get_object_or_404(Team, pk=team_id)
-    players = team.players.all().order_by('name')
+    players = team.players.all().order_by('name') # Cards only use the player's own fields
 
     context = {
         'team': team,
@@ -52,10 +64,23 @@ def team_detail(request, team_id):
 def match_detail(request, match_id):
     """
     Displays the details of a specific match.
+    Scores come from the precomputed innings totals; the run rate graph from the
+    match's cached graph series, which is only re-aggregated after it changes.
     """
-    match = get_object_or_404(Match, pk=match_id)
+    match = get_object_or_404(Match.objects.with_teams(), pk=match_id)
+    snapshot = innings.match_snapshot(match)
+    # Only the latest overs, newest first; older ones load from the commentary API on scroll
+    feed = commentary.commentary_page(match.pk)
+
     context = {
-        'match': match
+        'match': match,
+        'team1_score': snapshot['team1_score'],
+        'team2_score': snapshot['team2_score'],
+        'graph_data': json.dumps(graphs.chart_data(match, graphs.match_series(match, snapshot))),
+        'cursor': feed.cursor,
+        'balls': feed.balls,
+        'older_before': feed.next_before,
+        **prediction.match_prediction(match, snapshot),
     }
     return render(request, 'cricket/match_detail.html', context)
 
@@ -63,19 +88,22 @@ def player_stats(request, player_id):
     """
     Displays detailed statistics for a specific player, including a performance graph
     and recent match performances.
+    Career totals come from the precomputed PlayerCareerStats row; only the
+    last 5 performances are read, for the graph.
     """
-    player = get_object_or_404(Player, pk=player_id)
+    player = get_object_or_404(Player.objects.with_team(), pk=player_id)
+    career = PlayerCareerStats.objects.filter(player=player).first() or PlayerCareerStats(player=player)
 
-    total_runs = 0
-    wickets_taken = 0
     player_stats_data = {'labels': [], 'runs': [], 'wickets': []}
     player_matches = []
 
-    recent_performances = PlayerMatchPerformance.objects.filter(player=player).order_by('-match__date')[:5]
+    recent_performances = (
+        PlayerMatchPerformance.objects.with_match()
+        .filter(player=player)
+        .order_by('-match_date', '-match_id')[:5]
+    )
 
     for p in recent_performances:
-        total_runs += p.runs_scored
-        wickets_taken += p.wickets_taken
         match_label = p.match.name if p.match.name and p.match.name != "Unnamed Match" else f"{p.match.team1.name} vs {p.match.team2.name}"
         player_stats_data['labels'].append(match_label)
         player_stats_data['runs'].append(p.runs_scored)
@@ -94,32 +122,119 @@ def player_stats(request, player_id):
 
     return render(request, 'cricket/player_stats.html', {
         'player': player,
-        'total_runs': total_runs,
-        'wickets_taken': wickets_taken,
-        'player_stats_data': player_stats_data,
+        'career': career,
+        'total_runs': career.runs,
+        'wickets_taken': career.wickets,
+        'player_stats_data': json.dumps(player_stats_data),
         'player_matches': player_matches,
     })
 
 def player_full_match_history(request, player_id):
     """
-    Displays the complete match history for a specific player.
+    Displays a player's match history, newest first, one keyset page at a time
+    (?cursor= from the previous page's links).
     """
-    player = get_object_or_404(Player, pk=player_id)
+    player = get_object_or_404(Player.objects.with_team(), pk=player_id)
 
-    all_player_matches = PlayerMatchPerformance.objects.filter(player=player).order_by('-match__date')
+    performances = PlayerMatchPerformance.objects.with_match().filter(player=player)
+    paginator = KeysetPaginator(performances, 'match_date', 'match_id', per_page=page_size(request.GET))
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
 
     context = {
         'player': player,
-        'all_player_matches': all_player_matches,
+        'all_player_matches': page.object_list,
+        'page': page,
     }
     return render(request, 'cricket/player_full_match_history.html', context)
 
+def player_matchups(request, player_id):
+    """
+    The bowlers a player has faced most and the batsmen they have bowled to
+    most, read from the matchup index (see cricket/matchups.py).
+    """
+    player = get_object_or_404(Player.objects.with_team(), pk=player_id)
+    context = {
+        'player': player,
+        **matchups.player_matchups(player.pk),
+    }
+    return render(request, 'cricket/player_matchups.html', context)
+
+def team_head_to_head(request, team_id):
+    """
+    A team's record against every opponent, batting and bowling, from the
+    team matchup index.
+    """
+    team = get_object_or_404(Team, pk=team_id)
+    context = {
+        'team': team,
+        'pairings': matchups.team_matchups(team.pk),
+    }
+    return render(request, 'cricket/team_head_to_head.html', context)
+
+def leaderboard_page(request):
+    """
+    Top run-scorers, wicket-takers, strike rates and economy rates, overall
+    or for one ?team=, ?season= or ?venue=. Boards come sorted from
+    cricket/leaderboards.py; the page only loads the listed players.
+    """
+    try:
+        scope, value = leaderboards.parse_scope(request.GET)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+
+    boards = leaderboards.with_players({
+        stat: leaderboards.top(stat, scope, value) for stat in leaderboards.BOARDS
+    })
+    context = {
+        'boards': [
+            {'stat': stat, 'title': leaderboards.BOARD_TITLES[stat], 'entries': boards[stat]}
+            for stat in leaderboards.BOARDS
+        ],
+        'scope': scope,
+        'teams': Team.objects.order_by('name'),
+        'seasons': [date.year for date in Match.objects.dates('date', 'year', order='DESC')],
+        'filters': request.GET,
+        'min_balls_faced': leaderboards.MIN_BALLS_FACED,
+        'min_balls_bowled': leaderboards.MIN_BALLS_BOWLED,
+    }
+    return render(request, 'cricket/leaderboards.html', context)
+
+def search_page(request):
+    """
+    Full-text search over ball commentary, players and venues, e.g.
+    ?q=sixes by Pandey. Results are ranked by cricket/search.py.
+    """
+    try:
+        page = search.page_number(request.GET)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    query = request.GET.get('q', '').strip()
+    context = {
+        'query': query,
+        'results': search.search(query, page) if query else None,
+    }
+    return render(request, 'cricket/search.html', context)
+
 def all_matches(request):
     """
-    Displays a list of all matches, both upcoming and completed.
+    Displays all matches, newest first, one keyset page at a time.
+    Supports ?status=, ?team=, ?venue=, ?from= and ?to= filters.
     """
-    all_cricket_matches = Match.objects.all().order_by('-date')
+    try:
+        filters = match_filters(request.GET)
+        matches = Match.objects.with_teams().filtered(**filters)
+        page = KeysetPaginator(matches, per_page=page_size(request.GET)).page(request.GET.get('cursor'))
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+
     context = {
-        'all_cricket_matches': all_cricket_matches
+        'all_cricket_matches': page.object_list,
+        'page': page,
+        'teams': Team.objects.order_by('name'),
+        'statuses': MATCH_STATUSES,
+        'filters': request.GET,
     }
     return render(request, 'cricket/all_matches.html', context)
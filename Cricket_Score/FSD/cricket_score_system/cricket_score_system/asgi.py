@@ -3,6 +3,11 @@ ASGI config for cricket_score_system project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Live score streams (/api/matches/<id>/stream/) are long-lived async responses
+and need this entry point, e.g.:
+
+    uvicorn cricket_score_system.asgi:application
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
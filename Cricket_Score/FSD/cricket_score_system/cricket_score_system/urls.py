@@ -1,9 +1,13 @@
 # cricket_score_system/urls.py
 
+from pathlib import Path
+
 from django.contrib import admin
 from django.urls import path, include # <--- Ensure 'include' is imported here
 from django.conf import settings
 from django.conf.urls.static import static
+from django.views.decorators.cache import cache_control
+from django.views.static import serve
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -15,5 +19,10 @@ urlpatterns = [
 # Only serve static and media files this way during development (DEBUG=True)
 # This part should be correct if it was working before.
 if settings.DEBUG:
+    # Renditions have content-hashed names, so browsers may keep them forever
+    urlpatterns += static(
+        f"{settings.MEDIA_URL}renditions/", cache_control(public=True, max_age=31536000, immutable=True)(serve),
+        document_root=Path(settings.MEDIA_ROOT) / 'renditions',
+    )
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
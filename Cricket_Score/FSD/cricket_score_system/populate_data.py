@@ -11,7 +11,8 @@ from datetime import timedelta
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cricket_score_system.settings')
 django.setup()
 
-from cricket.models import Team, Player, Match, PlayerMatchPerformance, Ball
+from cricket.models import Team, Player, Match, Ball
+from cricket import rollup
 
 print("Starting data population script for Mavericks and Hurricanes with new player names...")
 
@@ -185,13 +186,16 @@ balls_data_2 = [
 
 
 # Populate balls for sample_match_1
-for b_data in balls_data_1:
+# Each delivery is identified by its place in the match, so re-running the script never duplicates it
+for sequence, b_data in enumerate(balls_data_1, start=1):
     Ball.objects.get_or_create(
         match=sample_match_1,
-        over=b_data['over'],
-        batsman=b_data['batsman'],
-        bowler=b_data['bowler'],
+        sequence=sequence,
         defaults={
+            'innings': 1,
+            'over': b_data['over'],
+            'batsman': b_data['batsman'],
+            'bowler': b_data['bowler'],
             'runs': b_data['runs'],
             'is_wicket': b_data['is_wicket'],
             'commentary': b_data['commentary'],
@@ -201,13 +205,15 @@ for b_data in balls_data_1:
 print(f"Populated balls for {sample_match_1.name}")
 
 # Populate balls for sample_match_2
-for b_data in balls_data_2:
+for sequence, b_data in enumerate(balls_data_2, start=1):
     Ball.objects.get_or_create(
         match=sample_match_2,
-        over=b_data['over'],
-        batsman=b_data['batsman'],
-        bowler=b_data['bowler'],
+        sequence=sequence,
         defaults={
+            'innings': 1,
+            'over': b_data['over'],
+            'batsman': b_data['batsman'],
+            'bowler': b_data['bowler'],
             'runs': b_data['runs'],
             'is_wicket': b_data['is_wicket'],
             'commentary': b_data['commentary'],
@@ -217,33 +223,9 @@ for b_data in balls_data_2:
 print(f"Populated balls for {sample_match_2.name}")
 
 # --- 5. Populate PlayerMatchPerformance Data ---
-# Adjust based on the runs/wickets from the balls above for realism
-performance_data = [
-    # For sample_match_1 (Mavericks batting first)
-    {'player': mavericks_players[0], 'match': sample_match_1, 'runs_scored': 11, 'wickets_taken': 0, 'balls_faced': 5, 'overs_bowled': 0}, # Pandey
-    {'player': mavericks_players[1], 'match': sample_match_1, 'runs_scored': 7, 'wickets_taken': 0, 'balls_faced': 4, 'overs_bowled': 0}, # Ajinkya
-    {'player': mavericks_players[5], 'match': sample_match_1, 'runs_scored': 0, 'wickets_taken': 0, 'balls_faced': 0, 'overs_bowled': 1}, # Harshit (bowled)
-    {'player': mavericks_players[9], 'match': sample_match_1, 'runs_scored': 1, 'wickets_taken': 0, 'balls_faced': 1, 'overs_bowled': 0}, # R.singh
-    {'player': hurricanes_players[6], 'match': sample_match_1, 'runs_scored': 0, 'wickets_taken': 1, 'balls_faced': 0, 'overs_bowled': 1}, # S.Singh (1 wicket)
-    {'player': hurricanes_players[7], 'match': sample_match_1, 'runs_scored': 0, 'wickets_taken': 1, 'balls_faced': 0, 'overs_bowled': 1}, # Maheesh (1 wicket)
-
-    # For sample_match_2 (Hurricanes batting first)
-    {'player': hurricanes_players[0], 'match': sample_match_2, 'runs_scored': 5, 'wickets_taken': 0, 'balls_faced': 3, 'overs_bowled': 0}, # Aman
-    {'player': hurricanes_players[1], 'match': sample_match_2, 'runs_scored': 6, 'wickets_taken': 0, 'balls_faced': 2, 'overs_bowled': 0}, # A.Joshi
-    {'player': mavericks_players[5], 'match': sample_match_2, 'runs_scored': 0, 'wickets_taken': 0, 'balls_faced': 0, 'overs_bowled': 1}, # Harshit (bowled in this match)
-]
-
-for p_data in performance_data:
-    PlayerMatchPerformance.objects.get_or_create(
-        player=p_data['player'],
-        match=p_data['match'],
-        defaults={
-            'runs_scored': p_data['runs_scored'],
-            'wickets_taken': p_data['wickets_taken'],
-            'balls_faced': p_data['balls_faced'],
-            'overs_bowled': p_data['overs_bowled']
-        }
-    )
+# Derived from the balls above, so the scorecards always agree with them
+rollup.rollup_match(sample_match_1.pk)
+rollup.rollup_match(sample_match_2.pk)
 print("Populated player match performances.")
 
 print("Data population script finished.")